@@ -0,0 +1,13 @@
+"""CPU budget shared by concurrently running ablations and folds."""
+
+from __future__ import annotations
+
+import os
+
+from .config import ExperimentConfig
+
+
+def threads_per_worker(experiment_config: ExperimentConfig, n_workers: int) -> int:
+    """Split ``cpu_budget`` (default: all CPUs) evenly across ``n_workers`` concurrent workers."""
+    cpu_budget = experiment_config.cpu_budget or os.cpu_count() or 1
+    return max(1, int(cpu_budget) // max(1, int(n_workers)))
@@ -0,0 +1,245 @@
+"""Single-file persistence for trained ablations with memory-mapped loading.
+
+A bundle is one file laid out as a magic tag, a JSON header and a sequence of
+64-byte aligned raw arrays. Loading parses only the header and maps the file
+read-only, so workers start quickly and share the same pages. Species heads
+are stored in their packed ``d x S`` form and scored straight from the map.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+
+from .model import (
+    _as_bin_lookup,
+    _ConstantPredictor,
+    estimate_topk,
+    pack_ovr_models,
+    predict_packed_scores,
+)
+
+BUNDLE_MAGIC = b"GPBUNDLE"
+BUNDLE_FORMAT_VERSION = 1
+_ALIGNMENT = 64
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def write_array_file(path: str | Path, metadata: dict, arrays: Dict[str, np.ndarray]) -> None:
+    """Write ``metadata`` and named ``arrays`` into one aligned, mappable file.
+
+    The file is written next to ``path`` and atomically renamed into place, so
+    concurrent readers never observe a partial bundle.
+    """
+    path = Path(path)
+    contiguous = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    layout = {}
+    offset = 0
+    for name, array in contiguous.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps(
+        {"format_version": BUNDLE_FORMAT_VERSION, "metadata": metadata, "arrays": layout}
+    ).encode("utf-8")
+    data_start = _aligned(len(BUNDLE_MAGIC) + 8 + len(header))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with temporary_path.open("wb") as file_handle:
+        file_handle.write(BUNDLE_MAGIC)
+        file_handle.write(len(header).to_bytes(8, "little"))
+        file_handle.write(header)
+        for name, array in contiguous.items():
+            file_handle.seek(data_start + layout[name]["offset"])
+            file_handle.write(array.tobytes())
+        file_handle.truncate(data_start + offset)
+    os.replace(temporary_path, path)
+
+
+def read_array_file(path: str | Path) -> tuple[dict, Dict[str, np.ndarray]]:
+    """Map a file written by :func:`write_array_file` and return read-only array views."""
+    path = Path(path)
+    with path.open("rb") as file_handle:
+        if file_handle.read(len(BUNDLE_MAGIC)) != BUNDLE_MAGIC:
+            raise ValueError(f"{path} is not a GeoPlant model bundle")
+        header_length = int.from_bytes(file_handle.read(8), "little")
+        header = json.loads(file_handle.read(header_length).decode("utf-8"))
+    if header.get("format_version") != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported bundle format version: {header.get('format_version')}")
+
+    data_start = _aligned(len(BUNDLE_MAGIC) + 8 + header_length)
+    mapped = np.memmap(path, dtype=np.uint8, mode="r") if path.stat().st_size > data_start else None
+    arrays: Dict[str, np.ndarray] = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        shape = tuple(spec["shape"])
+        nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        if nbytes == 0:
+            arrays[name] = np.empty(shape, dtype=dtype)
+            continue
+        start = data_start + spec["offset"]
+        arrays[name] = mapped[start : start + nbytes].view(dtype).reshape(shape)
+    return header["metadata"], arrays
+
+
+def _logistic_regression(coef: np.ndarray, intercept: np.ndarray, classes: np.ndarray) -> LogisticRegression:
+    model = LogisticRegression()
+    model.coef_ = np.asarray(coef, dtype=np.float64)
+    model.intercept_ = np.asarray(intercept, dtype=np.float64)
+    model.classes_ = np.asarray(classes)
+    model.n_features_in_ = model.coef_.shape[1]
+    return model
+
+
+class _PackedSpeciesModels(Mapping):
+    """Species → trained-object mapping rebuilt lazily from packed columns."""
+
+    def __init__(self, packed_model: dict[str, Any]):
+        self._packed_model = packed_model
+        self._positions = {
+            species_name: index
+            for index, species_name in enumerate(packed_model["species"])
+            if packed_model["fitted"][index]
+        }
+
+    def __getitem__(self, species_name: str) -> dict[str, Any]:
+        index = self._positions[species_name]
+        packed_model = self._packed_model
+        model = _logistic_regression(
+            packed_model["coef"][:, index][None, :],
+            packed_model["intercept"][index : index + 1],
+            np.array([0, 1]),
+        )
+        return {"model": model, "means": packed_model["means"], "stds": packed_model["stds"]}
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._positions)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+
+@dataclass
+class ModelBundle:
+    """Trained ablation: species order, feature order, packed heads and richness estimator."""
+
+    species_column_names: list[str]
+    feature_columns: list[str]
+    packed_model: dict[str, Any]
+    richness_estimator: tuple[dict[str, Any], np.ndarray, np.ndarray] | None = None
+
+    @property
+    def models(self) -> Mapping[str, dict[str, Any]]:
+        """Per-species view compatible with :func:`geoplant_maxent.model.predict_scores`."""
+        return _PackedSpeciesModels(self.packed_model)
+
+    def _select_features(self, features_matrix: pd.DataFrame | np.ndarray) -> pd.DataFrame | np.ndarray:
+        if isinstance(features_matrix, pd.DataFrame):
+            return features_matrix[self.feature_columns]
+        return features_matrix
+
+    def predict_scores(self, features_matrix: pd.DataFrame | np.ndarray, **kwargs) -> np.ndarray:
+        """Score ``features_matrix`` for every bundled species."""
+        return predict_packed_scores(self.packed_model, self._select_features(features_matrix), **kwargs)
+
+    def estimate_topk(self, features_matrix: pd.DataFrame | np.ndarray, offset: int = 5) -> np.ndarray:
+        """Predict per-sample Top-K with the bundled richness estimator."""
+        if self.richness_estimator is None:
+            raise ValueError("This bundle does not contain a richness estimator")
+        classifier, bin_edges, bin_to_mean = self.richness_estimator
+        return estimate_topk(
+            classifier,
+            bin_edges,
+            bin_to_mean,
+            self._select_features(features_matrix),
+            offset=offset,
+        )
+
+
+def save_model_bundle(
+    path: str | Path,
+    models_by_species: Dict[str, dict[str, Any]],
+    species_column_names: list[str],
+    feature_columns: list[str],
+    richness_estimator: tuple[dict[str, Any], np.ndarray, np.ndarray] | None = None,
+) -> None:
+    """Persist a trained ablation into a single bundle file."""
+    packed_model = pack_ovr_models(models_by_species, species_column_names, n_features=len(feature_columns))
+    arrays = {
+        "packed/means": packed_model["means"],
+        "packed/stds": packed_model["stds"],
+        "packed/coef": packed_model["coef"],
+        "packed/intercept": packed_model["intercept"],
+        "packed/fitted": packed_model["fitted"],
+    }
+    richness_kind = None
+    if richness_estimator is not None:
+        classifier, bin_edges, bin_to_mean = richness_estimator
+        estimator = classifier["model"]
+        arrays["richness/means"] = np.asarray(classifier["means"])
+        arrays["richness/stds"] = np.asarray(classifier["stds"])
+        arrays["richness/bin_edges"] = np.asarray(bin_edges, dtype=np.float64)
+        arrays["richness/bin_means"] = _as_bin_lookup(bin_to_mean)
+        if isinstance(estimator, _ConstantPredictor):
+            richness_kind = "constant"
+            arrays["richness/constant"] = np.array([estimator.value], dtype=np.int64)
+        else:
+            richness_kind = "logistic"
+            arrays["richness/coef"] = estimator.coef_
+            arrays["richness/intercept"] = estimator.intercept_
+            arrays["richness/classes"] = estimator.classes_
+    metadata = {
+        "model_type": "maxent",
+        "species": list(species_column_names),
+        "feature_columns": list(feature_columns),
+        "richness_kind": richness_kind,
+    }
+    write_array_file(path, metadata, arrays)
+
+
+def load_model_bundle(path: str | Path) -> ModelBundle:
+    """Map a bundle file; packed coefficients are used directly from the mapping."""
+    metadata, arrays = read_array_file(path)
+    if metadata.get("model_type") != "maxent":
+        raise ValueError(f"{path} does not contain MaxEnt models")
+
+    packed_model = {
+        "species": metadata["species"],
+        "means": arrays["packed/means"],
+        "stds": arrays["packed/stds"],
+        "coef": arrays["packed/coef"],
+        "intercept": arrays["packed/intercept"],
+        "fitted": arrays["packed/fitted"],
+    }
+    richness_estimator = None
+    if metadata["richness_kind"] is not None:
+        if metadata["richness_kind"] == "constant":
+            estimator = _ConstantPredictor(int(arrays["richness/constant"][0]))
+        else:
+            estimator = _logistic_regression(
+                arrays["richness/coef"],
+                arrays["richness/intercept"],
+                arrays["richness/classes"],
+            )
+        richness_estimator = (
+            {"model": estimator, "means": arrays["richness/means"], "stds": arrays["richness/stds"]},
+            np.array(arrays["richness/bin_edges"]),
+            np.array(arrays["richness/bin_means"]),
+        )
+    return ModelBundle(
+        species_column_names=metadata["species"],
+        feature_columns=metadata["feature_columns"],
+        packed_model=packed_model,
+        richness_estimator=richness_estimator,
+    )
@@ -2,17 +2,31 @@
 
 from __future__ import annotations
 
+import os
 from collections.abc import Sequence
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict
 
 import numpy as np
 import pandas as pd
+from threadpoolctl import threadpool_limits
 from tqdm.auto import tqdm
 
+from ._parallel import threads_per_worker
+from .cache import ModelCache, array_fingerprint, frame_fingerprint, model_cache_key
 from .config import ExperimentConfig
-from .data import select_top_species, split_features_by_group
-from .metrics import macro_auc, sample_f1_at_k, sample_recall_at_k
-from .model import estimate_topk, predict_scores, train_ovr, train_richness_estimator
+from .data import FeatureMatrix, select_top_species, split_features_by_group
+from .metrics import MacroAUCAccumulator, TopKAccumulator, macro_auc, sample_topk_metrics
+from .model import (
+    RICHNESS_MODES,
+    estimate_topk,
+    estimate_topk_from_scores,
+    predict_scores,
+    train_ovr,
+    train_richness_estimator,
+)
+from .predict import iter_score_batches
 
 
 def _columns_for_groups(
@@ -25,51 +39,128 @@ def _columns_for_groups(
     return sorted(columns)
 
 
-def _weighted_metrics_for_variable_topk(
-    y_true: np.ndarray,
-    y_scores: np.ndarray,
-    topk_per_sample: np.ndarray,
-) -> tuple[float, float]:
-    f1_parts = []
-    recall_parts = []
-    weights = []
-    for k_value in np.unique(topk_per_sample):
-        sample_mask = topk_per_sample == k_value
-        if sample_mask.sum() == 0:
-            continue
-        f1_parts.append(sample_f1_at_k(y_true[sample_mask], y_scores[sample_mask], int(k_value)))
-        recall_parts.append(
-            sample_recall_at_k(y_true[sample_mask], y_scores[sample_mask], int(k_value))
-        )
-        weights.append(int(sample_mask.sum()))
-    if not weights:
-        return float("nan"), float("nan")
-    return float(np.average(f1_parts, weights=weights)), float(
-        np.average(recall_parts, weights=weights)
+def _feature_subsets(
+    experiment_config: ExperimentConfig,
+    ablation_group_names: list[str],
+    train_features: pd.DataFrame | FeatureMatrix,
+    test_features: pd.DataFrame | FeatureMatrix,
+    group_map: Dict[str, list[str]] | None,
+) -> tuple[list[str], pd.DataFrame | np.ndarray, pd.DataFrame | np.ndarray]:
+    """Select the ablation columns as float32 views of a :class:`FeatureMatrix` or by DataFrame name."""
+    if isinstance(train_features, FeatureMatrix):
+        selected_feature_columns, train_feature_subset = train_features.select(ablation_group_names)
+        test_feature_columns, test_feature_subset = test_features.select(ablation_group_names)
+        if test_feature_columns != selected_feature_columns:
+            raise ValueError(f"Train and test feature matrices differ for groups {ablation_group_names}")
+        return selected_feature_columns, train_feature_subset, test_feature_subset
+
+    if group_map is None:
+        group_map = split_features_by_group(train_features, experiment_config)
+    selected_feature_columns = _columns_for_groups(group_map, ablation_group_names)
+    return (
+        selected_feature_columns,
+        train_features[selected_feature_columns],
+        test_features[selected_feature_columns],
+    )
+
+
+def _features_fingerprint(feature_subset: pd.DataFrame | np.ndarray, feature_columns: list[str]) -> str:
+    if isinstance(feature_subset, pd.DataFrame):
+        return frame_fingerprint(feature_subset)
+    return array_fingerprint(feature_subset, feature_columns)
+
+
+def _training_params(experiment_config: ExperimentConfig) -> dict:
+    return {
+        "maxent_params": experiment_config.maxent_params,
+        "use_richness_estimator": _trains_richness_estimator(experiment_config),
+        "richness_nbins": experiment_config.richness_nbins,
+    }
+
+
+def _trains_richness_estimator(experiment_config: ExperimentConfig) -> bool:
+    if experiment_config.richness_mode not in RICHNESS_MODES:
+        raise ValueError(f"Unknown richness_mode: {experiment_config.richness_mode!r}")
+    return experiment_config.use_richness_estimator and experiment_config.richness_mode == "estimator"
+
+
+def _fit_or_load_models(
+    experiment_config: ExperimentConfig,
+    cache: ModelCache | None,
+    cache_key: str | None,
+    train_feature_subset: pd.DataFrame | np.ndarray,
+    train_label_subset: pd.DataFrame,
+    top_species: list[str],
+    feature_columns: list[str],
+) -> tuple[Any, tuple | None]:
+    bundle = cache.load(cache_key) if cache is not None else None
+    if bundle is not None:
+        return bundle.models, bundle.richness_estimator
+
+    models = train_ovr(
+        train_feature_subset,
+        train_label_subset,
+        top_species,
+        experiment_config,
     )
+    richness_estimator = None
+    if _trains_richness_estimator(experiment_config):
+        richness_estimator = train_richness_estimator(
+            train_feature_subset,
+            train_label_subset,
+            experiment_config,
+        )
+    if cache is not None:
+        cache.store(
+            cache_key,
+            models,
+            top_species,
+            feature_columns,
+            richness_estimator=richness_estimator,
+        )
+    return models, richness_estimator
 
 
 def run_one_ablation(
     experiment_config: ExperimentConfig,
     ablation_group_names: list[str],
-    train_features: pd.DataFrame,
+    train_features: pd.DataFrame | FeatureMatrix,
     train_labels: pd.DataFrame,
-    test_features: pd.DataFrame,
+    test_features: pd.DataFrame | FeatureMatrix,
     test_labels: pd.DataFrame,
     all_species_column_names: list[str],
+    group_map: Dict[str, list[str]] | None = None,
+    top_species: list[str] | None = None,
+    n_threads: int | None = None,
 ) -> dict:
-    """Run a single ablation configuration and return the resulting metrics row."""
-    group_map = split_features_by_group(train_features, experiment_config)
-    selected_feature_columns = _columns_for_groups(group_map, ablation_group_names)
+    """Run a single ablation configuration and return the resulting metrics row.
+
+    When ``experiment_config.model_cache_dir`` is set, trained models and test
+    scores are reused for any previously seen combination of feature columns,
+    training data, selected species and training parameters. ``group_map``
+    and ``top_species`` may be passed precomputed when they are shared across
+    ablations. With a score-based ``experiment_config.richness_mode`` the
+    per-sample Top-K is derived from the test scores and no richness estimator
+    is trained. ``train_features`` and ``test_features`` may be
+    :class:`FeatureMatrix` objects, whose float32 columns are selected by
+    group position instead of copying DataFrame columns by name. ``n_threads``
+    bounds the threads used to score the test set (default: all CPUs).
+    """
+    selected_feature_columns, train_feature_subset, test_feature_subset = _feature_subsets(
+        experiment_config,
+        ablation_group_names,
+        train_features,
+        test_features,
+        group_map,
+    )
     if not selected_feature_columns:
         raise ValueError(f"No feature columns found for groups {ablation_group_names}")
 
-    top_species = select_top_species(train_labels, all_species_column_names, experiment_config)
+    if top_species is None:
+        top_species = select_top_species(train_labels, all_species_column_names, experiment_config)
     if not top_species:
         raise ValueError("No species passed the selection thresholds")
 
-    train_feature_subset = train_features[selected_feature_columns]
-    test_feature_subset = test_features[selected_feature_columns]
     train_label_subset = train_labels[
         [experiment_config.sample_id_col] + top_species
     ].set_index(experiment_config.sample_id_col)
@@ -77,21 +168,41 @@ def run_one_ablation(
         [experiment_config.sample_id_col] + top_species
     ].set_index(experiment_config.sample_id_col)
 
-    models = train_ovr(
+    cache = ModelCache(experiment_config.model_cache_dir) if experiment_config.model_cache_dir else None
+    cache_key = None
+    if cache is not None:
+        training_fingerprint = (
+            f"{_features_fingerprint(train_feature_subset, selected_feature_columns)}:"
+            f"{frame_fingerprint(train_label_subset)}"
+        )
+        cache_key = model_cache_key(
+            selected_feature_columns,
+            training_fingerprint,
+            top_species,
+            _training_params(experiment_config),
+        )
+    models, richness_estimator = _fit_or_load_models(
+        experiment_config,
+        cache,
+        cache_key,
         train_feature_subset,
         train_label_subset,
         top_species,
-        experiment_config,
+        selected_feature_columns,
     )
-    scores_test = predict_scores(models, test_feature_subset, top_species)
+
+    scores_test = None
+    if cache is not None:
+        test_fingerprint = _features_fingerprint(test_feature_subset, selected_feature_columns)
+        scores_test = cache.load_scores(cache_key, test_fingerprint)
+    if scores_test is None:
+        scores_test = predict_scores(models, test_feature_subset, top_species, n_threads=n_threads)
+        if cache is not None:
+            cache.store_scores(cache_key, test_fingerprint, scores_test)
     true_test = test_label_subset.values.astype(int)
 
-    if experiment_config.use_richness_estimator:
-        richness_clf, bin_edges, bin_to_mean = train_richness_estimator(
-            train_feature_subset,
-            train_label_subset,
-            experiment_config,
-        )
+    if richness_estimator is not None:
+        richness_clf, bin_edges, bin_to_mean = richness_estimator
         topk_per_sample = estimate_topk(
             richness_clf,
             bin_edges,
@@ -99,48 +210,203 @@ def run_one_ablation(
             test_feature_subset,
             offset=experiment_config.richness_offset,
         )
-        f1_score, recall_score = _weighted_metrics_for_variable_topk(
-            true_test,
+        topk_used = "per-sample"
+    elif experiment_config.use_richness_estimator:
+        topk_per_sample = estimate_topk_from_scores(
             scores_test,
-            topk_per_sample,
+            experiment_config.richness_mode,
+            offset=experiment_config.richness_offset,
         )
         topk_used = "per-sample"
     else:
-        f1_score = sample_f1_at_k(true_test, scores_test, experiment_config.fixed_top_k)
-        recall_score = sample_recall_at_k(true_test, scores_test, experiment_config.fixed_top_k)
+        topk_per_sample = experiment_config.fixed_top_k
         topk_used = experiment_config.fixed_top_k
+    topk_scores = sample_topk_metrics(true_test, scores_test, topk_per_sample)
 
     return {
         "groups": "+".join(ablation_group_names),
         "n_features": len(selected_feature_columns),
         "n_species": len(top_species),
         "AUC": macro_auc(true_test, scores_test),
-        "Recall": recall_score,
-        "Fs1": f1_score,
+        "Recall": topk_scores["recall"],
+        "Precision": topk_scores["precision"],
+        "Fs1": topk_scores["f1"],
         "TopK": topk_used,
     }
 
 
+def evaluate_in_batches(
+    models_by_species: Dict[str, Any],
+    features_matrix: pd.DataFrame | np.ndarray,
+    labels_matrix: pd.DataFrame | np.ndarray,
+    species_column_names: list[str],
+    topk: int | np.ndarray,
+    batch_size: int = 65536,
+    auc_bins: int = 1000,
+) -> dict[str, float]:
+    """Score and evaluate batch by batch without materializing full score matrices.
+
+    ``labels_matrix`` holds the species columns in ``species_column_names``
+    order, row-aligned with ``features_matrix``; ``topk`` is fixed or per-row.
+    """
+    topk_accumulator = TopKAccumulator()
+    auc_accumulator = MacroAUCAccumulator(len(species_column_names), n_bins=auc_bins)
+    per_row_k = np.ndim(topk) > 0
+    for rows, scores in iter_score_batches(
+        models_by_species,
+        features_matrix,
+        species_column_names,
+        batch_size=batch_size,
+    ):
+        if isinstance(labels_matrix, pd.DataFrame):
+            y_true = labels_matrix.iloc[rows].to_numpy(dtype=np.int8)
+        else:
+            y_true = np.asarray(labels_matrix[rows], dtype=np.int8)
+        topk_accumulator.update(y_true, scores, np.asarray(topk)[rows] if per_row_k else topk)
+        auc_accumulator.update(y_true, scores)
+    topk_scores = topk_accumulator.finalize()
+    return {
+        "AUC": auc_accumulator.finalize(),
+        "Recall": topk_scores["recall"],
+        "Precision": topk_scores["precision"],
+        "Fs1": topk_scores["f1"],
+    }
+
+
+def _worker_count(experiment_config: ExperimentConfig, n_pending: int) -> int:
+    cpu_budget = experiment_config.cpu_budget or os.cpu_count() or 1
+    return max(1, min(int(experiment_config.max_parallel_ablations), int(cpu_budget), n_pending))
+
+
+def _table_fingerprint(table: pd.DataFrame | FeatureMatrix) -> str:
+    if isinstance(table, FeatureMatrix):
+        return array_fingerprint(table.values, table.columns)
+    return frame_fingerprint(table)
+
+
+def _result_keys(
+    experiment_config: ExperimentConfig,
+    ablations: Dict[str, list[str]],
+    group_map: Dict[str, list[str]],
+    top_species: list[str],
+    tables: Sequence[pd.DataFrame | FeatureMatrix],
+) -> dict[str, str]:
+    """Key of each ablation's result row: its columns, the input tables, the species and the metric settings."""
+    data_fingerprint = ":".join(_table_fingerprint(table) for table in tables)
+    params = {
+        **_training_params(experiment_config),
+        "fixed_top_k": experiment_config.fixed_top_k,
+        "use_richness_estimator": experiment_config.use_richness_estimator,
+        "richness_mode": experiment_config.richness_mode,
+        "richness_offset": experiment_config.richness_offset,
+    }
+    return {
+        name: model_cache_key(_columns_for_groups(group_map, group_names), data_fingerprint, top_species, params)
+        for name, group_names in ablations.items()
+    }
+
+
+def _completed_rows(results_path: str | Path | None, result_keys: dict[str, str]) -> dict[str, dict]:
+    """Rows of ``results_path`` whose ``result_key`` still matches the ablation's current key."""
+    if results_path is None or not Path(results_path).exists():
+        return {}
+    completed = pd.read_csv(results_path, dtype={"result_key": str})
+    if "result_key" not in completed.columns:
+        return {}
+    return {
+        str(row["groups"]): row
+        for row in completed.to_dict(orient="records")
+        if result_keys.get(str(row["groups"])) == row["result_key"]
+    }
+
+
+def _append_result_row(results_path: str | Path, row: dict) -> None:
+    path = Path(results_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if not path.exists():
+        pd.DataFrame([row]).to_csv(path, index=False)
+        return
+    header = pd.read_csv(path, nrows=0).columns
+    if set(row) <= set(header):
+        pd.DataFrame([row]).reindex(columns=header).to_csv(path, mode="a", header=False, index=False)
+    else:
+        # The file predates one of the row's columns (e.g. ``result_key``): rewrite it once with the new header.
+        pd.concat([pd.read_csv(path), pd.DataFrame([row])], ignore_index=True).to_csv(path, index=False)
+
+
 def run_all(
     experiment_config: ExperimentConfig,
-    train_features: pd.DataFrame,
+    train_features: pd.DataFrame | FeatureMatrix,
     train_labels: pd.DataFrame,
-    test_features: pd.DataFrame,
+    test_features: pd.DataFrame | FeatureMatrix,
     test_labels: pd.DataFrame,
     species_column_names: list[str],
+    results_path: str | Path | None = None,
 ) -> pd.DataFrame:
-    """Run all configured ablations and return a consolidated result table."""
-    rows = []
-    for ablation_group_names in tqdm(experiment_config.ablations, desc="Ablations"):
-        rows.append(
-            run_one_ablation(
+    """Run all configured ablations and return a consolidated result table.
+
+    The feature group map and the species selection are computed once and
+    shared by every ablation. Up to ``experiment_config.max_parallel_ablations``
+    ablations run concurrently within ``experiment_config.cpu_budget`` cores.
+    With ``results_path``, each finished row is appended to that CSV as soon as
+    it completes and ablations already listed there are skipped, so an
+    interrupted run resumes where it stopped. Each row carries a
+    ``result_key`` hashing the ablation's feature columns, the input tables,
+    the selected species and the training and Top-K settings; rows whose key
+    no longer matches are run again. When an ablation fails, those
+    not yet started are cancelled, the running ones are awaited and recorded,
+    and the first error is raised. Pass :class:`FeatureMatrix`
+    features to convert them to float32 and index their groups only once.
+    """
+    ablations = {"+".join(group_names): list(group_names) for group_names in experiment_config.ablations}
+    if isinstance(train_features, FeatureMatrix):
+        group_map = train_features.group_map
+    else:
+        group_map = split_features_by_group(train_features, experiment_config)
+    top_species = select_top_species(train_labels, species_column_names, experiment_config)
+    result_keys = {}
+    if results_path is not None:
+        tables = (train_features, train_labels, test_features, test_labels)
+        result_keys = _result_keys(experiment_config, ablations, group_map, top_species, tables)
+    rows = _completed_rows(results_path, result_keys)
+    pending = {name: group_names for name, group_names in ablations.items() if name not in rows}
+
+    n_workers = _worker_count(experiment_config, len(pending))
+    n_threads = threads_per_worker(experiment_config, n_workers)
+    # BLAS limits are process-wide: holding one limit around the workers keeps their nested
+    # per-call limits from restoring each other's state out of order.
+    with threadpool_limits(limits=n_threads, user_api="blas"), ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = {
+            executor.submit(
+                run_one_ablation,
                 experiment_config,
-                ablation_group_names,
+                group_names,
                 train_features,
                 train_labels,
                 test_features,
                 test_labels,
                 species_column_names,
-            )
-        )
-    return pd.DataFrame(rows)
+                group_map=group_map,
+                top_species=top_species,
+                n_threads=n_threads,
+            ): name
+            for name, group_names in pending.items()
+        }
+        error = None
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Ablations"):
+            if future.cancelled():
+                continue
+            if future.exception() is not None:
+                if error is None:
+                    error = future.exception()
+                    for pending_future in futures:
+                        pending_future.cancel()
+                continue
+            row = future.result()
+            if results_path is not None:
+                row = {**row, "result_key": result_keys[futures[future]]}
+                _append_result_row(results_path, row)
+            rows[futures[future]] = row
+    if error is not None:
+        raise error
+    return pd.DataFrame([rows[name] for name in ablations])
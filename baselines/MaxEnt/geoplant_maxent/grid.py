@@ -0,0 +1,293 @@
+"""Prediction grids: stream tiles of a regular grid through features and scoring.
+
+A :class:`GridSpec` describes a north-up grid over an extent (e.g. the
+bioregions bounds) in EPSG:4326 degrees or in a projected equal-area CRS
+such as EPSG:3035. :func:`predict_grid` splits it into tiles, samples the
+predictors of each tile's cell centres through an injected sampler, builds
+the fitted features, scores them and writes every tile straight into
+memory-mapped ``.npy`` maps, so memory is bounded by the tile size.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+from threadpoolctl import threadpool_limits
+
+from .io_csv import FeatureBuilder
+from .model import pack_ovr_models, predict_packed_scores
+
+GRID_FORMAT_VERSION = 1
+
+GridSampler = Callable[[np.ndarray, np.ndarray], Dict[str, pd.DataFrame]]
+CellMetadata = Callable[[np.ndarray, np.ndarray], pd.DataFrame]
+
+
+def _get_pyproj():
+    try:
+        import pyproj
+    except ImportError as exc:  # pragma: no cover - exercised only without the optional dependency
+        raise ImportError("Projected prediction grids require pyproj (`pip install pyproj`).") from exc
+    return pyproj
+
+
+@dataclass(frozen=True)
+class GridSpec:
+    """North-up grid of ``resolution``-sized cells covering ``[west, east] x [south, north]``."""
+
+    west: float
+    south: float
+    east: float
+    north: float
+    resolution: float
+    crs: str = "EPSG:4326"
+
+    def __post_init__(self):
+        if self.resolution <= 0:
+            raise ValueError("resolution must be positive")
+        if self.east <= self.west or self.north <= self.south:
+            raise ValueError("Grid bounds must satisfy west < east and south < north")
+
+    @classmethod
+    def from_bounds(cls, bounds, resolution: float, crs: str = "EPSG:4326") -> "GridSpec":
+        """Build a grid from ``(west, south, east, north)``, e.g. ``polygons.total_bounds``."""
+        west, south, east, north = (float(value) for value in bounds)
+        return cls(west, south, east, north, float(resolution), crs)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (
+            int(np.ceil((self.north - self.south) / self.resolution)),
+            int(np.ceil((self.east - self.west) / self.resolution)),
+        )
+
+    def tiles(self, tile_size: int = 256) -> list[tuple[slice, slice]]:
+        """Row and column slices of the ``tile_size`` x ``tile_size`` tiles, row-major."""
+        n_rows, n_cols = self.shape
+        return [
+            (slice(row, min(row + tile_size, n_rows)), slice(col, min(col + tile_size, n_cols)))
+            for row in range(0, n_rows, tile_size)
+            for col in range(0, n_cols, tile_size)
+        ]
+
+    def cell_ids(self, rows: slice, cols: slice) -> np.ndarray:
+        """Row-major cell ids of a tile; they increase along the tile's rows and columns."""
+        row_index = np.arange(rows.start, rows.stop)[:, None]
+        col_index = np.arange(cols.start, cols.stop)[None, :]
+        return (row_index * self.shape[1] + col_index).ravel()
+
+    def cell_centers(self, rows: slice, cols: slice) -> tuple[np.ndarray, np.ndarray]:
+        """Longitude and latitude of the cell centres of a tile, row-major."""
+        x = self.west + (np.arange(cols.start, cols.stop) + 0.5) * self.resolution
+        y = self.north - (np.arange(rows.start, rows.stop) + 0.5) * self.resolution
+        xs, ys = (values.ravel() for values in np.meshgrid(x, y))
+        if self.crs.upper() in ("EPSG:4326", "WGS84"):
+            return xs, ys
+        transformer = _get_pyproj().Transformer.from_crs(self.crs, "EPSG:4326", always_xy=True)
+        return transformer.transform(xs, ys)
+
+
+def _index_dtype(n_species: int) -> type:
+    return np.int16 if n_species <= np.iinfo(np.int16).max + 1 else np.int32
+
+
+def _open_map(path: Path, shape: tuple[int, ...], dtype) -> np.memmap:
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+
+def _tile_metadata(
+    feature_builder: FeatureBuilder,
+    cell_metadata: CellMetadata | None,
+    cell_ids: np.ndarray,
+    longitudes: np.ndarray,
+    latitudes: np.ndarray,
+) -> pd.DataFrame:
+    """Survey-like metadata of the cells: id, cell centre and any ``cell_metadata`` columns."""
+    metadata = pd.DataFrame({"lat": latitudes, "lon": longitudes})
+    if cell_metadata is not None:
+        extra = cell_metadata(longitudes, latitudes)
+        if len(extra) != cell_ids.size:
+            raise ValueError(f"cell_metadata returned {len(extra)} rows, expected {cell_ids.size}")
+        for column in extra.columns:
+            metadata[column] = extra[column].to_numpy()
+    metadata[feature_builder.source_sample_id_col] = cell_ids
+    return metadata
+
+
+def _feature_positions(feature_builder: FeatureBuilder, feature_columns: Sequence[str] | None) -> np.ndarray | None:
+    """Positions of the model's ``feature_columns`` among the builder's; None when they are identical."""
+    if feature_columns is None or list(feature_columns) == feature_builder.feature_columns:
+        return None
+    positions = pd.Index(feature_builder.feature_columns).get_indexer(list(feature_columns))
+    if (positions < 0).any():
+        missing = [column for column, position in zip(feature_columns, positions) if position < 0]
+        raise ValueError(f"The feature builder does not produce the model columns {missing[:5]}")
+    return positions
+
+
+def _with_ids(predictors_by_name: Dict[str, pd.DataFrame], cell_ids: np.ndarray) -> Dict[str, pd.DataFrame]:
+    tables = {}
+    for name, predictors in predictors_by_name.items():
+        if len(predictors) != cell_ids.size:
+            raise ValueError(f"Sampler returned {len(predictors)} rows for `{name}`, expected {cell_ids.size}")
+        table = predictors.reset_index(drop=True).drop(columns="surveyId", errors="ignore")
+        table.insert(0, "surveyId", cell_ids)
+        tables[name] = table
+    return tables
+
+
+def _tile_scorer(models_by_species: Dict[str, Any], species_column_names: list[str]) -> Callable:
+    """Pack the heads once so every tile costs a single matrix product."""
+    packed_model = pack_ovr_models(models_by_species, species_column_names)
+    return lambda features: predict_packed_scores(packed_model, features)
+
+
+def _tile_features(
+    grid: GridSpec,
+    sampler: GridSampler,
+    feature_builder: FeatureBuilder,
+    feature_columns: Sequence[str] | None = None,
+    cell_metadata: CellMetadata | None = None,
+) -> Callable[[slice, slice], np.ndarray]:
+    """Return a function building the model features of one tile, in ``feature_columns`` order.
+
+    Cell ids increase row-major, so the collapsed metadata rows keep tile
+    order. Metadata columns feeding the model that neither the cell centre
+    nor ``cell_metadata`` provides raise instead of scoring missing values.
+    """
+    positions = _feature_positions(feature_builder, feature_columns)
+    required = feature_builder.metadata_columns(feature_columns)
+
+    def features(rows: slice, cols: slice) -> np.ndarray:
+        cell_ids = grid.cell_ids(rows, cols)
+        longitudes, latitudes = (np.asarray(values) for values in grid.cell_centers(rows, cols))
+        metadata = _tile_metadata(feature_builder, cell_metadata, cell_ids, longitudes, latitudes)
+        missing = [column for column in required if column not in metadata.columns]
+        if missing:
+            raise ValueError(
+                f"The model uses metadata columns {missing} that grid cells do not have; "
+                "provide them with cell_metadata"
+            )
+        predictors_by_name = _with_ids(sampler(longitudes, latitudes), cell_ids)
+        _, matrix = feature_builder.transform_matrix(metadata, predictors_by_name)
+        return matrix if positions is None else matrix[:, positions]
+
+    return features
+
+
+def iter_grid_scores(
+    grid: GridSpec,
+    sampler: GridSampler,
+    feature_builder: FeatureBuilder,
+    models_by_species: Dict[str, Any],
+    species_column_names: list[str],
+    tile_size: int = 256,
+    feature_columns: Sequence[str] | None = None,
+    cell_metadata: CellMetadata | None = None,
+) -> Iterator[tuple[slice, slice, np.ndarray]]:
+    """Yield ``(rows, cols, scores)`` per tile; ``scores`` is ``(tile cells, species)`` row-major.
+
+    ``feature_columns`` and ``cell_metadata`` are as in :func:`predict_grid`.
+    """
+    tile_features = _tile_features(grid, sampler, feature_builder, feature_columns, cell_metadata)
+    score = _tile_scorer(models_by_species, species_column_names)
+    for rows, cols in grid.tiles(tile_size):
+        yield rows, cols, score(tile_features(rows, cols))
+
+
+def predict_grid(
+    grid: GridSpec,
+    sampler: GridSampler,
+    feature_builder: FeatureBuilder,
+    models_by_species: Dict[str, Any],
+    species_column_names: list[str],
+    output_dir: str | Path,
+    tile_size: int = 256,
+    topk: int | None = None,
+    write_probabilities: bool = True,
+    probability_dtype=np.float16,
+    n_workers: int = 1,
+    feature_columns: Sequence[str] | None = None,
+    cell_metadata: CellMetadata | None = None,
+    n_threads: int | None = None,
+) -> dict:
+    """Score every grid cell and write species maps tile by tile.
+
+    ``sampler(longitudes, latitudes)`` returns the predictor families expected
+    by ``feature_builder`` (one row per cell, in order), e.g. a wrapper around
+    raster point sampling. ``feature_columns`` are the columns the models were
+    trained on (e.g. ``ModelBundle.feature_columns`` or an ablation's subset),
+    selected from the builder's features; by default all of them. Cells only
+    know their centre ``lat``/``lon``: other metadata used by the models, such
+    as ``year``, must come from ``cell_metadata(longitudes, latitudes)``,
+    which returns one row per cell, or a ValueError is raised. Outputs in
+    ``output_dir``:
+
+    - ``probabilities.npy``: ``(species, rows, cols)`` probabilities;
+    - ``topk.npy``: ``(topk, rows, cols)`` species indices, best first (int16,
+      or int32 beyond 32767 species);
+    - ``grid.json``: grid, species order and the files written.
+
+    Tiles are scored on ``n_workers`` threads; each one writes its own window
+    of the memory-mapped outputs, so at most ``n_workers`` tiles are in memory.
+    ``n_threads`` (default: all CPUs) is split between the concurrent tiles.
+    Returns the ``grid.json`` content.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    n_rows, n_cols = grid.shape
+    n_species = len(species_column_names)
+    if not write_probabilities and not topk:
+        raise ValueError("Nothing to write: enable write_probabilities or set topk")
+    if topk is not None and not 0 < int(topk) <= n_species:
+        raise ValueError(f"topk must be between 1 and {n_species}")
+
+    files = {}
+    probabilities = topk_map = None
+    if write_probabilities:
+        probabilities = _open_map(output_dir / "probabilities.npy", (n_species, n_rows, n_cols), probability_dtype)
+        files["probabilities"] = "probabilities.npy"
+    if topk:
+        topk_map = _open_map(output_dir / "topk.npy", (int(topk), n_rows, n_cols), _index_dtype(n_species))
+        files["topk"] = "topk.npy"
+
+    n_workers = max(1, int(n_workers))
+    tile_threads = max(1, int(n_threads or os.cpu_count() or 1) // n_workers)
+    tile_features = _tile_features(grid, sampler, feature_builder, feature_columns, cell_metadata)
+    score = _tile_scorer(models_by_species, species_column_names)
+
+    def run_tile(tile: tuple[slice, slice]) -> None:
+        rows, cols = tile
+        scores = score(tile_features(rows, cols))
+        tile_shape = (rows.stop - rows.start, cols.stop - cols.start)
+        if probabilities is not None:
+            probabilities[:, rows, cols] = scores.T.reshape(n_species, *tile_shape)
+        if topk_map is not None:
+            best = np.argpartition(-scores, int(topk) - 1, axis=1)[:, : int(topk)]
+            best = np.take_along_axis(best, np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1), axis=1)
+            topk_map[:, rows, cols] = best.T.reshape(int(topk), *tile_shape)
+
+    # BLAS limits are process-wide, so the budget is set once around all tile workers.
+    with threadpool_limits(limits=tile_threads, user_api="blas"), ThreadPoolExecutor(max_workers=n_workers) as executor:
+        list(executor.map(run_tile, grid.tiles(tile_size)))
+    for output in (probabilities, topk_map):
+        if output is not None:
+            output.flush()
+
+    sidecar = {
+        "format_version": GRID_FORMAT_VERSION,
+        "grid": asdict(grid),
+        "shape": [n_rows, n_cols],
+        "transform": [grid.resolution, 0.0, grid.west, 0.0, -grid.resolution, grid.north],
+        "species": list(species_column_names),
+        "files": files,
+    }
+    (output_dir / "grid.json").write_text(json.dumps(sidecar, indent=2), encoding="utf-8")
+    return sidecar
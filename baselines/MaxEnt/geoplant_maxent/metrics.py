@@ -3,43 +3,206 @@
 from __future__ import annotations
 
 import numpy as np
-from sklearn.metrics import roc_auc_score
+
+DEFAULT_AUC_SPECIES_CHUNK = 256
+
+
+def topk_row_statistics(
+    y_true_binary: np.ndarray,
+    y_scores: np.ndarray,
+    k: int | np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per-row true positives, selection size and positives for Top-K predictions.
+
+    ``k`` is a single value or one value per row. Each row is ranked once up
+    to the largest K and the true positives at every row's own K are read from
+    a cumulative sum of hits, so no dense prediction matrix is allocated.
+    """
+    n_samples, n_species = y_scores.shape
+    k_values = np.clip(np.broadcast_to(np.asarray(k, dtype=np.int64), (n_samples,)), 1, n_species)
+    positives = (y_true_binary != 0).sum(axis=1)
+    if n_samples == 0:
+        return np.zeros(0, dtype=np.int64), k_values, positives
+
+    k_max = int(k_values.max())
+    if k_max < n_species:
+        candidates = np.argpartition(-y_scores, kth=k_max - 1, axis=1)[:, :k_max]
+    else:
+        candidates = np.broadcast_to(np.arange(n_species), (n_samples, n_species))
+    candidate_scores = np.take_along_axis(y_scores, candidates, axis=1)
+    ranking = np.take_along_axis(candidates, np.argsort(-candidate_scores, axis=1, kind="stable"), axis=1)
+    cumulative_hits = np.cumsum(np.take_along_axis(y_true_binary, ranking, axis=1) != 0, axis=1)
+    true_positives = cumulative_hits[np.arange(n_samples), k_values - 1]
+    return true_positives, k_values, positives
+
+
+def _topk_row_metrics(
+    true_positives: np.ndarray,
+    selected: np.ndarray,
+    positives: np.ndarray,
+) -> dict[str, np.ndarray]:
+    false_positives = selected - true_positives
+    false_negatives = positives - true_positives
+    return {
+        "f1": true_positives / (true_positives + 0.5 * (false_positives + false_negatives) + 1e-12),
+        "recall": true_positives / positives.clip(min=1),
+        "precision": true_positives / selected,
+    }
+
+
+def sample_topk_metrics(
+    y_true_binary: np.ndarray,
+    y_scores: np.ndarray,
+    k: int | np.ndarray,
+) -> dict[str, float]:
+    """Sample-averaged F1, recall and precision for a fixed or per-sample Top-K."""
+    true_positives, selected, positives = topk_row_statistics(y_true_binary, y_scores, k)
+    if true_positives.size == 0:
+        return {"f1": float("nan"), "recall": float("nan"), "precision": float("nan")}
+    row_metrics = _topk_row_metrics(true_positives, selected, positives)
+    return {name: float(values.mean()) for name, values in row_metrics.items()}
 
 
 def sample_f1_at_k(y_true_binary: np.ndarray, y_scores: np.ndarray, k: int) -> float:
     """Sample-averaged F1 computed from per-sample Top-K predictions."""
-    n_samples, n_species = y_true_binary.shape
-    k = max(1, min(int(k), n_species))
-    topk_idx = np.argpartition(-y_scores, kth=k - 1, axis=1)[:, :k]
-    y_pred = np.zeros_like(y_true_binary, dtype=np.int32)
-    row_index = np.arange(n_samples)[:, None]
-    y_pred[row_index, topk_idx] = 1
-    tp = (y_pred & y_true_binary).sum(axis=1)
-    fp = (y_pred & (1 - y_true_binary)).sum(axis=1)
-    fn = ((1 - y_pred) & y_true_binary).sum(axis=1)
-    score = tp / (tp + 0.5 * (fp + fn) + 1e-12)
-    return float(score.mean())
+    return sample_topk_metrics(y_true_binary, y_scores, k)["f1"]
 
 
 def sample_recall_at_k(y_true_binary: np.ndarray, y_scores: np.ndarray, k: int) -> float:
     """Sample-averaged recall at Top-K."""
-    n_samples, n_species = y_true_binary.shape
-    k = max(1, min(int(k), n_species))
-    topk_idx = np.argpartition(-y_scores, kth=k - 1, axis=1)[:, :k]
-    y_pred = np.zeros_like(y_true_binary, dtype=np.int32)
-    row_index = np.arange(n_samples)[:, None]
-    y_pred[row_index, topk_idx] = 1
-    tp = (y_pred & y_true_binary).sum(axis=1)
-    positives = y_true_binary.sum(axis=1).clip(min=1)
-    return float((tp / positives).mean())
-
-
-def macro_auc(y_true_binary: np.ndarray, y_scores: np.ndarray) -> float:
+    return sample_topk_metrics(y_true_binary, y_scores, k)["recall"]
+
+
+def _rank_auc(y_true_binary: np.ndarray, y_scores: np.ndarray) -> np.ndarray:
+    """Mann-Whitney ROC-AUC of each column, with average ranks for tied scores."""
+    n_samples, n_species = y_scores.shape
+    scores_by_species = np.ascontiguousarray(y_scores.T)
+    order = np.argsort(scores_by_species, axis=1)
+    sorted_scores = np.take_along_axis(scores_by_species, order, axis=1)
+    sorted_truth = np.take_along_axis(np.ascontiguousarray(y_true_binary.T) != 0, order, axis=1)
+
+    group_starts = np.ones((n_species, n_samples), dtype=bool)
+    group_starts[:, 1:] = sorted_scores[:, 1:] != sorted_scores[:, :-1]
+    group_starts = group_starts.ravel()
+    group_ids = np.cumsum(group_starts) - 1
+    group_sizes = np.bincount(group_ids)
+    average_ranks = np.flatnonzero(group_starts) % n_samples + (group_sizes + 1) / 2.0
+
+    positive_flat = np.flatnonzero(sorted_truth.ravel())
+    n_positive = sorted_truth.sum(axis=1)
+    n_negative = n_samples - n_positive
+    positive_rank_sums = np.bincount(
+        positive_flat // n_samples,
+        weights=average_ranks[group_ids[positive_flat]],
+        minlength=n_species,
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        aucs = (positive_rank_sums - n_positive * (n_positive + 1) / 2.0) / (n_positive * n_negative)
+    aucs[(n_positive == 0) | (n_negative == 0)] = np.nan
+    return aucs
+
+
+def per_species_auc(
+    y_true_binary: np.ndarray,
+    y_scores: np.ndarray,
+    species_chunk_size: int | None = DEFAULT_AUC_SPECIES_CHUNK,
+) -> np.ndarray:
+    """ROC-AUC of every species column; NaN where only one class is present.
+
+    Columns are ranked together in blocks of ``species_chunk_size`` species, so
+    the work arrays stay ``n_samples x species_chunk_size`` and memory-mapped
+    inputs larger than memory can be evaluated block by block. ``None`` ranks
+    every species at once, which is faster but needs several full-size arrays.
+    """
+    n_species = y_true_binary.shape[1]
+    chunk_size = n_species if species_chunk_size is None else max(1, int(species_chunk_size))
+    aucs = np.full(n_species, np.nan)
+    for start in range(0, n_species, max(1, chunk_size)):
+        stop = min(start + chunk_size, n_species)
+        aucs[start:stop] = _rank_auc(
+            np.asarray(y_true_binary[:, start:stop]),
+            np.asarray(y_scores[:, start:stop]),
+        )
+    return aucs
+
+
+def macro_auc(
+    y_true_binary: np.ndarray,
+    y_scores: np.ndarray,
+    species_chunk_size: int | None = DEFAULT_AUC_SPECIES_CHUNK,
+) -> float:
     """Macro-average ROC-AUC across species with both classes present."""
-    aucs = []
-    for index in range(y_true_binary.shape[1]):
-        targets = y_true_binary[:, index]
-        if len(np.unique(targets)) < 2:
-            continue
-        aucs.append(roc_auc_score(targets, y_scores[:, index]))
-    return float(np.mean(aucs)) if aucs else float("nan")
+    aucs = per_species_auc(y_true_binary, y_scores, species_chunk_size=species_chunk_size)
+    aucs = aucs[~np.isnan(aucs)]
+    return float(aucs.mean()) if aucs.size else float("nan")
+
+
+class TopKAccumulator:
+    """Streaming sample-averaged F1, recall and precision at Top-K.
+
+    Call :meth:`update` once per batch of rows and :meth:`finalize` at the end;
+    the result equals :func:`sample_topk_metrics` on the concatenated batches.
+    """
+
+    def __init__(self) -> None:
+        self.n_samples = 0
+        self._sums = {"f1": 0.0, "recall": 0.0, "precision": 0.0}
+
+    def update(self, y_true_binary: np.ndarray, y_scores: np.ndarray, k: int | np.ndarray) -> None:
+        row_metrics = _topk_row_metrics(*topk_row_statistics(y_true_binary, y_scores, k))
+        for name, values in row_metrics.items():
+            self._sums[name] += float(values.sum())
+        self.n_samples += int(y_scores.shape[0])
+
+    def finalize(self) -> dict[str, float]:
+        if self.n_samples == 0:
+            return {name: float("nan") for name in self._sums}
+        return {name: total / self.n_samples for name, total in self._sums.items()}
+
+
+class MacroAUCAccumulator:
+    """Streaming macro ROC-AUC from per-species positive/negative score histograms.
+
+    Scores are counted into ``n_bins`` equal-width bins over ``score_range``
+    and pairs falling in the same bin count as ties, so the result matches
+    :func:`macro_auc` up to the share of positive/negative pairs that share a
+    bin. Memory is ``2 x n_species x n_bins`` counts, whatever the row count.
+    """
+
+    def __init__(
+        self,
+        n_species: int,
+        n_bins: int = 1000,
+        score_range: tuple[float, float] = (0.0, 1.0),
+    ) -> None:
+        self.n_species = int(n_species)
+        self.n_bins = int(n_bins)
+        self.score_range = (float(score_range[0]), float(score_range[1]))
+        self._positive = np.zeros((self.n_species, self.n_bins), dtype=np.int64)
+        self._negative = np.zeros((self.n_species, self.n_bins), dtype=np.int64)
+
+    def update(self, y_true_binary: np.ndarray, y_scores: np.ndarray) -> None:
+        low, high = self.score_range
+        bins = ((np.asarray(y_scores, dtype=np.float64) - low) / (high - low) * self.n_bins).astype(np.int64)
+        np.clip(bins, 0, self.n_bins - 1, out=bins)
+        bins += np.arange(self.n_species, dtype=np.int64) * self.n_bins
+        positive = np.asarray(y_true_binary) != 0
+        size = self.n_species * self.n_bins
+        self._positive += np.bincount(bins[positive], minlength=size).reshape(self._positive.shape)
+        self._negative += np.bincount(bins[~positive], minlength=size).reshape(self._negative.shape)
+
+    def per_species(self) -> np.ndarray:
+        """Per-species AUC; NaN where a class was never observed."""
+        n_positive = self._positive.sum(axis=1)
+        n_negative = self._negative.sum(axis=1)
+        negatives_below = np.cumsum(self._negative, axis=1) - self._negative
+        wins = (self._positive * (negatives_below + 0.5 * self._negative)).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            aucs = wins / (n_positive * n_negative)
+        aucs[(n_positive == 0) | (n_negative == 0)] = np.nan
+        return aucs
+
+    def finalize(self) -> float:
+        aucs = self.per_species()
+        aucs = aucs[~np.isnan(aucs)]
+        return float(aucs.mean()) if aucs.size else float("nan")
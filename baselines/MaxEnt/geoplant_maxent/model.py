@@ -6,7 +6,10 @@ from typing import Any, Dict
 
 import numpy as np
 import pandas as pd
+from scipy import sparse
+from scipy.special import expit
 from sklearn.linear_model import LogisticRegression
+from threadpoolctl import threadpool_limits
 from tqdm.auto import tqdm
 
 from .config import ExperimentConfig
@@ -25,21 +28,58 @@ def _make_multiclass_classifier(cfg: ExperimentConfig) -> LogisticRegression:
     return LogisticRegression(**params)
 
 
+def _as_float32_matrix(
+    features: pd.DataFrame | np.ndarray | sparse.spmatrix,
+) -> np.ndarray | sparse.csr_matrix:
+    """Return ``features`` as a float32 array, keeping sparse input in CSR form."""
+    if sparse.issparse(features):
+        return sparse.csr_matrix(features, dtype=np.float32)
+    return np.asarray(features, dtype=np.float32)
+
+
+def _standardize(
+    feature_array: np.ndarray | sparse.csr_matrix,
+    copy: bool = True,
+) -> tuple[np.ndarray | sparse.csr_matrix, np.ndarray, np.ndarray]:
+    """Scale columns to unit variance; dense input is also centered.
+
+    Sparse input is scaled without centering so that it stays sparse; its
+    ``means`` are zero. ``copy=False`` standardizes a dense array in place.
+    """
+    if sparse.issparse(feature_array):
+        column_means = np.asarray(feature_array.mean(axis=0)).ravel()
+        squared_means = np.asarray(feature_array.multiply(feature_array).mean(axis=0)).ravel()
+        stds = np.sqrt(np.maximum(squared_means - column_means**2, 0.0)).astype(np.float32)
+        stds = np.where(stds == 0.0, 1.0, stds)
+        means = np.zeros_like(stds)
+        return sparse.csr_matrix(feature_array.multiply(1.0 / stds), dtype=np.float32), means, stds
+    means = feature_array.mean(axis=0)
+    stds = feature_array.std(axis=0)
+    stds = np.where(stds == 0.0, 1.0, stds)
+    if not copy:
+        feature_array -= means
+        feature_array /= stds
+        return feature_array, means, stds
+    return (feature_array - means) / stds, means, stds
+
+
 def _fit_standardized_model(
     model: LogisticRegression,
     feature_array: np.ndarray,
     targets: np.ndarray,
 ) -> dict[str, Any]:
-    means = feature_array.mean(axis=0)
-    stds = feature_array.std(axis=0)
-    stds = np.where(stds == 0.0, 1.0, stds)
-    X_scaled = (feature_array - means) / stds
+    X_scaled, means, stds = _standardize(feature_array)
     model.fit(X_scaled, targets)
     return {"model": model, "means": means, "stds": stds}
 
 
-def _transform(features_matrix: pd.DataFrame, trained_object: dict[str, Any]) -> np.ndarray:
-    feature_array = features_matrix.values.astype(np.float32)
+def _transform(
+    features_matrix: pd.DataFrame | np.ndarray | sparse.spmatrix,
+    trained_object: dict[str, Any],
+) -> np.ndarray | sparse.csr_matrix:
+    feature_array = _as_float32_matrix(features_matrix)
+    if sparse.issparse(feature_array):
+        return sparse.csr_matrix(feature_array.multiply(1.0 / trained_object["stds"]), dtype=np.float32)
     return (feature_array - trained_object["means"]) / trained_object["stds"]
 
 
@@ -52,49 +92,164 @@ class _ConstantPredictor:
 
 
 def train_ovr(
-    train_features: pd.DataFrame,
+    train_features: pd.DataFrame | np.ndarray | sparse.spmatrix,
     train_labels: pd.DataFrame,
     species_column_names: list[str],
     cfg: ExperimentConfig,
+    rows: np.ndarray | None = None,
 ) -> Dict[str, dict[str, Any]]:
-    """Train one-vs-rest MaxEnt classifiers for the selected species columns."""
-    feature_array = train_features.values.astype(np.float32)
+    """Train one-vs-rest MaxEnt classifiers for the selected species columns.
+
+    The feature matrix is standardized once and shared by every species model.
+    Sparse input (e.g. from :class:`~geoplant_maxent.encoding.SparseOneHotEncoder`)
+    is scaled without centering and never densified. ``rows`` restricts
+    training to those rows of ``train_features`` and ``train_labels`` (e.g.
+    the training folds of a cross-validation split); they are gathered once
+    and standardized in place, so the selection costs no extra copy.
+    """
+    feature_array = _as_float32_matrix(train_features)
+    if rows is None:
+        X_scaled, means, stds = _standardize(feature_array)
+    else:
+        X_scaled, means, stds = _standardize(feature_array[np.asarray(rows)], copy=False)
     models: Dict[str, dict[str, Any]] = {}
     for species_name in tqdm(species_column_names, desc="Training MaxEnt models", leave=False):
         target = train_labels[species_name].values.astype(np.int32)
+        if rows is not None:
+            target = target[rows]
         if target.max() == 0 or np.unique(target).size < 2:
             continue
-        models[species_name] = _fit_standardized_model(
-            _make_binary_classifier(cfg),
-            feature_array,
-            target,
-        )
+        model = _make_binary_classifier(cfg)
+        model.fit(X_scaled, target)
+        models[species_name] = {"model": model, "means": means, "stds": stds}
     return models
 
 
-def predict_scores(
+def pack_ovr_models(
     models_by_species: Dict[str, dict[str, Any]],
-    features_matrix: pd.DataFrame,
     species_column_names: list[str],
-) -> np.ndarray:
-    """Predict class-1 probabilities in the given species order."""
-    scores = np.zeros((len(features_matrix), len(species_column_names)), dtype=np.float32)
-    for index, species_name in enumerate(species_column_names):
-        trained = models_by_species.get(species_name)
+    n_features: int | None = None,
+) -> dict[str, Any]:
+    """Stack per-species logistic heads into one ``d x S`` float32 coefficient matrix.
+
+    Every head is re-expressed in the standardized space of the first trained
+    species, so a single scaler and a single matrix product score all species.
+    Species without a trained model keep a zero column and are masked to 0.
+    When no species has a model the pack has no fitted column and scores all
+    zeros, like :func:`predict_scores`; ``n_features`` then sets ``d``
+    (default 0).
+    """
+    trained_models = [models_by_species.get(species_name) for species_name in species_column_names]
+    reference = next((trained for trained in trained_models if trained is not None), None)
+    if reference is None:
+        width = int(n_features or 0)
+        reference = {"means": np.zeros(width), "stds": np.ones(width)}
+
+    means = np.asarray(reference["means"], dtype=np.float64)
+    stds = np.asarray(reference["stds"], dtype=np.float64)
+    coef = np.zeros((means.size, len(species_column_names)), dtype=np.float64)
+    intercept = np.zeros(len(species_column_names), dtype=np.float64)
+    fitted = np.zeros(len(species_column_names), dtype=bool)
+    for index, trained in enumerate(trained_models):
         if trained is None:
             continue
-        feature_array = _transform(features_matrix, trained)
-        scores[:, index] = trained["model"].predict_proba(feature_array)[:, 1]
+        raw_coef = trained["model"].coef_.ravel() / trained["stds"]
+        coef[:, index] = raw_coef * stds
+        intercept[index] = trained["model"].intercept_[0] + np.dot(means - trained["means"], raw_coef)
+        fitted[index] = True
+    return {
+        "species": list(species_column_names),
+        "means": means.astype(np.float32),
+        "stds": stds.astype(np.float32),
+        "coef": np.ascontiguousarray(coef, dtype=np.float32),
+        "intercept": intercept.astype(np.float32),
+        "fitted": fitted,
+    }
+
+
+def predict_packed_scores(
+    packed_model: dict[str, Any],
+    features_matrix: pd.DataFrame | np.ndarray | sparse.spmatrix,
+    chunk_size: int = 16384,
+) -> np.ndarray:
+    """Score all species as ``sigmoid(X_std @ W + b)`` in row chunks of ``chunk_size``.
+
+    Sparse input is not standardized explicitly; the scaler is folded into the
+    coefficients so each chunk costs one sparse-dense product.
+    """
+    n_samples = features_matrix.shape[0]
+    scores = np.zeros((n_samples, len(packed_model["species"])), dtype=np.float32)
+    if not np.any(packed_model["fitted"]):
+        return scores
+    if sparse.issparse(features_matrix):
+        features_matrix = sparse.csr_matrix(features_matrix)
+        folded_coef = packed_model["coef"] / packed_model["stds"][:, None]
+        folded_intercept = packed_model["intercept"] - (
+            packed_model["means"] / packed_model["stds"]
+        ) @ packed_model["coef"]
+    for start in range(0, n_samples, max(1, int(chunk_size))):
+        stop = min(start + int(chunk_size), n_samples)
+        if sparse.issparse(features_matrix):
+            logits = np.asarray(features_matrix[start:stop] @ folded_coef, dtype=np.float32)
+            logits += folded_intercept
+            scores[start:stop] = expit(logits, out=logits)
+            continue
+        if isinstance(features_matrix, pd.DataFrame):
+            block = features_matrix.iloc[start:stop].to_numpy(dtype=np.float32, copy=True)
+        else:
+            block = np.array(features_matrix[start:stop], dtype=np.float32)
+        block -= packed_model["means"]
+        block /= packed_model["stds"]
+        logits = block @ packed_model["coef"]
+        logits += packed_model["intercept"]
+        scores[start:stop] = expit(logits, out=logits)
+    scores[:, ~packed_model["fitted"]] = 0.0
     return scores
 
 
+def predict_scores(
+    models_by_species: Dict[str, dict[str, Any]],
+    features_matrix: pd.DataFrame | np.ndarray | sparse.spmatrix,
+    species_column_names: list[str],
+    n_threads: int | None = None,
+) -> np.ndarray:
+    """Predict class-1 probabilities in the given species order.
+
+    ``n_threads`` caps the BLAS threads of the scoring product (default: unchanged).
+    """
+    if not any(species_name in models_by_species for species_name in species_column_names):
+        return np.zeros((features_matrix.shape[0], len(species_column_names)), dtype=np.float32)
+    packed_model = pack_ovr_models(models_by_species, species_column_names)
+    with threadpool_limits(limits=n_threads, user_api="blas"):
+        return predict_packed_scores(packed_model, features_matrix)
+
+
+def _bin_mean_lookup(bins: np.ndarray, richness: np.ndarray) -> np.ndarray:
+    """Return a dense array whose entry ``b`` is the mean richness of bin ``b`` (0 when empty)."""
+    counts = np.bincount(bins)
+    sums = np.bincount(bins, weights=richness, minlength=counts.size)
+    return np.divide(sums, counts, out=np.zeros(counts.size, dtype=np.float64), where=counts > 0)
+
+
+def _as_bin_lookup(bin_to_mean_richness: np.ndarray | dict[int, float]) -> np.ndarray:
+    if isinstance(bin_to_mean_richness, dict):
+        lookup = np.zeros(max(bin_to_mean_richness, default=-1) + 1, dtype=np.float64)
+        lookup[list(bin_to_mean_richness)] = list(bin_to_mean_richness.values())
+        return lookup
+    return np.asarray(bin_to_mean_richness, dtype=np.float64)
+
+
 def train_richness_estimator(
-    train_features: pd.DataFrame,
+    train_features: pd.DataFrame | np.ndarray | sparse.spmatrix,
     train_labels: pd.DataFrame,
     cfg: ExperimentConfig,
     nbins: int | None = None,
-) -> tuple[dict[str, Any], np.ndarray, dict[int, float]]:
-    """Train a multiclass MaxEnt classifier that predicts sample richness bins."""
+) -> tuple[dict[str, Any], np.ndarray, np.ndarray]:
+    """Train a multiclass MaxEnt classifier that predicts sample richness bins.
+
+    Returns the classifier, the bin edges and a dense lookup array mapping each
+    bin index to the mean training richness of that bin.
+    """
     richness = train_labels.sum(axis=1).values.astype(np.int32)
     effective_nbins = int(nbins or cfg.richness_nbins)
     quantiles = np.linspace(0, 1, effective_nbins + 1)
@@ -105,36 +260,73 @@ def train_richness_estimator(
     else:
         bin_edges[0] = -0.5
         bins = np.digitize(richness, bin_edges[1:], right=True)
-    bin_to_mean = {
-        int(bin_index): float(richness[bins == bin_index].mean())
-        for bin_index in np.unique(bins)
-    }
+    bin_to_mean = _bin_mean_lookup(bins, richness)
+    feature_array = _as_float32_matrix(train_features)
     if np.unique(bins).size < 2:
-        means = train_features.values.astype(np.float32).mean(axis=0)
-        stds = train_features.values.astype(np.float32).std(axis=0)
-        stds = np.where(stds == 0.0, 1.0, stds)
+        _, means, stds = _standardize(feature_array)
         return {"model": _ConstantPredictor(int(bins[0])), "means": means, "stds": stds}, bin_edges, bin_to_mean
-    trained = _fit_standardized_model(
-        _make_multiclass_classifier(cfg),
-        train_features.values.astype(np.float32),
-        bins,
-    )
+    trained = _fit_standardized_model(_make_multiclass_classifier(cfg), feature_array, bins)
     return trained, bin_edges, bin_to_mean
 
 
 def estimate_topk(
     classifier: dict[str, Any],
     bin_edges: np.ndarray,
-    bin_to_mean_richness: dict[int, float],
-    features_matrix: pd.DataFrame,
+    bin_to_mean_richness: np.ndarray | dict[int, float],
+    features_matrix: pd.DataFrame | np.ndarray | sparse.spmatrix,
     offset: int = 5,
+    batch_size: int = 65536,
 ) -> np.ndarray:
-    """Predict a Top-K value per sample from the richness estimator."""
+    """Predict a Top-K value per sample from the richness estimator.
+
+    Rows are standardized and classified in batches of ``batch_size`` and
+    mapped to K with a single gather into the dense bin lookup.
+    """
     del bin_edges
-    feature_array = _transform(features_matrix, classifier)
-    predicted_bins = classifier["model"].predict(feature_array)
-    mean_richness = np.array(
-        [bin_to_mean_richness.get(int(bin_index), 0.0) for bin_index in predicted_bins],
-        dtype=np.float32,
-    )
-    return np.clip(np.rint(mean_richness).astype(int) + int(offset), 1, 5000)
\ No newline at end of file
+    lookup = _as_bin_lookup(bin_to_mean_richness)
+    n_samples = features_matrix.shape[0]
+    predicted_bins = np.empty(n_samples, dtype=np.int64)
+    for start in range(0, n_samples, max(1, int(batch_size))):
+        stop = min(start + int(batch_size), n_samples)
+        if isinstance(features_matrix, pd.DataFrame):
+            batch = features_matrix.iloc[start:stop]
+        else:
+            batch = features_matrix[start:stop]
+        predicted_bins[start:stop] = classifier["model"].predict(_transform(batch, classifier))
+    return np.clip(np.rint(lookup[predicted_bins]).astype(int) + int(offset), 1, 5000)
+
+
+RICHNESS_MODES = ("estimator", "expected_richness", "expected_f1")
+
+
+def estimate_topk_from_scores(
+    scores: np.ndarray,
+    mode: str = "expected_richness",
+    offset: int = 5,
+    batch_size: int = 16384,
+) -> np.ndarray:
+    """Derive a per-sample Top-K from an already computed score matrix.
+
+    ``"expected_richness"`` uses the rounded sum of the species probabilities
+    plus ``offset``. ``"expected_f1"`` picks, per row, the K maximizing the
+    plug-in expected F1 ``2 * sum(top-K scores) / (K + sum(scores))``; no
+    offset is added since K is already the optimum. Rows are processed in
+    batches of ``batch_size``.
+    """
+    if mode not in RICHNESS_MODES[1:]:
+        raise ValueError(f"Unknown score-based richness mode: {mode!r}")
+    scores = np.asarray(scores)
+    n_samples, n_species = scores.shape
+    topk = np.empty(n_samples, dtype=int)
+    for start in range(0, n_samples, max(1, int(batch_size))):
+        stop = min(start + int(batch_size), n_samples)
+        batch = np.asarray(scores[start:stop], dtype=np.float64)
+        expected_richness = batch.sum(axis=1)
+        if mode == "expected_richness":
+            topk[start:stop] = np.rint(expected_richness).astype(int) + int(offset)
+            continue
+        ranked = -np.sort(-batch, axis=1)
+        ranked_mass = np.cumsum(ranked, axis=1)
+        expected_f1 = 2.0 * ranked_mass / (np.arange(1, n_species + 1) + expected_richness[:, None])
+        topk[start:stop] = np.argmax(expected_f1, axis=1) + 1
+    return np.clip(topk, 1, 5000)
@@ -2,12 +2,13 @@
 
 from __future__ import annotations
 
+from collections.abc import Iterator
 from typing import Dict
 
 import numpy as np
 import pandas as pd
 
-from .model import predict_scores
+from .model import pack_ovr_models, predict_packed_scores, predict_scores
 
 
 def export_predictions(
@@ -41,3 +42,25 @@ def export_predictions(
             "predictions": predictions,
         }
     )
+
+
+def _row_batch(matrix: pd.DataFrame | np.ndarray, rows: slice) -> pd.DataFrame | np.ndarray:
+    return matrix.iloc[rows] if isinstance(matrix, pd.DataFrame) else matrix[rows]
+
+
+def iter_score_batches(
+    models_by_species: Dict[str, object],
+    features_matrix: pd.DataFrame | np.ndarray,
+    species_column_names: list[str],
+    batch_size: int = 65536,
+) -> Iterator[tuple[slice, np.ndarray]]:
+    """Yield ``(rows, scores)`` for consecutive row batches of ``features_matrix``.
+
+    Species heads are packed once; only one batch of scores is alive at a
+    time, so streaming metric accumulators or writers can consume predictions
+    of any size.
+    """
+    packed_model = pack_ovr_models(models_by_species, species_column_names, n_features=features_matrix.shape[1])
+    for start in range(0, features_matrix.shape[0], max(1, int(batch_size))):
+        rows = slice(start, min(start + int(batch_size), features_matrix.shape[0]))
+        yield rows, predict_packed_scores(packed_model, _row_batch(features_matrix, rows))
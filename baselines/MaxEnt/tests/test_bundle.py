@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from geoplant_maxent.bundle import load_model_bundle, save_model_bundle
+from geoplant_maxent.config import ExperimentConfig
+from geoplant_maxent.model import estimate_topk, predict_scores, train_ovr, train_richness_estimator
+
+
+def test_model_bundle_round_trip_preserves_scores_and_topk(tmp_path):
+    cfg = ExperimentConfig(maxent_params={"C": 1.0, "max_iter": 300, "solver": "lbfgs"}, richness_nbins=3)
+    rng = np.random.default_rng(0)
+    features = pd.DataFrame(rng.normal(size=(60, 2)), columns=["clim_a", "clim_b"])
+    labels = pd.DataFrame(
+        {
+            "sp_1": (features["clim_a"] > 0).astype(int),
+            "sp_2": (features["clim_b"] > 0).astype(int),
+            "sp_3": np.zeros(60, dtype=int),
+        }
+    )
+    species = ["sp_1", "sp_2", "sp_3"]
+    models = train_ovr(features, labels, species, cfg)
+    richness = train_richness_estimator(features, labels, cfg)
+
+    path = tmp_path / "ablation.bundle"
+    save_model_bundle(path, models, species, ["clim_a", "clim_b"], richness_estimator=richness)
+    bundle = load_model_bundle(path)
+
+    shuffled = features[["clim_b", "clim_a"]]
+    assert isinstance(bundle.packed_model["coef"].base, np.memmap)
+    assert sorted(bundle.models) == ["sp_1", "sp_2"]
+    assert np.allclose(bundle.predict_scores(shuffled), predict_scores(models, features, species), atol=1e-6)
+    assert np.allclose(
+        predict_scores(bundle.models, features, species),
+        predict_scores(models, features, species),
+        atol=1e-6,
+    )
+    assert np.array_equal(
+        bundle.estimate_topk(shuffled, offset=0),
+        estimate_topk(*richness, features, offset=0),
+    )
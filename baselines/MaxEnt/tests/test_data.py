@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
 
 from geoplant_maxent.config import ExperimentConfig
 from geoplant_maxent.data import (
+    LongTableIndex,
     align_features_with_labels,
     build_wide_labels_from_long_metadata,
     select_top_species,
@@ -20,6 +22,27 @@ def test_build_wide_labels_from_long_metadata_deduplicates_pairs():
     assert labels.loc[0, "sp_11"] == 1
 
 
+def test_long_table_index_matches_groupby_first_and_feeds_label_building():
+    long_table = pd.DataFrame(
+        {
+            "surveyId": [7, 3, 7, np.nan, 3, 7],
+            "speciesId": [10, 11, 12, 13, np.nan, 10],
+            "lat": [np.nan, 45.0, 46.0, 0.0, 44.0, 47.0],
+            "country": ["France", None, "Spain", "Italy", "Spain", "France"],
+        }
+    )
+    index = LongTableIndex.from_frame(long_table, "surveyId")
+
+    collapsed = index.collapse(long_table, ["lat", "country"], "surveyId")
+    expected = long_table.drop(columns="speciesId").groupby("surveyId", as_index=False).first()
+    pd.testing.assert_frame_equal(collapsed, expected)
+
+    labels = build_wide_labels_from_long_metadata(long_table, index=index)
+    assert labels.columns.tolist() == ["survey_id", "sp_10", "sp_11", "sp_12"]
+    assert labels["survey_id"].tolist() == [3.0, 7.0]
+    assert labels[["sp_10", "sp_11", "sp_12"]].to_numpy().tolist() == [[0, 1, 0], [1, 0, 1]]
+
+
 def test_align_features_with_labels_rejects_duplicate_survey_rows():
     features = pd.DataFrame({"survey_id": [1, 1], "lat": [0.1, 0.2]})
     labels = pd.DataFrame({"survey_id": [1], "sp_1": [1]})
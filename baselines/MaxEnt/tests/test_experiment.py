@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from geoplant_maxent import experiment
+from geoplant_maxent.config import ExperimentConfig
+from geoplant_maxent.data import FeatureMatrix
+
+
+def _toy_tables(n_samples: int = 60):
+    rng = np.random.default_rng(0)
+    features = pd.DataFrame(
+        {
+            "survey_id": np.arange(n_samples),
+            "clim_bio1": rng.normal(size=n_samples),
+            "soil_ph": rng.normal(size=n_samples),
+        }
+    )
+    labels = pd.DataFrame(
+        {
+            "survey_id": np.arange(n_samples),
+            "sp_1": (features["clim_bio1"] > 0).astype(int),
+            "sp_2": (features["soil_ph"] > 0).astype(int),
+            "sp_3": (features["clim_bio1"] + features["soil_ph"] > 0).astype(int),
+        }
+    )
+    return features, labels
+
+
+def test_run_one_ablation_reuses_cached_models(tmp_path, monkeypatch):
+    features, labels = _toy_tables()
+    cfg = ExperimentConfig(
+        maxent_params={"C": 1.0, "max_iter": 300, "solver": "lbfgs"},
+        richness_nbins=3,
+        min_pos_per_species=1,
+        model_cache_dir=str(tmp_path / "cache"),
+    )
+    species = ["sp_1", "sp_2", "sp_3"]
+    first = experiment.run_one_ablation(cfg, ["climatic"], features, labels, features, labels, species)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cached ablation was retrained")
+
+    monkeypatch.setattr(experiment, "train_ovr", fail)
+    monkeypatch.setattr(experiment, "train_richness_estimator", fail)
+    second = experiment.run_one_ablation(cfg, ["climatic"], features, labels, features, labels, species)
+
+    assert second == first
+    assert len(list((tmp_path / "cache").glob("*.bundle"))) == 1
+    assert len(list((tmp_path / "cache").glob("*.scores.npy"))) == 1
+
+
+def test_score_based_richness_mode_skips_richness_training(monkeypatch):
+    features, labels = _toy_tables()
+    cfg = ExperimentConfig(min_pos_per_species=1, richness_mode="expected_f1")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("richness estimator was trained")
+
+    monkeypatch.setattr(experiment, "train_richness_estimator", fail)
+    row = experiment.run_one_ablation(
+        cfg, ["climatic"], features, labels, features, labels, ["sp_1", "sp_2", "sp_3"]
+    )
+
+    assert row["TopK"] == "per-sample"
+    assert 0.0 < row["Fs1"] <= 1.0
+
+
+def test_run_all_streams_rows_and_resumes_completed_ablations(tmp_path, monkeypatch):
+    features, labels = _toy_tables()
+    calls = []
+
+    def fake_run_one_ablation(cfg, group_names, *args, group_map=None, top_species=None, n_threads=None):
+        calls.append(("+".join(group_names), sorted(group_map), tuple(top_species), n_threads))
+        return {"groups": "+".join(group_names), "n_features": len(group_names), "AUC": 0.5}
+
+    monkeypatch.setattr(experiment, "run_one_ablation", fake_run_one_ablation)
+    results_path = tmp_path / "results.csv"
+    cfg = ExperimentConfig(
+        min_pos_per_species=1,
+        ablations=[["climatic"], ["soilgrids"]],
+        max_parallel_ablations=2,
+        cpu_budget=2,
+    )
+    experiment.run_all(cfg, features, labels, features, labels, ["sp_1", "sp_2"], results_path=results_path)
+    assert sorted(call[0] for call in calls) == ["climatic", "soilgrids"]
+    assert all(sorted(call[2]) == ["sp_1", "sp_2"] for call in calls)
+    assert all(call[3] == 1 for call in calls)
+
+    calls.clear()
+    cfg.ablations = [["climatic"], ["climatic", "soilgrids"], ["soilgrids"]]
+    results = experiment.run_all(
+        cfg, features, labels, features, labels, ["sp_1", "sp_2"], results_path=results_path
+    )
+
+    assert [call[0] for call in calls] == ["climatic+soilgrids"]
+    assert results["groups"].tolist() == ["climatic", "climatic+soilgrids", "soilgrids"]
+    assert len(pd.read_csv(results_path)) == 3
+
+    calls.clear()
+    cfg.fixed_top_k = 10
+    experiment.run_all(cfg, features, labels, features, labels, ["sp_1", "sp_2"], results_path=results_path)
+    assert len(calls) == 3
+    assert len(pd.read_csv(results_path)) == 6
+
+
+def test_run_all_records_finished_ablations_before_raising(tmp_path, monkeypatch):
+    features, labels = _toy_tables()
+    started, failed = threading.Event(), threading.Event()
+
+    def fake_run_one_ablation(cfg, group_names, *args, **kwargs):
+        if group_names == ["soilgrids"]:
+            started.wait(timeout=10)
+            failed.set()
+            raise RuntimeError("soilgrids failed")
+        started.set()
+        failed.wait(timeout=10)
+        return {"groups": "+".join(group_names), "n_features": len(group_names), "AUC": 0.5}
+
+    monkeypatch.setattr(experiment, "run_one_ablation", fake_run_one_ablation)
+    results_path = tmp_path / "results.csv"
+    cfg = ExperimentConfig(
+        min_pos_per_species=1,
+        ablations=[["climatic"], ["soilgrids"]],
+        max_parallel_ablations=2,
+        cpu_budget=2,
+    )
+
+    with pytest.raises(RuntimeError, match="soilgrids failed"):
+        experiment.run_all(cfg, features, labels, features, labels, ["sp_1", "sp_2"], results_path=results_path)
+    assert pd.read_csv(results_path)["groups"].tolist() == ["climatic"]
+
+
+def test_run_one_ablation_on_feature_matrix_matches_dataframe_run():
+    features, labels = _toy_tables()
+    features["clim_bio2"] = features["clim_bio1"] ** 2
+    cfg = ExperimentConfig(
+        maxent_params={"C": 1.0, "max_iter": 300, "solver": "lbfgs"},
+        richness_nbins=3,
+        min_pos_per_species=1,
+    )
+    species = ["sp_1", "sp_2", "sp_3"]
+    matrix = FeatureMatrix.from_frame(features, cfg)
+
+    columns, block = matrix.select(["climatic"])
+    assert columns == ["clim_bio1", "clim_bio2"]
+    assert block.dtype == np.float32 and np.shares_memory(block, matrix.values)
+    assert matrix.select(["climatic", "soilgrids"])[0] == ["clim_bio1", "clim_bio2", "soil_ph"]
+
+    expected = experiment.run_one_ablation(cfg, ["climatic"], features, labels, features, labels, species)
+    result = experiment.run_one_ablation(cfg, ["climatic"], matrix, labels, matrix, labels, species)
+    assert result == expected
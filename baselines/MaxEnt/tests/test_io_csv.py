@@ -3,7 +3,11 @@ from __future__ import annotations
 import pandas as pd
 
 from geoplant_maxent.config import ExperimentConfig, PredictorPairSpec
-from geoplant_maxent.io_csv import build_features_from_meta_and_predictors_pair, load_predictor_pairs
+from geoplant_maxent.io_csv import (
+    FeatureBuilder,
+    build_features_from_meta_and_predictors_pair,
+    load_predictor_pairs,
+)
 
 
 def test_build_features_collapses_long_metadata_and_aligns_one_hot_columns():
@@ -68,3 +72,13 @@ def test_load_predictor_pairs_keeps_numeric_columns_only(tmp_path):
     )
     assert list(train_map["bioclim"].columns) == ["surveyId", "clim_bio1"]
     assert list(test_map["bioclim"].columns) == ["surveyId", "clim_bio1"]
+
+
+def test_feature_builder_round_trips_through_json():
+    metadata = pd.DataFrame({"surveyId": [1, 2], "lat": [45.1, 46.2], "country": ["France", "Spain"]})
+    builder = FeatureBuilder(ExperimentConfig()).fit(metadata)
+    reloaded = FeatureBuilder.from_dict(builder.to_dict())
+
+    batch = reloaded.transform(pd.DataFrame({"surveyId": [9], "country": ["Spain"], "region": ["X"]}))
+    assert list(batch.columns) == ["survey_id", "lat", "meta_country_France", "meta_country_Spain"]
+    assert batch.loc[0, "meta_country_Spain"]
@@ -4,7 +4,14 @@ import numpy as np
 import pandas as pd
 
 from geoplant_maxent.config import ExperimentConfig
-from geoplant_maxent.model import estimate_topk, predict_scores, train_ovr, train_richness_estimator
+from geoplant_maxent.model import (
+    estimate_topk,
+    pack_ovr_models,
+    predict_packed_scores,
+    predict_scores,
+    train_ovr,
+    train_richness_estimator,
+)
 from geoplant_maxent.predict import export_predictions
 
 
@@ -67,3 +74,101 @@ def test_train_predict_and_export_end_to_end():
         {"surveyId": 102, "predictions": "11"},
         {"surveyId": 103, "predictions": "12"},
     ]
+
+
+def test_packed_scores_match_per_species_predict_proba():
+    cfg = ExperimentConfig(maxent_params={"C": 1.0, "max_iter": 300, "solver": "lbfgs"})
+    rng = np.random.default_rng(0)
+    features = pd.DataFrame(rng.normal(size=(40, 3)), columns=["clim_a", "clim_b", "clim_c"])
+    labels = pd.DataFrame(
+        {
+            "sp_1": (features["clim_a"] > 0).astype(int),
+            "sp_2": (features["clim_b"] + features["clim_c"] > 0).astype(int),
+            "sp_3": np.zeros(40, dtype=int),
+        }
+    )
+    models = train_ovr(features, labels, ["sp_1", "sp_2", "sp_3"], cfg)
+    models["sp_2"] = dict(models["sp_2"], means=models["sp_2"]["means"] + 0.5)
+
+    packed = pack_ovr_models(models, ["sp_1", "sp_2", "sp_3"])
+    scores = predict_packed_scores(packed, features, chunk_size=7)
+
+    assert packed["coef"].shape == (3, 3)
+    assert packed["coef"].dtype == np.float32
+    for index, species_name in enumerate(["sp_1", "sp_2"]):
+        trained = models[species_name]
+        scaled = (features.values - trained["means"]) / trained["stds"]
+        expected = trained["model"].predict_proba(scaled)[:, 1]
+        assert np.allclose(scores[:, index], expected, atol=1e-5)
+    assert np.all(scores[:, 2] == 0.0)
+
+
+def test_packing_no_trained_species_scores_zeros(tmp_path):
+    from geoplant_maxent.bundle import load_model_bundle, save_model_bundle
+    from geoplant_maxent.predict import iter_score_batches
+
+    features = np.random.default_rng(0).normal(size=(6, 3)).astype(np.float32)
+    packed = pack_ovr_models({}, ["sp_1", "sp_2"], n_features=3)
+
+    assert packed["coef"].shape == (3, 2) and not packed["fitted"].any()
+    np.testing.assert_array_equal(
+        predict_packed_scores(packed, features), predict_scores({}, features, ["sp_1", "sp_2"])
+    )
+    assert [scores.shape for _, scores in iter_score_batches({}, features, ["sp_1", "sp_2"], batch_size=4)] == [
+        (4, 2),
+        (2, 2),
+    ]
+    save_model_bundle(tmp_path / "empty", {}, ["sp_1", "sp_2"], ["clim_a", "clim_b", "clim_c"])
+    assert not load_model_bundle(tmp_path / "empty").predict_scores(features).any()
+
+
+def test_sparse_one_hot_features_match_dense_training():
+    from geoplant_maxent.encoding import SparseOneHotEncoder
+
+    rng = np.random.default_rng(0)
+    metadata = pd.DataFrame({"county": rng.choice(["Ain", "Drome", "Isere", "Savoie"], size=200)})
+    encoded = SparseOneHotEncoder(["county"], prefix="meta_").fit_transform(metadata)
+    labels = pd.DataFrame(
+        {
+            "sp_1": (metadata["county"] == "Ain").astype(int) | (rng.random(200) < 0.1),
+            "sp_2": rng.integers(0, 2, size=200),
+        }
+    )
+    cfg = ExperimentConfig(maxent_params={"C": 1.0, "max_iter": 1000, "solver": "lbfgs", "tol": 1e-8})
+
+    sparse_models = train_ovr(encoded, labels, ["sp_1", "sp_2"], cfg)
+    dense_models = train_ovr(encoded.toarray(), labels, ["sp_1", "sp_2"], cfg)
+
+    assert np.allclose(sparse_models["sp_1"]["means"], 0.0)
+    np.testing.assert_allclose(
+        predict_scores(sparse_models, encoded, ["sp_1", "sp_2"]),
+        predict_scores(dense_models, encoded.toarray(), ["sp_1", "sp_2"]),
+        atol=1e-4,
+    )
+
+
+def test_bootstrap_replicates_match_metrics_on_resampled_rows():
+    from geoplant_maxent.bootstrap import _prepare_statistics, _weighted_macro_auc, bootstrap_metrics
+    from geoplant_maxent.metrics import macro_auc
+
+    rng = np.random.default_rng(3)
+    y_true = (rng.random((80, 6)) < 0.3).astype(int)
+    y_true[:, 0] = 0
+    y_scores = np.round(rng.random((80, 6)), 1)
+    statistics = _prepare_statistics(y_true, y_scores, 3)
+
+    multiplicities = np.bincount(rng.integers(0, 80, 80), minlength=80).astype(np.int32)
+    resampled = np.repeat(np.arange(80), multiplicities)
+    assert np.isclose(
+        _weighted_macro_auc(statistics, multiplicities[None, :])[0],
+        macro_auc(y_true[resampled], y_scores[resampled]),
+    )
+
+    intervals = bootstrap_metrics(y_true, y_scores, 3, n_replicates=40, batch_size=16)
+    assert list(intervals["metric"]) == ["AUC", "Recall", "Precision", "Fs1"]
+    assert (intervals["ci_lower"] <= intervals["estimate"]).all()
+    assert (intervals["estimate"] <= intervals["ci_upper"]).all()
+    pd.testing.assert_frame_equal(
+        intervals,
+        bootstrap_metrics(y_true, y_scores, 3, n_replicates=40, batch_size=16, n_jobs=2),
+    )
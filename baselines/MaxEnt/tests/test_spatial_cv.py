@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from geoplant_maxent.config import ExperimentConfig
+from geoplant_maxent.spatial_cv import grid_block_ids, spatial_cross_validate, spatial_fold_indices
+
+
+def test_spatial_cross_validate_keeps_blocks_within_one_fold():
+    rng = np.random.default_rng(0)
+    n_samples = 120
+    features = pd.DataFrame({"clim_bio1": rng.normal(size=n_samples), "soil_ph": rng.normal(size=n_samples)})
+    labels = pd.DataFrame(
+        {
+            "sp_1": (features["clim_bio1"] > 0).astype(int),
+            "sp_2": (features["soil_ph"] > 0).astype(int),
+        }
+    )
+    blocks = grid_block_ids(rng.uniform(40, 50, n_samples), rng.uniform(0, 10, n_samples), 2.0)
+
+    for train, test in spatial_fold_indices(blocks, n_folds=3):
+        assert not set(blocks[train]) & set(blocks[test])
+
+    cfg = ExperimentConfig(fixed_top_k=1)
+    results = spatial_cross_validate(cfg, features, labels, ["sp_1", "sp_2"], blocks, n_folds=3)
+    assert list(results["fold"]) == [0, 1, 2]
+    assert results["n_test"].sum() == n_samples
+    assert (results["AUC"] > 0.9).all()
+
+
+def test_train_ovr_on_row_indices_matches_training_on_copied_rows():
+    from geoplant_maxent.model import predict_scores, train_ovr
+
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(200, 2)).astype(np.float32)
+    labels = pd.DataFrame({"sp_1": (features[:, 0] > 0).astype(int), "sp_2": (features[:, 1] > 0).astype(int)})
+    rows = np.r_[0:60, 120:200]
+    cfg = ExperimentConfig()
+    species = ["sp_1", "sp_2"]
+    original = features.copy()
+
+    copied = train_ovr(features[rows], labels.iloc[rows].reset_index(drop=True), species, cfg)
+    indexed = train_ovr(features, labels, species, cfg, rows=rows)
+
+    np.testing.assert_allclose(predict_scores(indexed, features, species), predict_scores(copied, features, species))
+    np.testing.assert_array_equal(features, original)
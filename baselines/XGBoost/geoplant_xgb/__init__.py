@@ -1,48 +1,94 @@
 """GeoPlant XGBoost baseline utilities."""
 
+from .bootstrap import bootstrap_metrics
+from .bundle import ModelBundle, load_model_bundle, save_model_bundle
 from .config import ExperimentConfig, PredictorPairSpec
 from .data import (
+    FeatureMatrix,
+    LongTableIndex,
     align_features_with_labels,
     build_wide_labels_from_long_metadata,
     select_top_species,
     split_features_by_group,
 )
+from .encoding import SparseOneHotEncoder
 from .evaluation import lists_to_wide, parse_solution
-from .experiment import run_all, run_one_ablation
+from .experiment import evaluate_in_batches, run_all, run_one_ablation
+from .grid import GridSpec, iter_grid_scores, predict_grid
 from .io_csv import (
+    FeatureBuilder,
     build_features_from_meta_and_predictors_pair,
     load_metadata_csv,
     load_predictor_pairs,
 )
-from .metrics import macro_auc, sample_f1_at_k, sample_recall_at_k
+from .metrics import (
+    MacroAUCAccumulator,
+    TopKAccumulator,
+    macro_auc,
+    per_species_auc,
+    sample_f1_at_k,
+    sample_recall_at_k,
+    sample_topk_metrics,
+    topk_row_statistics,
+)
 from .model import (
     estimate_topk,
+    estimate_topk_from_scores,
     predict_scores,
     train_ovr,
     train_richness_estimator,
 )
-from .predict import export_predictions
+from .predict import export_predictions, iter_score_batches
+from .spatial_cv import (
+    grid_block_ids,
+    region_block_ids,
+    spatial_cross_validate,
+    spatial_fold_indices,
+)
 
 __all__ = [
     "ExperimentConfig",
+    "FeatureBuilder",
+    "FeatureMatrix",
+    "GridSpec",
+    "LongTableIndex",
+    "MacroAUCAccumulator",
+    "ModelBundle",
     "PredictorPairSpec",
+    "SparseOneHotEncoder",
+    "TopKAccumulator",
     "align_features_with_labels",
+    "bootstrap_metrics",
     "build_features_from_meta_and_predictors_pair",
     "build_wide_labels_from_long_metadata",
     "estimate_topk",
+    "estimate_topk_from_scores",
+    "evaluate_in_batches",
     "export_predictions",
+    "grid_block_ids",
+    "iter_grid_scores",
+    "iter_score_batches",
     "lists_to_wide",
     "load_metadata_csv",
+    "load_model_bundle",
     "load_predictor_pairs",
     "macro_auc",
     "parse_solution",
+    "per_species_auc",
+    "predict_grid",
     "predict_scores",
+    "region_block_ids",
     "run_all",
     "run_one_ablation",
+    "save_model_bundle",
     "sample_f1_at_k",
     "sample_recall_at_k",
+    "sample_topk_metrics",
     "select_top_species",
+    "spatial_cross_validate",
+    "spatial_fold_indices",
     "split_features_by_group",
+    "topk_row_statistics",
     "train_ovr",
     "train_richness_estimator",
 ]
@@ -0,0 +1,22 @@
+"""CPU budget shared by concurrently running ablations and folds."""
+
+from __future__ import annotations
+
+import os
+from dataclasses import replace
+
+from .config import ExperimentConfig
+
+
+def threads_per_worker(experiment_config: ExperimentConfig, n_workers: int) -> int:
+    """Split ``cpu_budget`` (default: all CPUs) evenly across ``n_workers`` concurrent workers."""
+    cpu_budget = experiment_config.cpu_budget or os.cpu_count() or 1
+    return max(1, int(cpu_budget) // max(1, int(n_workers)))
+
+
+def budgeted_config(experiment_config: ExperimentConfig, n_workers: int) -> ExperimentConfig:
+    """Cap XGBoost training ``n_jobs`` at each worker's share of ``cpu_budget`` when it is set."""
+    if experiment_config.cpu_budget is None:
+        return experiment_config
+    n_jobs = threads_per_worker(experiment_config, n_workers)
+    return replace(experiment_config, xgb_params={**experiment_config.xgb_params, "n_jobs": n_jobs})
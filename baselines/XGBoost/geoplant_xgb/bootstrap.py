@@ -0,0 +1,192 @@
+"""Bootstrap confidence intervals for the benchmark metrics.
+
+Replicates resample survey rows with replacement. Instead of re-running the
+metric functions on every resampled matrix, per-row Top-K statistics and the
+per-species score ordering are computed once; a replicate then reduces to a
+multiplicity-weighted mean of the row statistics and a weighted rank-sum AUC.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .metrics import _topk_row_metrics, macro_auc, sample_topk_metrics, topk_row_statistics
+
+TOPK_METRICS = ("Recall", "Precision", "Fs1")
+_TOPK_KEYS = {"Recall": "recall", "Precision": "precision", "Fs1": "f1"}
+
+
+@dataclass
+class _SpeciesRanks:
+    """Sorted order of one species' scores and tie-group bounds of its positives."""
+
+    order: np.ndarray
+    positive_positions: np.ndarray
+    group_start: np.ndarray
+    group_end: np.ndarray
+    first_positive_in_group: np.ndarray
+    last_positive_in_group: np.ndarray
+
+
+@dataclass
+class _BootstrapStatistics:
+    row_metrics: np.ndarray
+    species_ranks: list[_SpeciesRanks]
+
+
+def _species_ranks(scores: np.ndarray, truth: np.ndarray) -> _SpeciesRanks:
+    order = np.argsort(scores).astype(np.int32)
+    sorted_scores = scores[order]
+    starts = np.r_[True, sorted_scores[1:] != sorted_scores[:-1]]
+    group_ids = np.cumsum(starts) - 1
+    group_bounds = np.r_[np.flatnonzero(starts), scores.size]
+    positive_positions = np.flatnonzero(truth[order])
+    positive_groups = group_ids[positive_positions]
+    first_positive = np.searchsorted(positive_groups, positive_groups, side="left")
+    last_positive = np.searchsorted(positive_groups, positive_groups, side="right") - 1
+    return _SpeciesRanks(
+        order=order,
+        positive_positions=positive_positions,
+        group_start=group_bounds[positive_groups],
+        group_end=group_bounds[positive_groups + 1],
+        first_positive_in_group=first_positive,
+        last_positive_in_group=last_positive,
+    )
+
+
+def _prepare_statistics(
+    y_true_binary: np.ndarray,
+    y_scores: np.ndarray,
+    topk: int | np.ndarray,
+) -> _BootstrapStatistics:
+    row_metrics = _topk_row_metrics(*topk_row_statistics(y_true_binary, y_scores, topk))
+    truth = np.asarray(y_true_binary) != 0
+    n_positive = truth.sum(axis=0)
+    informative = np.flatnonzero((n_positive > 0) & (n_positive < truth.shape[0]))
+    return _BootstrapStatistics(
+        row_metrics=np.column_stack([row_metrics[_TOPK_KEYS[name]] for name in TOPK_METRICS]),
+        species_ranks=[
+            _species_ranks(np.asarray(y_scores[:, index]), truth[:, index]) for index in informative
+        ],
+    )
+
+
+def _cumulative_before(cumulative: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Column ``positions - 1`` of a cumulative sum, with 0 for position 0."""
+    padded = np.pad(cumulative, ((0, 0), (1, 0)))
+    return padded[:, positions]
+
+
+def _weighted_macro_auc(statistics: _BootstrapStatistics, weights: np.ndarray) -> np.ndarray:
+    """Macro AUC of every replicate given row multiplicities ``weights`` (replicates x rows).
+
+    For each species only one gather and one cumulative sum touch every row;
+    the Mann-Whitney wins are then evaluated at the positive rows only.
+    """
+    aucs = np.full((weights.shape[0], len(statistics.species_ranks)), np.nan)
+    for index, ranks in enumerate(statistics.species_ranks):
+        cumulative_weight = np.cumsum(weights[:, ranks.order], axis=1, dtype=np.int32)
+        positive_weight = weights[:, ranks.order[ranks.positive_positions]]
+        cumulative_positive = np.cumsum(positive_weight, axis=1, dtype=np.int32)
+
+        weight_before_group = _cumulative_before(cumulative_weight, ranks.group_start)
+        weight_in_group = cumulative_weight[:, ranks.group_end - 1] - weight_before_group
+        positive_before_group = _cumulative_before(cumulative_positive, ranks.first_positive_in_group)
+        positive_in_group = cumulative_positive[:, ranks.last_positive_in_group] - positive_before_group
+        negative_before_group = weight_before_group - positive_before_group
+        negative_in_group = weight_in_group - positive_in_group
+
+        wins = (positive_weight * (negative_before_group + 0.5 * negative_in_group)).sum(axis=1)
+        total_positive = cumulative_positive[:, -1].astype(np.int64)
+        pairs = total_positive * (cumulative_weight[:, -1] - total_positive)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            aucs[:, index] = np.where(pairs > 0, wins / pairs, np.nan)
+    if not statistics.species_ranks:
+        return np.full(weights.shape[0], np.nan)
+    with np.errstate(invalid="ignore"):
+        return np.nanmean(aucs, axis=1)
+
+
+def _replicate_batch(
+    statistics: _BootstrapStatistics,
+    n_replicates: int,
+    seed: np.random.SeedSequence,
+) -> np.ndarray:
+    n_samples = statistics.row_metrics.shape[0]
+    rng = np.random.default_rng(seed)
+    sampled = rng.integers(0, n_samples, size=(n_replicates, n_samples))
+    sampled += np.arange(n_replicates)[:, None] * n_samples
+    weights = np.bincount(sampled.ravel(), minlength=n_replicates * n_samples).reshape(
+        n_replicates,
+        n_samples,
+    ).astype(np.int32)
+    topk_values = weights @ statistics.row_metrics / n_samples
+    return np.column_stack([_weighted_macro_auc(statistics, weights), topk_values])
+
+
+_WORKER_STATISTICS: _BootstrapStatistics | None = None
+
+
+def _init_worker(statistics: _BootstrapStatistics) -> None:
+    global _WORKER_STATISTICS
+    _WORKER_STATISTICS = statistics
+
+
+def _worker_replicate_batch(n_replicates: int, seed: np.random.SeedSequence) -> np.ndarray:
+    return _replicate_batch(_WORKER_STATISTICS, n_replicates, seed)
+
+
+def bootstrap_metrics(
+    y_true_binary: np.ndarray,
+    y_scores: np.ndarray,
+    topk: int | np.ndarray,
+    n_replicates: int = 1000,
+    confidence: float = 0.95,
+    batch_size: int = 8,
+    n_jobs: int = 1,
+    random_state: int = 42,
+) -> pd.DataFrame:
+    """Percentile bootstrap intervals for AUC, Recall, Precision and Fs1.
+
+    Replicates are drawn in batches of ``batch_size`` and spread over
+    ``n_jobs`` processes. Each batch uses its own seed spawned from
+    ``random_state``, so results do not depend on ``n_jobs``.
+    """
+    if y_scores.shape[0] == 0:
+        raise ValueError("Cannot bootstrap an empty score matrix")
+    statistics = _prepare_statistics(y_true_binary, y_scores, topk)
+    batch_sizes = [
+        min(int(batch_size), int(n_replicates) - start)
+        for start in range(0, int(n_replicates), max(1, int(batch_size)))
+    ]
+    seeds = np.random.SeedSequence(random_state).spawn(len(batch_sizes))
+    if n_jobs == 1:
+        batches = [_replicate_batch(statistics, size, seed) for size, seed in zip(batch_sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=n_jobs,
+            initializer=_init_worker,
+            initargs=(statistics,),
+        ) as executor:
+            batches = list(executor.map(_worker_replicate_batch, batch_sizes, seeds))
+    replicates = np.concatenate(batches, axis=0)
+
+    point_topk = sample_topk_metrics(y_true_binary, y_scores, topk)
+    estimates = [macro_auc(y_true_binary, y_scores)] + [point_topk[_TOPK_KEYS[name]] for name in TOPK_METRICS]
+    alpha = (1.0 - float(confidence)) / 2.0
+    with np.errstate(invalid="ignore"):
+        lower, upper = np.nanquantile(replicates, [alpha, 1.0 - alpha], axis=0)
+        spread = np.nanstd(replicates, axis=0)
+    return pd.DataFrame(
+        {
+            "metric": ["AUC", *TOPK_METRICS],
+            "estimate": estimates,
+            "ci_lower": lower,
+            "ci_upper": upper,
+            "std": spread,
+        }
+    )
@@ -0,0 +1,213 @@
+"""Single-file persistence for trained ablations with memory-mapped loading.
+
+A bundle is one file laid out as a magic tag, a JSON header and a sequence of
+64-byte aligned raw arrays. Loading parses only the header and maps the file
+read-only, so workers start quickly and share the same pages. Boosters are
+stored as XGBoost UBJSON blobs and deserialized on first access.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+from .model import _as_bin_lookup, _get_xgb, estimate_topk, predict_scores
+
+BUNDLE_MAGIC = b"GPBUNDLE"
+BUNDLE_FORMAT_VERSION = 1
+_ALIGNMENT = 64
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def write_array_file(path: str | Path, metadata: dict, arrays: Dict[str, np.ndarray]) -> None:
+    """Write ``metadata`` and named ``arrays`` into one aligned, mappable file.
+
+    The file is written next to ``path`` and atomically renamed into place, so
+    concurrent readers never observe a partial bundle.
+    """
+    path = Path(path)
+    contiguous = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    layout = {}
+    offset = 0
+    for name, array in contiguous.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps(
+        {"format_version": BUNDLE_FORMAT_VERSION, "metadata": metadata, "arrays": layout}
+    ).encode("utf-8")
+    data_start = _aligned(len(BUNDLE_MAGIC) + 8 + len(header))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with temporary_path.open("wb") as file_handle:
+        file_handle.write(BUNDLE_MAGIC)
+        file_handle.write(len(header).to_bytes(8, "little"))
+        file_handle.write(header)
+        for name, array in contiguous.items():
+            file_handle.seek(data_start + layout[name]["offset"])
+            file_handle.write(array.tobytes())
+        file_handle.truncate(data_start + offset)
+    os.replace(temporary_path, path)
+
+
+def read_array_file(path: str | Path) -> tuple[dict, Dict[str, np.ndarray]]:
+    """Map a file written by :func:`write_array_file` and return read-only array views."""
+    path = Path(path)
+    with path.open("rb") as file_handle:
+        if file_handle.read(len(BUNDLE_MAGIC)) != BUNDLE_MAGIC:
+            raise ValueError(f"{path} is not a GeoPlant model bundle")
+        header_length = int.from_bytes(file_handle.read(8), "little")
+        header = json.loads(file_handle.read(header_length).decode("utf-8"))
+    if header.get("format_version") != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported bundle format version: {header.get('format_version')}")
+
+    data_start = _aligned(len(BUNDLE_MAGIC) + 8 + header_length)
+    mapped = np.memmap(path, dtype=np.uint8, mode="r") if path.stat().st_size > data_start else None
+    arrays: Dict[str, np.ndarray] = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        shape = tuple(spec["shape"])
+        nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        if nbytes == 0:
+            arrays[name] = np.empty(shape, dtype=dtype)
+            continue
+        start = data_start + spec["offset"]
+        arrays[name] = mapped[start : start + nbytes].view(dtype).reshape(shape)
+    return header["metadata"], arrays
+
+
+def _booster_bytes(model: Any) -> np.ndarray:
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    return np.frombuffer(bytes(booster.save_raw(raw_format="ubj")), dtype=np.uint8)
+
+
+def _load_classifier(raw: np.ndarray) -> Any:
+    classifier = _get_xgb().XGBClassifier()
+    classifier.load_model(bytearray(raw))
+    return classifier
+
+
+class _LazyBoosterModels(Mapping):
+    """Species → classifier mapping that deserializes each booster on first access."""
+
+    def __init__(self, species_names: list[str], blob: np.ndarray, offsets: np.ndarray):
+        self._positions = {species_name: index for index, species_name in enumerate(species_names)}
+        self._blob = blob
+        self._offsets = offsets
+        self._loaded: Dict[str, Any] = {}
+
+    def __getitem__(self, species_name: str) -> Any:
+        if species_name not in self._loaded:
+            index = self._positions[species_name]
+            raw = self._blob[self._offsets[index] : self._offsets[index + 1]]
+            self._loaded[species_name] = _load_classifier(raw)
+        return self._loaded[species_name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._positions)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+
+@dataclass
+class ModelBundle:
+    """Trained ablation: species order, feature order, OVR models and richness estimator."""
+
+    species_column_names: list[str]
+    feature_columns: list[str]
+    models: Mapping[str, Any]
+    richness_estimator: tuple[Any, np.ndarray, np.ndarray] | None = None
+
+    def _select_features(self, features_matrix: pd.DataFrame | np.ndarray) -> pd.DataFrame | np.ndarray:
+        if isinstance(features_matrix, pd.DataFrame):
+            return features_matrix[self.feature_columns]
+        return features_matrix
+
+    def predict_scores(self, features_matrix: pd.DataFrame | np.ndarray, **kwargs) -> np.ndarray:
+        """Score ``features_matrix`` for every bundled species."""
+        return predict_scores(
+            self.models,
+            self._select_features(features_matrix),
+            self.species_column_names,
+            **kwargs,
+        )
+
+    def estimate_topk(self, features_matrix: pd.DataFrame | np.ndarray, offset: int = 5) -> np.ndarray:
+        """Predict per-sample Top-K with the bundled richness estimator."""
+        if self.richness_estimator is None:
+            raise ValueError("This bundle does not contain a richness estimator")
+        classifier, bin_edges, bin_to_mean = self.richness_estimator
+        return estimate_topk(
+            classifier,
+            bin_edges,
+            bin_to_mean,
+            self._select_features(features_matrix),
+            offset=offset,
+        )
+
+
+def save_model_bundle(
+    path: str | Path,
+    models_by_species: Dict[str, Any],
+    species_column_names: list[str],
+    feature_columns: list[str],
+    richness_estimator: tuple[Any, np.ndarray, np.ndarray] | None = None,
+) -> None:
+    """Persist a trained ablation into a single bundle file."""
+    trained_species = [name for name in species_column_names if models_by_species.get(name) is not None]
+    raw_boosters = [_booster_bytes(models_by_species[name]) for name in trained_species]
+    offsets = np.zeros(len(raw_boosters) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([raw.size for raw in raw_boosters])
+    arrays = {
+        "boosters": np.concatenate(raw_boosters) if raw_boosters else np.empty(0, dtype=np.uint8),
+        "booster_offsets": offsets,
+    }
+    if richness_estimator is not None:
+        classifier, bin_edges, bin_to_mean = richness_estimator
+        arrays["richness/booster"] = _booster_bytes(classifier)
+        arrays["richness/bin_edges"] = np.asarray(bin_edges, dtype=np.float64)
+        arrays["richness/bin_means"] = _as_bin_lookup(bin_to_mean)
+    metadata = {
+        "model_type": "xgboost",
+        "species": list(species_column_names),
+        "trained_species": trained_species,
+        "feature_columns": list(feature_columns),
+        "has_richness_estimator": richness_estimator is not None,
+    }
+    write_array_file(path, metadata, arrays)
+
+
+def load_model_bundle(path: str | Path) -> ModelBundle:
+    """Map a bundle file; species boosters are deserialized lazily on first use."""
+    metadata, arrays = read_array_file(path)
+    if metadata.get("model_type") != "xgboost":
+        raise ValueError(f"{path} does not contain XGBoost models")
+
+    richness_estimator = None
+    if metadata["has_richness_estimator"]:
+        richness_estimator = (
+            _load_classifier(arrays["richness/booster"]),
+            np.array(arrays["richness/bin_edges"]),
+            np.array(arrays["richness/bin_means"]),
+        )
+    return ModelBundle(
+        species_column_names=metadata["species"],
+        feature_columns=metadata["feature_columns"],
+        models=_LazyBoosterModels(
+            metadata["trained_species"],
+            arrays["boosters"],
+            arrays["booster_offsets"],
+        ),
+        richness_estimator=richness_estimator,
+    )
@@ -0,0 +1,98 @@
+"""Content-addressed cache of trained ablation models and their test scores."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+from .bundle import ModelBundle, load_model_bundle, save_model_bundle
+
+
+def frame_fingerprint(dataframe: pd.DataFrame) -> str:
+    """Hash column names, index and values of ``dataframe`` into a hex digest."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(column) for column in dataframe.columns]).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(dataframe, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+def array_fingerprint(values: np.ndarray, columns: list[str], batch_rows: int = 65536) -> str:
+    """Hash column names, shape and values of a feature matrix into a hex digest."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(column) for column in columns]).encode("utf-8"))
+    digest.update(json.dumps([values.dtype.str, list(values.shape)]).encode("utf-8"))
+    for start in range(0, values.shape[0], batch_rows):
+        digest.update(np.ascontiguousarray(values[start : start + batch_rows]).data)
+    return digest.hexdigest()
+
+
+def model_cache_key(
+    feature_columns: list[str],
+    training_fingerprint: str,
+    species_column_names: list[str],
+    params: dict,
+) -> str:
+    """Return the cache key of one (feature columns, training data, species, params) combination."""
+    payload = json.dumps(
+        {
+            "feature_columns": list(feature_columns),
+            "training_fingerprint": training_fingerprint,
+            "species": list(species_column_names),
+            "params": params,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ModelCache:
+    """Directory of model bundles and score matrices addressed by cache key."""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def bundle_path(self, key: str) -> Path:
+        return self.root / f"{key}.bundle"
+
+    def scores_path(self, key: str, test_fingerprint: str) -> Path:
+        return self.root / f"{key}-{test_fingerprint[:16]}.scores.npy"
+
+    def load(self, key: str) -> ModelBundle | None:
+        """Return the cached bundle for ``key`` or ``None`` when it was never stored."""
+        path = self.bundle_path(key)
+        return load_model_bundle(path) if path.exists() else None
+
+    def store(
+        self,
+        key: str,
+        models_by_species: Dict[str, Any],
+        species_column_names: list[str],
+        feature_columns: list[str],
+        richness_estimator: tuple | None = None,
+    ) -> None:
+        save_model_bundle(
+            self.bundle_path(key),
+            models_by_species,
+            species_column_names,
+            feature_columns,
+            richness_estimator=richness_estimator,
+        )
+
+    def load_scores(self, key: str, test_fingerprint: str) -> np.ndarray | None:
+        """Return memory-mapped cached scores of the ``key`` models on one test set."""
+        path = self.scores_path(key, test_fingerprint)
+        return np.load(path, mmap_mode="r") if path.exists() else None
+
+    def store_scores(self, key: str, test_fingerprint: str, scores: np.ndarray) -> None:
+        path = self.scores_path(key, test_fingerprint)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_name(f".{path.stem}.{os.getpid()}.tmp.npy")
+        np.save(temporary_path, scores)
+        os.replace(temporary_path, path)
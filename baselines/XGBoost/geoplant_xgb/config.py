@@ -82,6 +82,10 @@ class ExperimentConfig:
     fixed_top_k: int = 25
     use_richness_estimator: bool = True
     richness_offset: int = 5
+    richness_mode: str = "estimator"
     ablations: list[list[str]] = field(default_factory=lambda: [["climatic"]])
     output_dir: str = "outputs"
+    model_cache_dir: str | None = None
+    max_parallel_ablations: int = 1
+    cpu_budget: int | None = None
 
@@ -2,33 +2,115 @@
 
 from __future__ import annotations
 
+from dataclasses import dataclass
 from typing import Dict
 
+import numpy as np
 import pandas as pd
 
 from .config import ExperimentConfig
 
 
+def _first_rows(codes: np.ndarray, rows: np.ndarray, n_groups: int) -> np.ndarray:
+    """Smallest of ``rows`` per code in ``codes``; ``len(codes)`` for codes without one."""
+    first = np.full(n_groups, codes.shape[0], dtype=np.intp)
+    np.minimum.at(first, codes[rows], rows)
+    return first
+
+
+@dataclass
+class LongTableIndex:
+    """First-occurrence index of a long table with one row per (survey, observation).
+
+    ``codes`` maps every row to its position in the sorted ``survey_ids`` (-1
+    for a missing id) and ``first_rows`` holds the first row of every survey.
+    Build it once with :meth:`from_frame` and pass it to both the metadata
+    collapse and :func:`build_wide_labels_from_long_metadata`, so the long
+    table is only scanned once.
+    """
+
+    survey_ids: np.ndarray
+    codes: np.ndarray
+    first_rows: np.ndarray
+
+    @classmethod
+    def from_frame(cls, table: pd.DataFrame, survey_id_column: str = "surveyId") -> "LongTableIndex":
+        """Factorize ``survey_id_column`` of ``table`` and locate each survey's first row."""
+        if survey_id_column not in table.columns:
+            raise ValueError(f"`{survey_id_column}` missing in long table")
+        codes, survey_ids = pd.factorize(table[survey_id_column], sort=True, use_na_sentinel=True)
+        first_rows = _first_rows(codes, np.flatnonzero(codes >= 0), survey_ids.size)
+        return cls(survey_ids=np.asarray(survey_ids), codes=codes, first_rows=first_rows)
+
+    def __len__(self) -> int:
+        return int(self.survey_ids.size)
+
+    def check(self, table: pd.DataFrame) -> None:
+        if self.codes.shape[0] != len(table):
+            raise ValueError(
+                f"LongTableIndex covers {self.codes.shape[0]} rows but the table has {len(table)}"
+            )
+
+    def first_values(self, column: pd.Series) -> pd.Series:
+        """First non-null value of ``column`` per survey, like ``groupby(...).first()``."""
+        values = column.take(self.first_rows)
+        if values.isna().any():
+            rows = np.flatnonzero(column.notna().to_numpy() & (self.codes >= 0))
+            first_non_null = _first_rows(self.codes, rows, len(self))
+            values = column.take(np.where(first_non_null < len(column), first_non_null, self.first_rows))
+        return values.reset_index(drop=True)
+
+    def collapse(self, table: pd.DataFrame, columns: list[str], id_column: str) -> pd.DataFrame:
+        """One row per survey with ``id_column`` first and the first non-null ``columns``."""
+        self.check(table)
+        collapsed = {id_column: self.survey_ids}
+        for column in columns:
+            collapsed[column] = self.first_values(table[column])
+        return pd.DataFrame(collapsed)
+
+
 def build_wide_labels_from_long_metadata(
     train_metadata_long: pd.DataFrame,
     survey_id_column: str = "surveyId",
     species_id_column: str = "speciesId",
     species_prefix: str = "sp_",
+    index: LongTableIndex | None = None,
 ) -> pd.DataFrame:
-    """Convert long-format train metadata to a wide multi-hot label table."""
+    """Convert long-format train metadata to a wide multi-hot label table.
+
+    Pass the ``index`` already built for the metadata collapse to reuse its
+    survey codes instead of factorizing the survey column again.
+    """
     required = {survey_id_column, species_id_column}
     missing = required.difference(train_metadata_long.columns)
     if missing:
         raise ValueError(f"Required columns missing in train metadata: {sorted(missing)}")
+    if index is None:
+        index = LongTableIndex.from_frame(train_metadata_long, survey_id_column)
+    index.check(train_metadata_long)
 
-    pairs = (
-        train_metadata_long[[survey_id_column, species_id_column]]
-        .dropna(subset=[survey_id_column, species_id_column])
-        .drop_duplicates()
+    species_codes, species_ids = pd.factorize(
+        train_metadata_long[species_id_column],
+        sort=True,
+        use_na_sentinel=True,
+    )
+    valid = (index.codes >= 0) & (species_codes >= 0)
+    labels = np.zeros((len(index), species_ids.size), dtype=np.int8)
+    labels[index.codes[valid], species_codes[valid]] = 1
+    survey_ids = index.survey_ids
+    observed = labels.any(axis=1)
+    if not observed.all():
+        labels, survey_ids = labels[observed], survey_ids[observed]
+    present = labels.any(axis=0)
+    if not present.all():
+        labels, species_ids = labels[:, present], species_ids[present]
+    wide = pd.DataFrame(
+        labels,
+        columns=[f"{species_prefix}{int(species_id)}" for species_id in species_ids],
+        copy=False,
     )
-    crosstab = pd.crosstab(pairs[survey_id_column], pairs[species_id_column]).astype("int8")
-    crosstab.columns = [f"{species_prefix}{int(column)}" for column in crosstab.columns]
-    return crosstab.reset_index().rename(columns={survey_id_column: "survey_id"})
+    wide.insert(0, "survey_id", survey_ids)
+    return wide
 
 
 def align_features_with_labels(
@@ -76,12 +158,67 @@ def split_features_by_group(
     cfg: ExperimentConfig,
 ) -> Dict[str, list[str]]:
     """Map feature family name to feature columns using configured prefixes."""
-    group_map: Dict[str, list[str]] = {}
-    for group_name, prefixes in cfg.group_prefixes.items():
-        columns = [
-            column
-            for column in features_df.columns
-            if column != cfg.sample_id_col and any(column.startswith(prefix) for prefix in prefixes)
-        ]
-        group_map[group_name] = sorted(columns)
-    return group_map
+    feature_columns = [column for column in features_df.columns if column != cfg.sample_id_col]
+    return {
+        group_name: sorted(column for column in feature_columns if column.startswith(tuple(prefixes)))
+        for group_name, prefixes in cfg.group_prefixes.items()
+    }
+
+
+@dataclass
+class FeatureMatrix:
+    """Contiguous float32 feature block with a feature group → column position index.
+
+    Columns are stored sorted by name, so the columns of any set of groups come
+    out in the order :func:`split_features_by_group` based selection uses. A
+    selection covering one contiguous run of columns is a view; any other
+    selection is a single float32 gather instead of a DataFrame copy.
+    """
+
+    values: np.ndarray
+    columns: list[str]
+    group_positions: Dict[str, np.ndarray]
+
+    @classmethod
+    def from_frame(
+        cls,
+        features_df: pd.DataFrame,
+        cfg: ExperimentConfig,
+        group_map: Dict[str, list[str]] | None = None,
+    ) -> "FeatureMatrix":
+        """Convert the grouped columns of ``features_df`` once and index them by group."""
+        if group_map is None:
+            group_map = split_features_by_group(features_df, cfg)
+        columns = sorted({column for group_columns in group_map.values() for column in group_columns})
+        positions = {column: index for index, column in enumerate(columns)}
+        values = np.ascontiguousarray(features_df[columns].to_numpy(dtype=np.float32))
+        group_positions = {
+            group_name: np.array([positions[column] for column in group_columns], dtype=np.intp)
+            for group_name, group_columns in group_map.items()
+        }
+        return cls(values=values, columns=columns, group_positions=group_positions)
+
+    def __len__(self) -> int:
+        return int(self.values.shape[0])
+
+    @property
+    def group_map(self) -> Dict[str, list[str]]:
+        return {
+            group_name: [self.columns[index] for index in group_positions]
+            for group_name, group_positions in self.group_positions.items()
+        }
+
+    def positions(self, group_names: list[str]) -> np.ndarray:
+        """Sorted column positions of the union of ``group_names``."""
+        empty = np.empty(0, dtype=np.intp)
+        selected = [self.group_positions.get(group_name, empty) for group_name in group_names]
+        return np.unique(np.concatenate(selected)) if selected else empty
+
+    def select(self, group_names: list[str]) -> tuple[list[str], np.ndarray]:
+        """Return the column names and float32 values of the union of ``group_names``."""
+        positions = self.positions(group_names)
+        if positions.size and positions[-1] - positions[0] + 1 == positions.size:
+            block = self.values[:, positions[0] : positions[-1] + 1]
+        else:
+            block = self.values[:, positions]
+        return [self.columns[index] for index in positions], block
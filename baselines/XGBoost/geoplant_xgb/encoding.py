@@ -2,7 +2,85 @@
 
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
+from scipy import sparse
+
+
+class SparseOneHotEncoder:
+    """One-hot encoder producing a CSR matrix, fitted once and reusable on new frames.
+
+    Categories follow pandas' categorical order, as with ``pd.get_dummies``.
+    Values seen fewer than ``min_frequency`` times during ``fit`` are dropped,
+    and ``max_categories`` keeps only the most frequent values per column.
+    Missing, dropped or unseen values encode as an all-zero row block.
+    """
+
+    def __init__(
+        self,
+        columns: list[str],
+        prefix: str = "",
+        max_categories: int | None = None,
+        min_frequency: int = 1,
+    ):
+        self.columns = list(columns)
+        self.prefix = prefix
+        self.max_categories = max_categories
+        self.min_frequency = int(min_frequency)
+        self.categories_: dict[str, pd.Index] = {}
+
+    def fit(self, frame: pd.DataFrame) -> "SparseOneHotEncoder":
+        self.categories_ = {}
+        for column in self.columns:
+            if column not in frame.columns:
+                continue
+            categorical = pd.Categorical(frame[column])
+            observed = categorical.codes[categorical.codes >= 0]
+            counts = np.bincount(observed, minlength=len(categorical.categories))
+            keep = counts >= self.min_frequency
+            if self.max_categories is not None and keep.sum() > self.max_categories:
+                ranked = np.argsort(-np.where(keep, counts, -1), kind="stable")[: self.max_categories]
+                keep = np.zeros_like(keep)
+                keep[ranked] = True
+            self.categories_[column] = categorical.categories[keep]
+        return self
+
+    @property
+    def feature_names_(self) -> list[str]:
+        return [
+            f"{self.prefix}{column}_{category}"
+            for column, categories in self.categories_.items()
+            for category in categories
+        ]
+
+    def transform(self, frame: pd.DataFrame) -> sparse.csr_matrix:
+        """Encode ``frame`` into a float32 CSR matrix with columns ``feature_names_``."""
+        rows, columns = [], []
+        offset = 0
+        for column, categories in self.categories_.items():
+            if column in frame.columns:
+                codes = categories.get_indexer(frame[column])
+                present = np.flatnonzero(codes >= 0)
+                rows.append(present)
+                columns.append(codes[present].astype(np.int64) + offset)
+            offset += len(categories)
+        row_index = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        column_index = np.concatenate(columns) if columns else np.empty(0, dtype=np.int64)
+        return sparse.csr_matrix(
+            (np.ones(row_index.size, dtype=np.float32), (row_index, column_index)),
+            shape=(len(frame), offset),
+        )
+
+    def fit_transform(self, frame: pd.DataFrame) -> sparse.csr_matrix:
+        return self.fit(frame).transform(frame)
+
+
+def _dense_indicator_frame(encoder: SparseOneHotEncoder, frame: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame(
+        encoder.transform(frame).toarray().astype(bool),
+        index=frame.index,
+        columns=encoder.feature_names_,
+    )
 
 
 def align_one_hot(
@@ -26,13 +104,9 @@ def align_one_hot(
         axis=0,
         ignore_index=True,
     )
-    encoded = pd.get_dummies(
-        combined.astype("category"),
-        dummy_na=False,
-        prefix=[f"{prefix}{column}" for column in present],
-    )
-    train_encoded = encoded.iloc[: len(train_frame)].set_index(train_frame.index)
-    test_encoded = encoded.iloc[len(train_frame) :].set_index(test_frame.index)
+    encoder = SparseOneHotEncoder(present, prefix=prefix).fit(combined)
+    train_encoded = _dense_indicator_frame(encoder, train_frame.reindex(columns=present))
+    test_encoded = _dense_indicator_frame(encoder, test_frame.reindex(columns=present))
     return train_encoded, test_encoded
 
 
@@ -2,13 +2,20 @@
 
 from __future__ import annotations
 
+import json
 from collections.abc import Iterable
+from pathlib import Path
 from typing import Dict
 
+import numpy as np
 import pandas as pd
+from scipy import sparse
 
 from .config import ExperimentConfig, PredictorPairSpec
-from .encoding import align_one_hot, to_numeric
+from .data import LongTableIndex
+from .encoding import SparseOneHotEncoder, align_one_hot, to_numeric
+
+FEATURE_BUILDER_FORMAT_VERSION = 1
 
 
 def _rename_alias_columns(dataframe: pd.DataFrame, aliases: dict[str, str]) -> pd.DataFrame:
@@ -34,23 +41,37 @@ def _ensure_unique_ids(dataframe: pd.DataFrame, id_column: str, dataset_name: st
         )
 
 
+def _ensure_unique_columns(columns: Iterable[str], dataset_name: str) -> None:
+    column_index = pd.Index(list(columns))
+    if column_index.has_duplicates:
+        duplicate_columns = column_index[column_index.duplicated()].unique()[:5].tolist()
+        raise ValueError(
+            f"{dataset_name} has the same column in several predictor families or metadata blocks: "
+            f"{duplicate_columns}; give the families distinct prefixes"
+        )
+
+
 def _collapse_metadata_rows(
     metadata: pd.DataFrame,
     cfg: ExperimentConfig,
     dataset_name: str,
+    index: LongTableIndex | None = None,
 ) -> pd.DataFrame:
-    _require_column(metadata, cfg.source_sample_id_col, dataset_name)
-    collapsed = metadata.copy()
-    collapsed = _rename_alias_columns(collapsed, cfg.metadata_aliases)
+    """One row per survey holding the first non-null value of every metadata column.
 
+    Matches ``groupby(source_sample_id_col).first()`` but only gathers the
+    first-occurrence rows of each column, without copying the long table.
+    """
+    _require_column(metadata, cfg.source_sample_id_col, dataset_name)
+    if index is None:
+        index = LongTableIndex.from_frame(metadata, cfg.source_sample_id_col)
+    renamed = _rename_alias_columns(metadata, cfg.metadata_aliases)
     non_label_columns = [
         column
-        for column in collapsed.columns
-        if column != cfg.species_id_col
+        for column in renamed.columns
+        if column not in (cfg.species_id_col, cfg.source_sample_id_col)
     ]
-    collapsed = collapsed[non_label_columns]
-    collapsed = collapsed.groupby(cfg.source_sample_id_col, as_index=False).first()
-    _ensure_unique_ids(collapsed, cfg.source_sample_id_col, dataset_name)
+    collapsed = index.collapse(renamed, non_label_columns, cfg.source_sample_id_col)
     collapsed[cfg.sample_id_col] = collapsed[cfg.source_sample_id_col]
     return collapsed
 
@@ -107,23 +128,98 @@ def load_predictor_pairs(
     return train_map, test_map
 
 
+def _family_positions(sample_index: pd.Index, family_ids: pd.Series) -> np.ndarray:
+    """Row of each survey in one predictor family, or -1 when the survey is absent."""
+    target_rows = sample_index.get_indexer(family_ids)
+    found = np.flatnonzero(target_rows >= 0)
+    positions = np.full(len(sample_index), -1, dtype=np.intp)
+    positions[target_rows[found]] = found
+    return positions
+
+
+def _join_predictor_families(
+    sample_ids: pd.Series | np.ndarray,
+    predictors_by_name: Dict[str, pd.DataFrame],
+    family_columns: Dict[str, list[str]],
+    out: np.ndarray,
+) -> np.ndarray:
+    """Gather every predictor family into the ``(n_columns, n_samples)`` array ``out``.
+
+    The survey ids are hashed once into a row-position index and each family
+    is gathered with ``np.take`` straight into its block of the preallocated
+    ``out``; families already in survey order are copied without a gather.
+    Surveys absent from a family get NaN. Values are cast to ``out.dtype``
+    (float32 for the feature tables, so integer predictors above 2**24 lose
+    precision) and every family must hold each survey id at most once:
+    duplicates raise instead of fanning rows out the way a merge would.
+    """
+    sample_index = pd.Index(sample_ids)
+    offset = 0
+    for name, columns in family_columns.items():
+        predictors = predictors_by_name[name]
+        _ensure_unique_ids(predictors, "surveyId", name)
+        positions = _family_positions(sample_index, predictors["surveyId"])
+        block = out[offset : offset + len(columns)]
+        values = predictors[columns].to_numpy(dtype=out.dtype).T
+        if values.shape[1] == positions.size and np.array_equal(positions, np.arange(positions.size)):
+            block[:] = values
+        else:
+            np.take(values, positions, axis=1, out=block, mode="clip")
+            block[:, positions < 0] = np.nan
+        offset += len(columns)
+    return out
+
+
+def _predictor_frame(
+    sample_ids: pd.Series,
+    predictors_by_name: Dict[str, pd.DataFrame],
+    index: pd.Index,
+) -> pd.DataFrame:
+    """Wrap the joined predictor families in a float32 frame without copying the gathered values."""
+    family_columns = {
+        name: [column for column in predictors.columns if column != "surveyId"]
+        for name, predictors in predictors_by_name.items()
+    }
+    columns = [column for names in family_columns.values() for column in names]
+    _ensure_unique_columns(columns, "predictor families")
+    joined = np.empty((len(sample_ids), len(columns)), dtype=np.float32, order="F")
+    _join_predictor_families(sample_ids, predictors_by_name, family_columns, joined.T)
+    return pd.DataFrame(joined, index=index, columns=columns, copy=False)
+
+
 def build_features_from_meta_and_predictors_pair(
     experiment_config: ExperimentConfig,
     train_metadata: pd.DataFrame,
     test_metadata: pd.DataFrame,
     train_predictors_by_name: Dict[str, pd.DataFrame],
     test_predictors_by_name: Dict[str, pd.DataFrame],
+    train_metadata_index: LongTableIndex | None = None,
+    test_metadata_index: LongTableIndex | None = None,
 ) -> tuple[pd.DataFrame, pd.DataFrame]:
-    """Encode metadata and merge predictor families into train/test feature tables."""
+    """Encode metadata and join predictor families into train/test feature tables.
+
+    Predictor columns are gathered by survey id straight into one float32
+    block per table instead of a chain of pandas merges, and each table is
+    assembled in a single concat; surveys missing from a family get NaN.
+    Unlike the merges, a family with duplicated survey ids or a column name
+    already used by another family or by the metadata features raises
+    ``ValueError`` rather than fanning out rows or adding ``_x``/``_y``
+    suffixes, and predictor values come back as float32 whatever their
+    source dtype.
+    ``train_metadata_index`` lets the train metadata collapse reuse the
+    :class:`LongTableIndex` also passed to label building.
+    """
     train_meta = _collapse_metadata_rows(
         train_metadata,
         experiment_config,
         "train metadata",
+        train_metadata_index,
     )
     test_meta = _collapse_metadata_rows(
         test_metadata,
         experiment_config,
         "test metadata",
+        test_metadata_index,
     )
 
     train_geo = to_numeric(train_meta, experiment_config.metadata_geo_columns)
@@ -145,29 +241,218 @@ def build_features_from_meta_and_predictors_pair(
         prefix="meta_",
     )
 
-    train_features = pd.concat(
-        [train_meta[[experiment_config.sample_id_col]], train_geo, train_num, train_cat],
-        axis=1,
-    )
-    test_features = pd.concat(
-        [test_meta[[experiment_config.sample_id_col]], test_geo, test_num, test_cat],
-        axis=1,
-    )
+    missing = [name for name in train_predictors_by_name if name not in test_predictors_by_name]
+    if missing:
+        raise ValueError(f"Missing test predictors for `{missing[0]}`")
+    test_predictors_by_name = {name: test_predictors_by_name[name] for name in train_predictors_by_name}
 
-    for pair_name, train_predictors in train_predictors_by_name.items():
-        if pair_name not in test_predictors_by_name:
-            raise ValueError(f"Missing test predictors for `{pair_name}`")
-        train_features = train_features.merge(
-            train_predictors.rename(columns={"surveyId": experiment_config.sample_id_col}),
-            on=experiment_config.sample_id_col,
-            how="left",
+    train_blocks = [train_meta[[experiment_config.sample_id_col]], train_geo, train_num, train_cat]
+    test_blocks = [test_meta[[experiment_config.sample_id_col]], test_geo, test_num, test_cat]
+    if train_predictors_by_name:
+        train_blocks.append(
+            _predictor_frame(train_meta[experiment_config.sample_id_col], train_predictors_by_name, train_meta.index)
         )
-        test_features = test_features.merge(
-            test_predictors_by_name[pair_name].rename(
-                columns={"surveyId": experiment_config.sample_id_col}
-            ),
-            on=experiment_config.sample_id_col,
-            how="left",
+        test_blocks.append(
+            _predictor_frame(test_meta[experiment_config.sample_id_col], test_predictors_by_name, test_meta.index)
         )
+    train_features = pd.concat(train_blocks, axis=1)
+    test_features = pd.concat(test_blocks, axis=1)
+    _ensure_unique_columns(train_features.columns, "train features")
 
     return train_features, test_features
+
+
+class FeatureBuilder:
+    """Fitted feature pipeline that encodes any batch of surveys in isolation.
+
+    ``fit`` records the metadata columns, the category vocabularies, the
+    predictor families and the final column order; ``transform`` then builds
+    the same columns for new surveys without needing the training data.
+    Values unseen at fit time encode as all-zero indicators and absent
+    columns as missing values. The fitted state round-trips through JSON.
+    """
+
+    def __init__(
+        self,
+        experiment_config: ExperimentConfig,
+        max_categories: int | None = None,
+        min_frequency: int = 1,
+    ):
+        self._config = experiment_config
+        self.sample_id_col = experiment_config.sample_id_col
+        self.source_sample_id_col = experiment_config.source_sample_id_col
+        self._encoder = SparseOneHotEncoder(
+            experiment_config.metadata_categorical_columns,
+            prefix="meta_",
+            max_categories=max_categories,
+            min_frequency=min_frequency,
+        )
+        self.geo_columns: list[str] = []
+        self.numeric_columns: list[str] = []
+        self.predictor_columns: dict[str, list[str]] = {}
+        self.feature_columns: list[str] = []
+
+    def fit(
+        self,
+        metadata: pd.DataFrame,
+        predictors_by_name: Dict[str, pd.DataFrame] | None = None,
+    ) -> "FeatureBuilder":
+        """Learn the feature schema from (long or wide) metadata and predictor tables."""
+        collapsed = _collapse_metadata_rows(metadata, self._config, "metadata")
+        self.geo_columns = list(to_numeric(collapsed, self._config.metadata_geo_columns).columns)
+        self.numeric_columns = [
+            column for column in self._config.metadata_numeric_columns if column in collapsed.columns
+        ]
+        self._encoder.fit(collapsed)
+        self.predictor_columns = {
+            name: [column for column in predictors.columns if column != "surveyId"]
+            for name, predictors in (predictors_by_name or {}).items()
+        }
+        self.feature_columns = (
+            self.geo_columns
+            + [f"loc_{column}" for column in self.numeric_columns]
+            + self._encoder.feature_names_
+            + [column for columns in self.predictor_columns.values() for column in columns]
+        )
+        _ensure_unique_columns([self.sample_id_col] + self.feature_columns, "feature builder")
+        return self
+
+    def metadata_columns(self, feature_columns: Iterable[str] | None = None) -> list[str]:
+        """Metadata columns that feed ``feature_columns`` (default: every fitted feature)."""
+        wanted = set(self.feature_columns if feature_columns is None else feature_columns)
+        sources = [(column, column) for column in self.geo_columns]
+        sources += [(f"loc_{column}", column) for column in self.numeric_columns]
+        sources += [
+            (f"{self._encoder.prefix}{column}_{category}", column)
+            for column, categories in self._encoder.categories_.items()
+            for category in categories
+        ]
+        return list(dict.fromkeys(source for feature, source in sources if feature in wanted))
+
+    def _fitted_predictors(
+        self,
+        predictors_by_name: Dict[str, pd.DataFrame] | None,
+    ) -> Dict[str, pd.DataFrame]:
+        predictors_by_name = predictors_by_name or {}
+        missing = [name for name in self.predictor_columns if name not in predictors_by_name]
+        if missing:
+            raise ValueError(f"Missing predictors for `{missing[0]}`")
+        return {
+            name: predictors_by_name[name].reindex(columns=["surveyId"] + columns)
+            for name, columns in self.predictor_columns.items()
+        }
+
+    def _metadata_blocks(self, collapsed: pd.DataFrame) -> tuple[pd.DataFrame, sparse.csr_matrix]:
+        numeric = (
+            collapsed.reindex(columns=self.geo_columns + self.numeric_columns)
+            .apply(pd.to_numeric, errors="coerce")
+            .set_axis(self.geo_columns + [f"loc_{column}" for column in self.numeric_columns], axis=1)
+        )
+        return numeric, self._encoder.transform(collapsed)
+
+    def transform(
+        self,
+        metadata: pd.DataFrame,
+        predictors_by_name: Dict[str, pd.DataFrame] | None = None,
+    ) -> pd.DataFrame:
+        """Build the fitted feature columns for a new batch of surveys."""
+        predictors_by_name = self._fitted_predictors(predictors_by_name)
+        collapsed = _collapse_metadata_rows(metadata, self._config, "metadata")
+        numeric, categorical = self._metadata_blocks(collapsed)
+        blocks = [
+            collapsed[[self.sample_id_col]],
+            numeric,
+            pd.DataFrame(
+                categorical.toarray().astype(bool),
+                index=collapsed.index,
+                columns=self._encoder.feature_names_,
+            ),
+        ]
+        if predictors_by_name:
+            blocks.append(_predictor_frame(collapsed[self.sample_id_col], predictors_by_name, collapsed.index))
+        return pd.concat(blocks, axis=1)
+
+    def transform_matrix(
+        self,
+        metadata: pd.DataFrame,
+        predictors_by_name: Dict[str, pd.DataFrame] | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return ``(survey_ids, features)``, a float32 matrix in ``feature_columns`` order.
+
+        Every block is written straight into one preallocated matrix, without
+        building an intermediate wide DataFrame.
+        """
+        predictors_by_name = self._fitted_predictors(predictors_by_name)
+        collapsed = _collapse_metadata_rows(metadata, self._config, "metadata")
+        numeric, categorical = self._metadata_blocks(collapsed)
+        features = np.empty((len(collapsed), len(self.feature_columns)), dtype=np.float32)
+        n_numeric = numeric.shape[1]
+        n_metadata = n_numeric + categorical.shape[1]
+        features[:, :n_numeric] = numeric.to_numpy(dtype=np.float32, na_value=np.nan)
+        features[:, n_numeric:n_metadata] = categorical.toarray()
+        _join_predictor_families(
+            collapsed[self.sample_id_col],
+            predictors_by_name,
+            self.predictor_columns,
+            features[:, n_metadata:].T,
+        )
+        return collapsed[self.sample_id_col].to_numpy(), features
+
+    def fit_transform(
+        self,
+        metadata: pd.DataFrame,
+        predictors_by_name: Dict[str, pd.DataFrame] | None = None,
+    ) -> pd.DataFrame:
+        return self.fit(metadata, predictors_by_name).transform(metadata, predictors_by_name)
+
+    def to_dict(self) -> dict:
+        """Return the fitted state as a JSON-serializable dictionary."""
+        return {
+            "format_version": FEATURE_BUILDER_FORMAT_VERSION,
+            "sample_id_col": self._config.sample_id_col,
+            "source_sample_id_col": self._config.source_sample_id_col,
+            "species_id_col": self._config.species_id_col,
+            "metadata_aliases": self._config.metadata_aliases,
+            "geo_columns": self.geo_columns,
+            "numeric_columns": self.numeric_columns,
+            "categorical_prefix": self._encoder.prefix,
+            "categories": {
+                column: categories.tolist() for column, categories in self._encoder.categories_.items()
+            },
+            "predictor_columns": self.predictor_columns,
+            "feature_columns": self.feature_columns,
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "FeatureBuilder":
+        if state.get("format_version") != FEATURE_BUILDER_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported feature builder format version: {state.get('format_version')}"
+            )
+        builder = cls(
+            ExperimentConfig(
+                sample_id_col=state["sample_id_col"],
+                source_sample_id_col=state["source_sample_id_col"],
+                species_id_col=state["species_id_col"],
+                metadata_aliases=state["metadata_aliases"],
+                metadata_categorical_columns=list(state["categories"]),
+            )
+        )
+        builder.geo_columns = list(state["geo_columns"])
+        builder.numeric_columns = list(state["numeric_columns"])
+        builder._encoder.prefix = state["categorical_prefix"]
+        builder._encoder.categories_ = {
+            column: pd.Index(categories) for column, categories in state["categories"].items()
+        }
+        builder.predictor_columns = {
+            name: list(columns) for name, columns in state["predictor_columns"].items()
+        }
+        builder.feature_columns = list(state["feature_columns"])
+        return builder
+
+    def save(self, path: str | Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: str | Path) -> "FeatureBuilder":
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
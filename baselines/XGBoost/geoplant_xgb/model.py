@@ -2,11 +2,19 @@
 
 from __future__ import annotations
 
+import json
+import os
+import threading
+import warnings
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from typing import Any, Dict
 
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
+from scipy import sparse
+from sklearn.model_selection import GroupShuffleSplit, train_test_split
 from tqdm.auto import tqdm
 
 from .config import ExperimentConfig
@@ -23,84 +31,283 @@ def _get_xgb():
     return xgb
 
 
+def _as_float32_matrix(
+    features: pd.DataFrame | np.ndarray | sparse.spmatrix,
+) -> np.ndarray | sparse.csr_matrix:
+    """Return ``features`` as a float32 array, keeping sparse input in CSR form."""
+    if sparse.issparse(features):
+        return sparse.csr_matrix(features, dtype=np.float32)
+    return np.asarray(features, dtype=np.float32)
+
+
+def _group_validation_split(
+    feature_array: np.ndarray,
+    validation_groups: np.ndarray,
+    cfg: ExperimentConfig,
+    rows: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Hold out whole groups (e.g. spatial blocks) of ``rows`` for early stopping.
+
+    The split does not depend on the species, so it is drawn and materialized
+    once and shared by every one-vs-rest model. Both sides are gathered
+    straight from ``feature_array``; the returned row indices refer to it.
+    """
+    rows = np.arange(feature_array.shape[0]) if rows is None else rows
+    splitter = GroupShuffleSplit(
+        n_splits=1,
+        test_size=0.1,
+        random_state=cfg.xgb_params.get("random_state", 42),
+    )
+    train_positions, valid_positions = next(splitter.split(rows, groups=validation_groups[rows]))
+    train_rows, valid_rows = rows[train_positions], rows[valid_positions]
+    return feature_array[train_rows], feature_array[valid_rows], train_rows, valid_rows
+
+
 def _train_single_species(
     feature_array: np.ndarray,
     target_binary: np.ndarray,
     cfg: ExperimentConfig,
+    validation_split: tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray] | None = None,
+    rows: np.ndarray | None = None,
 ) -> Any:
-    """Fit one XGBoost classifier with early stopping for a single species."""
+    """Fit one XGBoost classifier with early stopping for a single species.
+
+    Without ``validation_split`` a random stratified 10% of ``rows`` (default:
+    all rows) is used for early stopping; otherwise the precomputed
+    ``(X_train, X_valid, train_rows, valid_rows)`` split from
+    :func:`_group_validation_split`.
+    """
     xgb = _get_xgb()
     model = xgb.XGBClassifier(
         **cfg.xgb_params,
         early_stopping_rounds=cfg.early_stopping_rounds,
     )
-    stratify = target_binary if np.unique(target_binary).size > 1 else None
-    X_train, X_valid, y_train, y_valid = train_test_split(
-        feature_array,
-        target_binary,
-        test_size=0.1,
-        random_state=cfg.xgb_params.get("random_state", 42),
-        stratify=stratify,
-    )
+    if validation_split is not None:
+        X_train, X_valid, train_rows, valid_rows = validation_split
+        y_train, y_valid = target_binary[train_rows], target_binary[valid_rows]
+    else:
+        rows = np.arange(feature_array.shape[0]) if rows is None else rows
+        row_targets = target_binary[rows]
+        stratify = row_targets if np.unique(row_targets).size > 1 else None
+        train_rows, valid_rows = train_test_split(
+            rows,
+            test_size=0.1,
+            random_state=cfg.xgb_params.get("random_state", 42),
+            stratify=stratify,
+        )
+        X_train, X_valid = feature_array[train_rows], feature_array[valid_rows]
+        y_train, y_valid = target_binary[train_rows], target_binary[valid_rows]
     model.fit(X_train, y_train, eval_set=[(X_valid, y_valid)])
     return model
 
 
 def train_ovr(
-    train_features: pd.DataFrame,
+    train_features: pd.DataFrame | np.ndarray | sparse.spmatrix,
     train_labels: pd.DataFrame,
     species_column_names: list[str],
     cfg: ExperimentConfig,
+    validation_groups: np.ndarray | None = None,
+    rows: np.ndarray | None = None,
 ) -> Dict[str, Any]:
-    """Train one-vs-rest classifiers for the selected species columns."""
-    feature_array = train_features.values.astype(np.float32)
+    """Train one-vs-rest classifiers for the selected species columns.
+
+    ``train_features`` may be a DataFrame, a dense array or a sparse matrix
+    (e.g. from :class:`~geoplant_xgb.encoding.SparseOneHotEncoder`); sparse
+    input is passed to XGBoost as CSR without densifying, so its implicit
+    zeros are treated as missing values and must be scored sparse too.
+
+    With ``validation_groups`` (one group id per row), early stopping holds
+    out whole groups instead of random rows, so spatially autocorrelated
+    neighbours of training rows do not leak into the validation set. A
+    species whose positives all fall in held-out groups falls back to a
+    random row split, with a warning, rather than training on no positives.
+
+    ``rows`` restricts training to those rows of ``train_features``,
+    ``train_labels`` and ``validation_groups`` (e.g. the training folds of a
+    cross-validation split): they are gathered straight into the training and
+    validation matrices, without first copying the selected rows.
+    """
+    feature_array = _as_float32_matrix(train_features)
+    rows = np.asarray(rows) if rows is not None else None
+    validation_split = None
+    if validation_groups is not None:
+        validation_split = _group_validation_split(feature_array, np.asarray(validation_groups), cfg, rows)
     models: Dict[str, Any] = {}
     for species_name in tqdm(species_column_names, desc="Training OVR models", leave=False):
         target = train_labels[species_name].values.astype(np.int32)
-        if target.max() == 0:
+        if (target if rows is None else target[rows]).max() == 0:
             continue
-        models[species_name] = _train_single_species(feature_array, target, cfg)
+        species_split = validation_split
+        if species_split is not None and target[species_split[2]].max() == 0:
+            warnings.warn(
+                f"All positives of {species_name} are in held-out validation groups; "
+                "using a random row split for its early stopping instead.",
+                stacklevel=2,
+            )
+            species_split = None
+        models[species_name] = _train_single_species(
+            feature_array,
+            target,
+            cfg,
+            validation_split=species_split,
+            rows=rows,
+        )
     return models
 
 
+def _feature_batch(
+    features_matrix: pd.DataFrame | np.ndarray | sparse.spmatrix,
+    start: int,
+    stop: int,
+) -> np.ndarray | sparse.csr_matrix:
+    if isinstance(features_matrix, pd.DataFrame):
+        return features_matrix.iloc[start:stop].to_numpy(dtype=np.float32)
+    if sparse.issparse(features_matrix):
+        return sparse.csr_matrix(features_matrix[start:stop], dtype=np.float32)
+    return np.ascontiguousarray(features_matrix[start:stop], dtype=np.float32)
+
+
+def _xgb_booster(model: Any) -> Any | None:
+    """The ``Booster`` behind an XGBoost model, or None for other estimators."""
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    return booster if hasattr(booster, "inplace_predict") else None
+
+
+def _species_predictor(model: Any) -> Callable[[np.ndarray], np.ndarray]:
+    """Return a callable mapping a float32 batch to class-1 probabilities.
+
+    XGBoost models are scored through ``Booster.inplace_predict`` restricted to
+    the early-stopping best iteration, which skips the DMatrix that
+    ``predict_proba`` builds on every call. Other estimators fall back to
+    ``predict_proba``.
+    """
+    booster = _xgb_booster(model)
+    if booster is None:
+        return lambda batch: model.predict_proba(batch)[:, 1]
+    try:
+        iteration_range = (0, int(booster.best_iteration) + 1)
+    except AttributeError:
+        iteration_range = (0, 0)
+    return lambda batch: booster.inplace_predict(batch, iteration_range=iteration_range)
+
+
+_BOOSTER_THREADS_LOCK = threading.Lock()
+_BOOSTER_THREADS_USERS: dict[int, list] = {}
+
+
+@contextmanager
+def _booster_threads(boosters: list[Any], n_threads: int) -> Iterator[None]:
+    """Set ``nthread`` of ``boosters`` to ``n_threads`` and restore the caller's value on exit.
+
+    Concurrent calls sharing a booster (e.g. grid tiles scored by the same
+    models) keep its original value aside until the last of them exits.
+    """
+    with _BOOSTER_THREADS_LOCK:
+        for booster in boosters:
+            users = _BOOSTER_THREADS_USERS.get(id(booster))
+            if users is None:
+                original = json.loads(booster.save_config())["learner"]["generic_param"]["nthread"]
+                users = _BOOSTER_THREADS_USERS[id(booster)] = [0, original]
+            users[0] += 1
+            booster.set_param({"nthread": int(n_threads)})
+    try:
+        yield
+    finally:
+        with _BOOSTER_THREADS_LOCK:
+            for booster in boosters:
+                users = _BOOSTER_THREADS_USERS[id(booster)]
+                users[0] -= 1
+                if users[0] == 0:
+                    del _BOOSTER_THREADS_USERS[id(booster)]
+                    booster.set_param({"nthread": users[1]})
+
+
 def predict_scores(
     models_by_species: Dict[str, Any],
-    features_matrix: pd.DataFrame,
+    features_matrix: pd.DataFrame | np.ndarray | sparse.spmatrix,
     species_column_names: list[str],
+    batch_size: int = 65536,
+    n_threads: int | None = None,
 ) -> np.ndarray:
-    """Predict class-1 probabilities in the given species order."""
-    scores = np.zeros((len(features_matrix), len(species_column_names)), dtype=np.float32)
-    feature_array = features_matrix.values.astype(np.float32)
-    for index, species_name in enumerate(species_column_names):
-        model = models_by_species.get(species_name)
-        if model is None:
-            continue
-        scores[:, index] = model.predict_proba(feature_array)[:, 1]
+    """Predict class-1 probabilities in the given species order.
+
+    Rows are converted to float32 once per batch of ``batch_size`` and the
+    species are scored on that batch concurrently. ``n_threads`` (default: all
+    CPUs) bounds the total number of threads: it is split between concurrent
+    species and the threads of each booster, whose ``nthread`` is set for the
+    duration of the call and then restored.
+    """
+    n_samples = features_matrix.shape[0]
+    scores = np.zeros((n_samples, len(species_column_names)), dtype=np.float32)
+    trained = [
+        (index, models_by_species[species_name])
+        for index, species_name in enumerate(species_column_names)
+        if models_by_species.get(species_name) is not None
+    ]
+    if not trained:
+        return scores
+
+    thread_budget = max(1, int(n_threads or os.cpu_count() or 1))
+    max_workers = min(len(trained), thread_budget)
+    predictors = [(index, _species_predictor(model)) for index, model in trained]
+    boosters = [booster for booster in (_xgb_booster(model) for _, model in trained) if booster is not None]
+    booster_threads = _booster_threads(boosters, thread_budget // max_workers)
+    with booster_threads, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for start in range(0, n_samples, max(1, int(batch_size))):
+            stop = min(start + int(batch_size), n_samples)
+            batch = _feature_batch(features_matrix, start, stop)
+
+            def score_species(predictor: tuple[int, Callable[[np.ndarray], np.ndarray]]) -> None:
+                index, predict = predictor
+                scores[start:stop, index] = predict(batch)
+
+            list(executor.map(score_species, predictors))
     return scores
 
 
+def _richness_bins(richness: np.ndarray, nbins: int) -> tuple[np.ndarray, np.ndarray]:
+    """Quantile-bin ``richness`` and return ``(bin_edges, bins)``."""
+    quantiles = np.linspace(0, 1, nbins + 1)
+    bin_edges = np.unique(np.quantile(richness, quantiles))
+    if bin_edges.size < 2:
+        bin_edges = np.array([-0.5, float(richness.max()) + 0.5], dtype=float)
+        return bin_edges, np.zeros_like(richness)
+    bin_edges[0] = -0.5
+    return bin_edges, np.digitize(richness, bin_edges[1:], right=True)
+
+
+def _bin_mean_lookup(bins: np.ndarray, richness: np.ndarray) -> np.ndarray:
+    """Return a dense array whose entry ``b`` is the mean richness of bin ``b`` (0 when empty)."""
+    counts = np.bincount(bins)
+    sums = np.bincount(bins, weights=richness, minlength=counts.size)
+    return np.divide(sums, counts, out=np.zeros(counts.size, dtype=np.float64), where=counts > 0)
+
+
+def _as_bin_lookup(bin_to_mean_richness: np.ndarray | dict[int, float]) -> np.ndarray:
+    if isinstance(bin_to_mean_richness, dict):
+        lookup = np.zeros(max(bin_to_mean_richness, default=-1) + 1, dtype=np.float64)
+        lookup[list(bin_to_mean_richness)] = list(bin_to_mean_richness.values())
+        return lookup
+    return np.asarray(bin_to_mean_richness, dtype=np.float64)
+
+
 def train_richness_estimator(
-    train_features: pd.DataFrame,
+    train_features: pd.DataFrame | np.ndarray | sparse.spmatrix,
     train_labels: pd.DataFrame,
     cfg: ExperimentConfig,
     nbins: int = 15,
-) -> tuple[Any, np.ndarray, dict[int, float]]:
-    """Train a multiclass classifier that predicts sample richness bins."""
+) -> tuple[Any, np.ndarray, np.ndarray]:
+    """Train a multiclass classifier that predicts sample richness bins.
+
+    Returns the classifier, the bin edges and a dense lookup array mapping each
+    predicted class to the mean training richness of its bin. Empty quantile
+    bins are dropped so the classes are contiguous, as XGBoost requires.
+    """
     xgb = _get_xgb()
     richness = train_labels.sum(axis=1).values.astype(np.int32)
-    quantiles = np.linspace(0, 1, nbins + 1)
-    bin_edges = np.unique(np.quantile(richness, quantiles))
-    if bin_edges.size < 2:
-        bin_edges = np.array([-0.5, float(richness.max()) + 0.5], dtype=float)
-        bins = np.zeros_like(richness)
-    else:
-        bin_edges[0] = -0.5
-        bins = np.digitize(richness, bin_edges[1:], right=True)
-
-    bin_to_mean = {
-        int(bin_index): float(richness[bins == bin_index].mean())
-        for bin_index in np.unique(bins)
-    }
+    bin_edges, bins = _richness_bins(richness, nbins)
+    _, bins = np.unique(bins, return_inverse=True)
+    bin_to_mean = _bin_mean_lookup(bins, richness)
 
     classifier = xgb.XGBClassifier(
         n_estimators=200,
@@ -111,12 +318,12 @@ def train_richness_estimator(
         tree_method=cfg.xgb_params.get("tree_method", "hist"),
         random_state=cfg.xgb_params.get("random_state", 42),
         n_jobs=cfg.xgb_params.get("n_jobs", 8),
-        eval_metric="mlogloss",
+        eval_metric="mlogloss" if bin_to_mean.size > 2 else "logloss",
         early_stopping_rounds=20,
     )
     stratify = bins if np.unique(bins).size > 1 else None
     X_train, X_valid, y_train, y_valid = train_test_split(
-        train_features.values.astype(np.float32),
+        _as_float32_matrix(train_features),
         bins,
         test_size=0.1,
         random_state=cfg.xgb_params.get("random_state", 42),
@@ -129,15 +336,57 @@ def train_richness_estimator(
 def estimate_topk(
     classifier: Any,
     bin_edges: np.ndarray,
-    bin_to_mean_richness: dict[int, float],
-    features_matrix: pd.DataFrame,
+    bin_to_mean_richness: np.ndarray | dict[int, float],
+    features_matrix: pd.DataFrame | np.ndarray | sparse.spmatrix,
     offset: int = 5,
+    batch_size: int = 65536,
 ) -> np.ndarray:
-    """Predict a Top-K value per sample from the richness estimator."""
+    """Predict a Top-K value per sample from the richness estimator.
+
+    Rows are classified in batches of ``batch_size`` and mapped to K with a
+    single gather into the dense bin lookup.
+    """
     del bin_edges
-    predicted_bins = classifier.predict(features_matrix.values.astype(np.float32))
-    mean_richness = np.array(
-        [bin_to_mean_richness.get(int(bin_index), 0.0) for bin_index in predicted_bins],
-        dtype=np.float32,
-    )
-    return np.clip(np.rint(mean_richness).astype(int) + int(offset), 1, 5000)
+    lookup = _as_bin_lookup(bin_to_mean_richness)
+    n_samples = features_matrix.shape[0]
+    predicted_bins = np.empty(n_samples, dtype=np.int64)
+    for start in range(0, n_samples, max(1, int(batch_size))):
+        stop = min(start + int(batch_size), n_samples)
+        predicted_bins[start:stop] = classifier.predict(_feature_batch(features_matrix, start, stop))
+    return np.clip(np.rint(lookup[predicted_bins]).astype(int) + int(offset), 1, 5000)
+
+
+RICHNESS_MODES = ("estimator", "expected_richness", "expected_f1")
+
+
+def estimate_topk_from_scores(
+    scores: np.ndarray,
+    mode: str = "expected_richness",
+    offset: int = 5,
+    batch_size: int = 16384,
+) -> np.ndarray:
+    """Derive a per-sample Top-K from an already computed score matrix.
+
+    ``"expected_richness"`` uses the rounded sum of the species probabilities
+    plus ``offset``. ``"expected_f1"`` picks, per row, the K maximizing the
+    plug-in expected F1 ``2 * sum(top-K scores) / (K + sum(scores))``; no
+    offset is added since K is already the optimum. Rows are processed in
+    batches of ``batch_size``.
+    """
+    if mode not in RICHNESS_MODES[1:]:
+        raise ValueError(f"Unknown score-based richness mode: {mode!r}")
+    scores = np.asarray(scores)
+    n_samples, n_species = scores.shape
+    topk = np.empty(n_samples, dtype=int)
+    for start in range(0, n_samples, max(1, int(batch_size))):
+        stop = min(start + int(batch_size), n_samples)
+        batch = np.asarray(scores[start:stop], dtype=np.float64)
+        expected_richness = batch.sum(axis=1)
+        if mode == "expected_richness":
+            topk[start:stop] = np.rint(expected_richness).astype(int) + int(offset)
+            continue
+        ranked = -np.sort(-batch, axis=1)
+        ranked_mass = np.cumsum(ranked, axis=1)
+        expected_f1 = 2.0 * ranked_mass / (np.arange(1, n_species + 1) + expected_richness[:, None])
+        topk[start:stop] = np.argmax(expected_f1, axis=1) + 1
+    return np.clip(topk, 1, 5000)
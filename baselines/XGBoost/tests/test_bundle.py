@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from geoplant_xgb.bundle import load_model_bundle, read_array_file, save_model_bundle, write_array_file
+from geoplant_xgb.config import ExperimentConfig
+from geoplant_xgb.model import estimate_topk, predict_scores, train_ovr, train_richness_estimator
+
+
+def test_array_file_round_trip_is_memory_mapped(tmp_path):
+    path = tmp_path / "arrays.bundle"
+    write_array_file(
+        path,
+        {"name": "demo"},
+        {"weights": np.arange(6, dtype=np.float32).reshape(2, 3), "empty": np.empty(0, dtype=np.uint8)},
+    )
+
+    metadata, arrays = read_array_file(path)
+
+    assert metadata == {"name": "demo"}
+    assert isinstance(arrays["weights"].base, np.memmap)
+    assert not arrays["weights"].flags.writeable
+    assert arrays["weights"].tolist() == [[0.0, 1.0, 2.0], [3.0, 4.0, 5.0]]
+    assert arrays["empty"].shape == (0,)
+
+
+def test_model_bundle_round_trip_preserves_scores_and_topk(tmp_path):
+    pytest.importorskip("xgboost")
+    cfg = ExperimentConfig(
+        xgb_params={"n_estimators": 20, "max_depth": 2, "n_jobs": 1, "verbosity": 0},
+        early_stopping_rounds=5,
+    )
+    rng = np.random.default_rng(0)
+    features = pd.DataFrame(rng.normal(size=(200, 2)), columns=["clim_a", "clim_b"])
+    labels = pd.DataFrame(
+        {
+            "sp_1": (features["clim_a"] > 0).astype(int),
+            "sp_2": (features["clim_b"] > 0).astype(int),
+            "sp_3": (features["clim_a"] + features["clim_b"] > 0).astype(int),
+        }
+    )
+    species = ["sp_1", "sp_2", "sp_3"]
+    models = train_ovr(features, labels, species, cfg)
+    richness = train_richness_estimator(features, labels, cfg, nbins=3)
+
+    path = tmp_path / "ablation.bundle"
+    save_model_bundle(path, models, species, ["clim_a", "clim_b"], richness_estimator=richness)
+    bundle = load_model_bundle(path)
+
+    shuffled = features[["clim_b", "clim_a"]]
+    assert bundle.species_column_names == species
+    assert np.allclose(bundle.predict_scores(shuffled), predict_scores(models, features, species))
+    assert np.array_equal(
+        bundle.estimate_topk(shuffled, offset=0),
+        estimate_topk(*richness, features, offset=0),
+    )
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from geoplant_xgb.config import ExperimentConfig
+from geoplant_xgb.grid import GridSpec, _index_dtype, iter_grid_scores, predict_grid
+from geoplant_xgb.io_csv import FeatureBuilder
+from geoplant_xgb.model import predict_scores, train_ovr
+
+
+def test_grid_spec_tiles_cover_every_cell_once():
+    grid = GridSpec.from_bounds((-10.0, 40.0, -5.0, 43.0), resolution=0.5)
+
+    assert grid.shape == (6, 10)
+    covered = np.zeros(grid.shape, dtype=int)
+    for rows, cols in grid.tiles(4):
+        covered[rows, cols] += 1
+        assert np.array_equal(np.sort(grid.cell_ids(rows, cols)), grid.cell_ids(rows, cols))
+    assert (covered == 1).all()
+
+    longitudes, latitudes = grid.cell_centers(slice(0, 2), slice(0, 3))
+    assert longitudes.tolist() == [-9.75, -9.25, -8.75] * 2
+    assert latitudes.tolist() == [42.75] * 3 + [42.25] * 3
+    with pytest.raises(ValueError):
+        GridSpec(0.0, 0.0, 0.0, 1.0, resolution=0.1)
+
+
+def test_predict_grid_streams_tiles_into_maps_matching_direct_scoring(tmp_path):
+    pytest.importorskip("xgboost")
+    cfg = ExperimentConfig(xgb_params={"n_estimators": 10, "max_depth": 2, "n_jobs": 1, "verbosity": 0})
+    rng = np.random.default_rng(0)
+    metadata = pd.DataFrame(
+        {"surveyId": np.arange(300), "lat": rng.uniform(40.0, 43.0, 300), "lon": rng.uniform(-10.0, -5.0, 300)}
+    )
+    predictors = {"bioclim": pd.DataFrame({"surveyId": metadata["surveyId"], "clim_a": metadata["lon"] * 2.0})}
+    builder = FeatureBuilder(cfg).fit(metadata, predictors)
+    _, features = builder.transform_matrix(metadata, predictors)
+    labels = pd.DataFrame(
+        {
+            "sp_1": (metadata["lon"] > -7.5).astype(int),
+            "sp_2": (metadata["lat"] > 41.5).astype(int),
+            "sp_3": (metadata["lat"] + metadata["lon"] > 34.0).astype(int),
+        }
+    )
+    species = ["sp_1", "sp_2", "sp_3"]
+    models = train_ovr(features, labels, species, cfg)
+
+    def sampler(longitudes, latitudes):
+        return {"bioclim": pd.DataFrame({"clim_a": longitudes * 2.0})}
+
+    grid = GridSpec.from_bounds((-10.0, 40.0, -5.0, 43.0), resolution=0.5)
+    sidecar = predict_grid(
+        grid,
+        sampler,
+        builder,
+        models,
+        species,
+        tmp_path,
+        tile_size=4,
+        topk=2,
+        probability_dtype=np.float32,
+        n_workers=2,
+    )
+
+    (rows, cols, expected), = iter_grid_scores(grid, sampler, builder, models, species, tile_size=16)
+    longitudes, latitudes = grid.cell_centers(rows, cols)
+    whole = pd.DataFrame({"surveyId": grid.cell_ids(rows, cols), "lat": latitudes, "lon": longitudes})
+    _, whole_features = builder.transform_matrix(
+        whole, {"bioclim": pd.DataFrame({"surveyId": whole["surveyId"], "clim_a": longitudes * 2.0})}
+    )
+    np.testing.assert_allclose(expected, predict_scores(models, whole_features, species), rtol=1e-6)
+
+    probabilities = np.load(tmp_path / "probabilities.npy")
+    topk = np.load(tmp_path / "topk.npy")
+    assert probabilities.shape == (3, 6, 10) and topk.shape == (2, 6, 10)
+    assert topk.dtype == np.int16 and _index_dtype(32768) == np.int16 and _index_dtype(32769) == np.int32
+    np.testing.assert_allclose(probabilities.reshape(3, -1).T, expected, rtol=1e-6)
+    np.testing.assert_array_equal(topk.reshape(2, -1).T, np.argsort(-expected, axis=1, kind="stable")[:, :2])
+    assert json.loads((tmp_path / "grid.json").read_text()) == sidecar
+    assert sidecar["species"] == species and sidecar["transform"] == [0.5, 0.0, -10.0, 0.0, -0.5, 43.0]
+
+
+def test_grid_scores_subset_models_and_requires_fitted_metadata():
+    pytest.importorskip("xgboost")
+    cfg = ExperimentConfig(xgb_params={"n_estimators": 10, "max_depth": 2, "n_jobs": 1, "verbosity": 0})
+    rng = np.random.default_rng(0)
+    metadata = pd.DataFrame(
+        {
+            "surveyId": np.arange(300),
+            "lat": rng.uniform(40.0, 43.0, 300),
+            "lon": rng.uniform(-10.0, -5.0, 300),
+            "year": rng.integers(2017, 2022, 300),
+            "country": rng.choice(["France", "Spain"], 300),
+        }
+    )
+    predictors = {
+        "bioclim": pd.DataFrame(
+            {"surveyId": metadata["surveyId"], "clim_a": metadata["lon"] * 2.0, "clim_b": metadata["lat"]}
+        )
+    }
+    builder = FeatureBuilder(cfg).fit(metadata, predictors)
+    _, features = builder.transform_matrix(metadata, predictors)
+    labels = pd.DataFrame(
+        {"sp_1": (metadata["lon"] > -7.5).astype(int), "sp_2": (metadata["lat"] > 41.5).astype(int)}
+    )
+    species = ["sp_1", "sp_2"]
+    subset = ["clim_a", "clim_b"]
+    subset_positions = [builder.feature_columns.index(column) for column in subset]
+    subset_models = train_ovr(features[:, subset_positions], labels, species, cfg)
+    models = train_ovr(features, labels, species, cfg)
+
+    def sampler(longitudes, latitudes):
+        return {"bioclim": pd.DataFrame({"clim_a": longitudes * 2.0, "clim_b": latitudes})}
+
+    grid = GridSpec.from_bounds((-10.0, 40.0, -5.0, 43.0), resolution=0.5)
+    (rows, cols, scores), = iter_grid_scores(
+        grid, sampler, builder, subset_models, species, tile_size=16, feature_columns=subset
+    )
+    longitudes, latitudes = grid.cell_centers(rows, cols)
+    subset_features = np.column_stack([longitudes * 2.0, latitudes]).astype(np.float32)
+    np.testing.assert_allclose(scores, predict_scores(subset_models, subset_features, species), rtol=1e-6)
+
+    with pytest.raises(ValueError, match="year"):
+        next(iter_grid_scores(grid, sampler, builder, models, species))
+
+    def cell_metadata(longitudes, latitudes):
+        return pd.DataFrame({"year": np.full(longitudes.size, 2021), "country": "Spain"})
+
+    (_, _, scores), = iter_grid_scores(
+        grid, sampler, builder, models, species, tile_size=16, cell_metadata=cell_metadata
+    )
+    whole = pd.DataFrame(
+        {"surveyId": grid.cell_ids(rows, cols), "lat": latitudes, "lon": longitudes, "year": 2021, "country": "Spain"}
+    )
+    whole_predictors = {"bioclim": sampler(longitudes, latitudes)["bioclim"].assign(surveyId=whole["surveyId"])}
+    _, whole_features = builder.transform_matrix(whole, whole_predictors)
+    assert not np.isnan(whole_features).any()
+    np.testing.assert_allclose(scores, predict_scores(models, whole_features, species), rtol=1e-6)
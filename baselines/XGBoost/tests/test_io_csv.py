@@ -1,9 +1,18 @@
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
+import pytest
+from scipy import sparse
 
 from geoplant_xgb.config import ExperimentConfig, PredictorPairSpec
-from geoplant_xgb.io_csv import build_features_from_meta_and_predictors_pair, load_predictor_pairs
+from geoplant_xgb.encoding import SparseOneHotEncoder
+from geoplant_xgb.io_csv import (
+    FeatureBuilder,
+    build_features_from_meta_and_predictors_pair,
+    load_predictor_pairs,
+)
+from geoplant_xgb.model import predict_scores, train_ovr
 
 
 def test_build_features_collapses_long_metadata_and_aligns_one_hot_columns(tmp_path):
@@ -83,3 +92,94 @@ def test_load_predictor_pairs_keeps_numeric_columns_only(tmp_path):
 
     assert list(train_map["bioclim"].columns) == ["surveyId", "clim_bio1"]
     assert list(test_map["bioclim"].columns) == ["surveyId", "clim_bio1"]
+
+
+def test_sparse_one_hot_encoder_caps_categories_and_trains_xgboost():
+    train = pd.DataFrame({"county": ["Ain"] * 5 + ["Drome"] * 3 + ["Isere"], "country": ["France"] * 9})
+    encoder = SparseOneHotEncoder(["county", "country", "district"], prefix="meta_", min_frequency=2)
+    encoded = encoder.fit_transform(train)
+
+    assert sparse.isspmatrix_csr(encoded)
+    assert encoder.feature_names_ == ["meta_county_Ain", "meta_county_Drome", "meta_country_France"]
+    assert encoded.sum(axis=1).A1.tolist() == [2.0] * 8 + [1.0]
+    unseen = encoder.transform(pd.DataFrame({"county": ["Savoie", "Drome"], "country": [None, "France"]}))
+    assert unseen.toarray().tolist() == [[0.0, 0.0, 0.0], [0.0, 1.0, 1.0]]
+    capped = SparseOneHotEncoder(["county"], max_categories=1).fit(train)
+    assert list(capped.categories_["county"]) == ["Ain"]
+
+    pytest.importorskip("xgboost")
+
+    repeated = sparse.vstack([encoded] * 4).tocsr()
+    labels = pd.DataFrame({"sp_1": np.tile((train["county"] == "Ain").astype(int), 4)})
+    cfg = ExperimentConfig(xgb_params={"n_estimators": 5, "n_jobs": 1, "verbosity": 0}, early_stopping_rounds=2)
+    models = train_ovr(repeated, labels, ["sp_1"], cfg)
+    scores = predict_scores(models, repeated, ["sp_1"], batch_size=4)
+    assert np.allclose(scores[:, 0], models["sp_1"].predict_proba(repeated)[:, 1])
+
+
+def test_feature_builder_transforms_new_batches_after_reload(tmp_path):
+    cfg = ExperimentConfig()
+    train_metadata = pd.DataFrame(
+        {
+            "surveyId": [1, 1, 2],
+            "speciesId": [10, 11, 12],
+            "lat": [45.1, 45.1, 46.2],
+            "lon": [5.2, 5.2, 6.3],
+            "country": ["France", "France", "Spain"],
+            "year": [2020, 2020, 2021],
+        }
+    )
+    train_predictors = {"bioclim": pd.DataFrame({"surveyId": [1, 2], "clim_bio1": [0.1, 0.2]})}
+    builder = FeatureBuilder(cfg).fit(train_metadata, train_predictors)
+    reference, _ = build_features_from_meta_and_predictors_pair(
+        cfg, train_metadata, train_metadata, train_predictors, train_predictors
+    )
+    pd.testing.assert_frame_equal(builder.transform(train_metadata, train_predictors), reference)
+
+    builder.save(tmp_path / "features.json")
+    reloaded = FeatureBuilder.load(tmp_path / "features.json")
+    batch = reloaded.transform(
+        pd.DataFrame({"surveyId": [7], "lat": [47.3], "country": ["Italy"], "year": [2022]}),
+        {"bioclim": pd.DataFrame({"surveyId": [7], "clim_bio1": [0.3]})},
+    )
+
+    assert list(batch.columns) == ["survey_id"] + builder.feature_columns
+    assert batch.loc[0, ["meta_country_France", "meta_country_Spain"]].tolist() == [False, False]
+    assert pd.isna(batch.loc[0, "lon"])
+    assert batch.loc[0, "clim_bio1"] == 0.3
+
+
+def test_predictor_join_aligns_by_survey_id_and_fills_missing_rows():
+    cfg = ExperimentConfig()
+    metadata = pd.DataFrame({"surveyId": [3, 1, 2], "lat": [45.0, 46.0, 47.0]})
+    predictors = {
+        "bioclim": pd.DataFrame({"surveyId": [2, 3, 9], "clim_bio1": [0.2, 0.3, 0.9]}),
+        "soil": pd.DataFrame({"surveyId": [1, 2, 3], "soil_ph": [6, 7, 8]}),
+    }
+
+    features, _ = build_features_from_meta_and_predictors_pair(cfg, metadata, metadata, predictors, predictors)
+
+    assert features["survey_id"].tolist() == [1, 2, 3]
+    assert features["clim_bio1"].dtype == np.float32
+    assert features["clim_bio1"].tolist()[1:] == np.float32([0.2, 0.3]).tolist()
+    assert pd.isna(features.loc[0, "clim_bio1"])
+    assert features["soil_ph"].tolist() == [6.0, 7.0, 8.0]
+
+    builder = FeatureBuilder(cfg).fit(metadata, predictors)
+    survey_ids, matrix = builder.transform_matrix(metadata, predictors)
+    assert survey_ids.tolist() == [1, 2, 3]
+    assert matrix.dtype == np.float32 and matrix.flags["C_CONTIGUOUS"]
+    np.testing.assert_array_equal(
+        matrix,
+        builder.transform(metadata, predictors)[builder.feature_columns].to_numpy(dtype=np.float32),
+    )
+
+    duplicated = {**predictors, "soil": pd.concat([predictors["soil"], predictors["soil"].head(1)])}
+    with pytest.raises(ValueError, match="duplicated `surveyId`"):
+        build_features_from_meta_and_predictors_pair(cfg, metadata, metadata, duplicated, duplicated)
+
+    clashing = {**predictors, "bioclim_v2": predictors["bioclim"]}
+    with pytest.raises(ValueError, match="clim_bio1"):
+        build_features_from_meta_and_predictors_pair(cfg, metadata, metadata, clashing, clashing)
+    with pytest.raises(ValueError, match="clim_bio1"):
+        FeatureBuilder(cfg).fit(metadata, clashing)
@@ -2,8 +2,19 @@ from __future__ import annotations
 
 import numpy as np
 import pandas as pd
+import pytest
 
-from geoplant_xgb.metrics import macro_auc, sample_f1_at_k, sample_recall_at_k
+from geoplant_xgb.experiment import evaluate_in_batches
+from geoplant_xgb.metrics import (
+    MacroAUCAccumulator,
+    TopKAccumulator,
+    macro_auc,
+    per_species_auc,
+    sample_f1_at_k,
+    sample_recall_at_k,
+    sample_topk_metrics,
+)
+from geoplant_xgb.model import predict_scores
 from geoplant_xgb.predict import export_predictions
 
 
@@ -44,3 +55,200 @@ def test_export_predictions_uses_sample_id_column():
         {"surveyId": 101, "predictions": "10"},
         {"surveyId": 102, "predictions": "11"},
     ]
+
+
+def test_predict_scores_matches_predict_proba_at_best_iteration():
+    xgb = pytest.importorskip("xgboost")
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(120, 3)).astype(np.float32)
+    target = (features[:, 0] + 0.5 * rng.normal(size=120) > 0).astype(int)
+    model = xgb.XGBClassifier(n_estimators=50, max_depth=2, early_stopping_rounds=3, verbosity=0)
+    model.fit(features[:90], target[:90], eval_set=[(features[90:], target[90:])], verbose=False)
+
+    scores = predict_scores(
+        {"sp_1": model},
+        pd.DataFrame(features, columns=["a", "b", "c"]),
+        ["sp_1", "sp_2"],
+        batch_size=32,
+    )
+
+    assert np.allclose(scores[:, 0], model.predict_proba(features)[:, 1], atol=1e-6)
+    assert np.all(scores[:, 1] == 0.0)
+
+
+def test_predict_scores_limits_booster_threads_only_while_scoring(monkeypatch):
+    xgb = pytest.importorskip("xgboost")
+    import json
+
+    from geoplant_xgb import model as model_module
+
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(60, 2)).astype(np.float32)
+    models = {}
+    for species_name in ("sp_1", "sp_2", "sp_3"):
+        model = xgb.XGBClassifier(n_estimators=5, max_depth=2, n_jobs=8, verbosity=0)
+        models[species_name] = model.fit(features, (rng.random(60) > 0.5).astype(int))
+    expected = {name: model.predict_proba(features)[:, 1] for name, model in models.items()}
+
+    def booster_threads(model):
+        return int(json.loads(model.get_booster().save_config())["learner"]["generic_param"]["nthread"])
+
+    seen = []
+    species_predictor = model_module._species_predictor
+
+    def recording_predictor(model):
+        predict = species_predictor(model)
+        return lambda batch: seen.append(booster_threads(model)) or predict(batch)
+
+    monkeypatch.setattr(model_module, "_species_predictor", recording_predictor)
+    scores = predict_scores(models, features, ["sp_1", "sp_2", "sp_3"], n_threads=2)
+
+    assert seen == [1, 1, 1]
+    assert [booster_threads(model) for model in models.values()] == [8, 8, 8]
+    for index, name in enumerate(["sp_1", "sp_2", "sp_3"]):
+        np.testing.assert_allclose(scores[:, index], expected[name], atol=1e-6)
+
+
+def test_per_species_auc_matches_sklearn_with_ties_and_chunks():
+    from sklearn.metrics import roc_auc_score
+
+    rng = np.random.default_rng(1)
+    y_true = (rng.random((300, 12)) < 0.3).astype(int)
+    y_true[:, 4] = 0
+    y_scores = np.round(rng.random((300, 12)), 1).astype(np.float32)
+
+    aucs = per_species_auc(y_true, y_scores, species_chunk_size=5)
+
+    expected = [roc_auc_score(y_true[:, index], y_scores[:, index]) for index in range(12) if index != 4]
+    assert np.isnan(aucs[4])
+    assert np.allclose(np.delete(aucs, 4), expected)
+    assert np.isclose(macro_auc(y_true, y_scores), np.mean(expected))
+    np.testing.assert_allclose(per_species_auc(y_true, y_scores, species_chunk_size=None), aucs)
+
+
+def test_sample_topk_metrics_handles_per_row_k():
+    y_true = np.array([[1, 0, 1, 0], [0, 1, 0, 0], [1, 1, 1, 1]], dtype=int)
+    y_scores = np.array(
+        [[0.9, 0.8, 0.7, 0.1], [0.1, 0.2, 0.9, 0.3], [0.4, 0.3, 0.2, 0.1]],
+        dtype=float,
+    )
+    k = np.array([1, 2, 4])
+
+    metrics = sample_topk_metrics(y_true, y_scores, k)
+
+    per_row = [sample_f1_at_k(y_true[[row]], y_scores[[row]], k[row]) for row in range(3)]
+    assert np.isclose(metrics["f1"], np.mean(per_row))
+    assert np.isclose(metrics["recall"], np.mean([0.5, 0.0, 1.0]))
+    assert np.isclose(metrics["precision"], np.mean([1.0, 0.0, 1.0]))
+
+
+def test_streaming_accumulators_match_in_memory_metrics():
+    rng = np.random.default_rng(2)
+    y_true = (rng.random((250, 8)) < 0.3).astype(int)
+    y_scores = rng.random((250, 8))
+    k = rng.integers(1, 6, size=250)
+
+    topk_accumulator = TopKAccumulator()
+    auc_accumulator = MacroAUCAccumulator(n_species=8, n_bins=10000)
+    for start in range(0, 250, 64):
+        rows = slice(start, start + 64)
+        topk_accumulator.update(y_true[rows], y_scores[rows], k[rows])
+        auc_accumulator.update(y_true[rows], y_scores[rows])
+
+    expected = sample_topk_metrics(y_true, y_scores, k)
+    assert topk_accumulator.finalize() == pytest.approx(expected)
+    assert auc_accumulator.finalize() == pytest.approx(macro_auc(y_true, y_scores), abs=1e-3)
+
+
+def test_evaluate_in_batches_streams_predictions():
+    features = pd.DataFrame({"clim_bio1": [0.2, 0.5, 0.7]})
+    labels = np.array([[1, 0], [0, 1], [1, 0]])
+    models = {
+        "sp_10": DummyModel([0.9, 0.1, 0.8]),
+        "sp_11": DummyModel([0.2, 0.8, 0.3]),
+    }
+
+    metrics = evaluate_in_batches(models, features, labels, ["sp_10", "sp_11"], topk=2, batch_size=5)
+
+    assert metrics["AUC"] == 1.0
+    assert metrics["Recall"] == 1.0
+    assert np.isclose(metrics["Precision"], 0.5)
+
+
+def test_bootstrap_replicates_match_metrics_on_resampled_rows():
+    from geoplant_xgb.bootstrap import _prepare_statistics, _weighted_macro_auc, bootstrap_metrics
+
+    rng = np.random.default_rng(3)
+    y_true = (rng.random((80, 6)) < 0.3).astype(int)
+    y_true[:, 0] = 0
+    y_scores = np.round(rng.random((80, 6)), 1)
+    statistics = _prepare_statistics(y_true, y_scores, 3)
+
+    multiplicities = np.bincount(rng.integers(0, 80, 80), minlength=80).astype(np.int32)
+    resampled = np.repeat(np.arange(80), multiplicities)
+    assert np.isclose(
+        _weighted_macro_auc(statistics, multiplicities[None, :])[0],
+        macro_auc(y_true[resampled], y_scores[resampled]),
+    )
+
+    intervals = bootstrap_metrics(y_true, y_scores, 3, n_replicates=40, batch_size=16)
+    assert list(intervals["metric"]) == ["AUC", "Recall", "Precision", "Fs1"]
+    assert (intervals["ci_lower"] <= intervals["estimate"]).all()
+    assert (intervals["estimate"] <= intervals["ci_upper"]).all()
+    pd.testing.assert_frame_equal(
+        intervals,
+        bootstrap_metrics(y_true, y_scores, 3, n_replicates=40, batch_size=16, n_jobs=2),
+    )
+
+
+def test_richness_estimator_handles_empty_quantile_bins_and_batches():
+    pytest.importorskip("xgboost")
+    from geoplant_xgb.config import ExperimentConfig
+    from geoplant_xgb.model import estimate_topk, train_richness_estimator
+
+    features = pd.DataFrame({"clim_a": np.r_[np.zeros(6), np.ones(6)]})
+    richness = np.r_[np.zeros(6, dtype=int), np.full(6, 3)]
+    labels = pd.DataFrame((np.arange(3) < richness[:, None]).astype(int), columns=list("abc"))
+    cfg = ExperimentConfig(xgb_params={"n_jobs": 1})
+
+    # Two interpolated quantile edges fall between richness 0 and 3, leaving an empty middle bin.
+    classifier, bin_edges, bin_to_mean = train_richness_estimator(features, labels, cfg, nbins=15)
+
+    assert bin_edges.size == 4
+    assert np.array_equal(bin_to_mean, [0.0, 3.0])
+    assert set(np.unique(classifier.predict(features.to_numpy()))) <= set(range(bin_to_mean.size))
+    topk = estimate_topk(classifier, bin_edges, bin_to_mean, features, offset=0, batch_size=7)
+    as_dict = dict(enumerate(bin_to_mean))
+    assert np.array_equal(topk, estimate_topk(classifier, bin_edges, as_dict, features.to_numpy(), offset=0))
+
+
+def test_estimate_topk_from_scores_modes():
+    from geoplant_xgb.model import estimate_topk_from_scores
+
+    scores = np.array([[0.9, 0.8, 0.1, 0.05], [0.6, 0.1, 0.1, 0.1], [0.0, 0.0, 0.0, 0.0]])
+
+    assert list(estimate_topk_from_scores(scores, "expected_richness", offset=1)) == [3, 2, 1]
+    assert list(estimate_topk_from_scores(scores, "expected_f1", batch_size=2)) == [2, 1, 1]
+    with pytest.raises(ValueError):
+        estimate_topk_from_scores(scores, "estimator")
+
+
+def test_train_ovr_falls_back_to_row_split_when_positives_are_all_held_out():
+    pytest.importorskip("xgboost")
+    from geoplant_xgb.config import ExperimentConfig
+    from geoplant_xgb.model import _group_validation_split, train_ovr
+
+    cfg = ExperimentConfig(xgb_params={"n_estimators": 20, "max_depth": 2, "n_jobs": 1, "verbosity": 0})
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(200, 2)).astype(np.float32)
+    groups = np.arange(200) // 10
+    _, _, _, valid_rows = _group_validation_split(features, groups, cfg)
+    labels = pd.DataFrame({"sp_1": (features[:, 0] > 0).astype(int), "sp_2": np.zeros(200, dtype=int)})
+    labels.loc[valid_rows, "sp_2"] = 1
+    features[valid_rows, 1] += 3.0
+
+    with pytest.warns(UserWarning, match="sp_2"):
+        models = train_ovr(features, labels, ["sp_1", "sp_2"], cfg, validation_groups=groups)
+
+    scores = predict_scores(models, features, ["sp_1", "sp_2"])
+    assert scores[valid_rows, 1].mean() > 0.5 > scores[labels["sp_2"].to_numpy() == 0, 1].mean()
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from geoplant_xgb.config import ExperimentConfig
+from geoplant_xgb.spatial_cv import (
+    grid_block_ids,
+    region_block_ids,
+    spatial_cross_validate,
+    spatial_fold_indices,
+)
+
+
+def test_spatial_folds_never_split_a_block():
+    latitudes = np.array([43.1, 43.9, 44.2, 44.7, 45.5, 46.0, 46.4, 47.9])
+    longitudes = np.array([3.2, 3.8, 3.1, 5.9, 5.2, 5.7, 7.3, 7.9])
+    blocks = grid_block_ids(latitudes, longitudes, block_size_degrees=1.0)
+
+    assert blocks[0] == blocks[1]
+    assert len(np.unique(blocks)) == 7
+    assert np.array_equal(region_block_ids(["a", "b", "a", None]), [0, 1, 0, -1])
+
+    folds = spatial_fold_indices(blocks, n_folds=3)
+    test_rows = np.concatenate([test for _, test in folds])
+    assert np.array_equal(np.sort(test_rows), np.arange(8))
+    for train, test in folds:
+        assert not set(blocks[train]) & set(blocks[test])
+
+
+def test_spatial_cross_validate_returns_one_row_per_fold():
+    pytest.importorskip("xgboost")
+    rng = np.random.default_rng(0)
+    n_samples = 240
+    features = pd.DataFrame(
+        {
+            "clim_bio1": rng.normal(size=n_samples),
+            "soil_ph": rng.normal(size=n_samples),
+        }
+    )
+    labels = pd.DataFrame(
+        {
+            "sp_1": (features["clim_bio1"] > 0).astype(int),
+            "sp_2": (features["soil_ph"] > 0).astype(int),
+        }
+    )
+    blocks = grid_block_ids(rng.uniform(40, 50, n_samples), rng.uniform(0, 10, n_samples), 2.0)
+    cfg = ExperimentConfig(
+        xgb_params={"n_estimators": 10, "max_depth": 2, "n_jobs": 1, "verbosity": 0},
+        early_stopping_rounds=3,
+        fixed_top_k=1,
+    )
+
+    results = spatial_cross_validate(cfg, features, labels, ["sp_1", "sp_2"], blocks, n_folds=3)
+
+    assert list(results["fold"]) == [0, 1, 2]
+    assert results["n_test"].sum() == n_samples
+    assert (results["n_train"] + results["n_test"] == n_samples).all()
+    assert (results["AUC"] > 0.8).all()
+
+
+def test_train_ovr_on_row_indices_matches_training_on_copied_rows():
+    pytest.importorskip("xgboost")
+    from geoplant_xgb.model import predict_scores, train_ovr
+
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(200, 2)).astype(np.float32)
+    labels = pd.DataFrame({"sp_1": (features[:, 0] > 0).astype(int), "sp_2": (features[:, 1] > 0).astype(int)})
+    groups = np.arange(200) // 10
+    rows = np.r_[0:60, 120:200]
+    cfg = ExperimentConfig(xgb_params={"n_estimators": 10, "max_depth": 2, "n_jobs": 1, "verbosity": 0})
+    species = ["sp_1", "sp_2"]
+
+    for validation_groups in (None, groups):
+        copied = train_ovr(
+            features[rows],
+            labels.iloc[rows].reset_index(drop=True),
+            species,
+            cfg,
+            validation_groups=None if validation_groups is None else groups[rows],
+        )
+        indexed = train_ovr(features, labels, species, cfg, validation_groups=validation_groups, rows=rows)
+        np.testing.assert_array_equal(
+            predict_scores(indexed, features, species), predict_scores(copied, features, species)
+        )
@@ -0,0 +1,164 @@
+"""Read AlphaEarth satellite embeddings from the GeoPlant parquet files.
+
+The parquet file is memory-mapped and only the survey id and embedding
+columns are decoded. When survey ids are requested, row groups whose
+``surveyId`` min/max statistics exclude every requested id are skipped
+without being read. Embeddings are returned as one float32 matrix aligned
+to the requested id order; when the file already holds exactly those
+surveys in that order, a single fixed-size list column is returned as a
+view of the Arrow buffer without any copy. ``pyarrow`` is an optional
+dependency imported on first use.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+COORDINATE_COLUMNS = ("lat", "lon", "latitude", "longitude", "x", "y")
+
+
+def _get_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as exc:  # pragma: no cover - exercised only without the optional dependency
+        raise ImportError("Reading AlphaEarth embeddings requires pyarrow (`pip install pyarrow`).") from exc
+    return pyarrow
+
+
+def _is_embedding_type(data_type) -> bool:
+    pyarrow = _get_pyarrow()
+    if pyarrow.types.is_fixed_size_list(data_type) or pyarrow.types.is_list(data_type):
+        return pyarrow.types.is_floating(data_type.value_type)
+    return pyarrow.types.is_floating(data_type)
+
+
+def alphaearth_columns(path: str | Path, survey_id_column: str = "surveyId") -> list[str]:
+    """Embedding columns of an AlphaEarth file: floating (or float list) columns except coordinates."""
+    schema = _get_pyarrow().parquet.read_schema(path)
+    return [
+        field.name
+        for field in schema
+        if field.name != survey_id_column
+        and field.name.lower() not in COORDINATE_COLUMNS
+        and _is_embedding_type(field.type)
+    ]
+
+
+def _candidate_row_groups(metadata, column_index: int, wanted: np.ndarray) -> list[int]:
+    """Row groups whose id statistics may contain one of the sorted ``wanted`` ids."""
+    row_groups = []
+    for row_group in range(metadata.num_row_groups):
+        statistics = metadata.row_group(row_group).column(column_index).statistics
+        if statistics is None or not statistics.has_min_max:
+            row_groups.append(row_group)
+            continue
+        first = np.searchsorted(wanted, statistics.min)
+        if first < wanted.size and wanted[first] <= statistics.max:
+            row_groups.append(row_group)
+    return row_groups
+
+
+def _file_positions(file_ids: np.ndarray, survey_ids: np.ndarray) -> np.ndarray:
+    """Row of every requested survey id among ``file_ids``; -1 where absent."""
+    if file_ids.size == 0:
+        return np.full(survey_ids.shape, -1, dtype=np.int64)
+    order = np.argsort(file_ids, kind="stable")
+    found = np.minimum(np.searchsorted(file_ids[order], survey_ids), file_ids.size - 1)
+    return np.where(file_ids[order][found] == survey_ids, order[found], -1)
+
+
+def _column_values(column) -> np.ndarray:
+    """NumPy values of one Arrow column: ``(n,)`` for scalars, ``(n, width)`` for float lists."""
+    pyarrow = _get_pyarrow()
+    chunk = column.combine_chunks() if column.num_chunks != 1 else column.chunk(0)
+    if pyarrow.types.is_fixed_size_list(chunk.type):
+        values = chunk.flatten().to_numpy(zero_copy_only=False)
+        return values.reshape(len(chunk), chunk.type.list_size)
+    if pyarrow.types.is_list(chunk.type):
+        widths = np.unique(np.diff(chunk.offsets.to_numpy()))
+        if widths.size > 1:
+            raise ValueError(f"Embedding lists of column {column} have varying lengths")
+        return chunk.flatten().to_numpy(zero_copy_only=False).reshape(len(chunk), -1)
+    return chunk.to_numpy(zero_copy_only=False)
+
+
+def read_alphaearth(
+    path: str | Path,
+    survey_ids: Sequence[int] | np.ndarray | None = None,
+    columns: Sequence[str] | None = None,
+    survey_id_column: str = "surveyId",
+) -> tuple[np.ndarray, np.ndarray, list[str]]:
+    """Return ``(survey_ids, embeddings, column_names)`` from an AlphaEarth parquet file.
+
+    Without ``survey_ids`` every row is returned in file order. With
+    ``survey_ids``, rows follow that order and surveys absent from the file
+    are NaN. ``columns`` restricts the decoded embedding columns; list
+    columns expand to ``<name>_<index>`` feature names.
+    """
+    pyarrow = _get_pyarrow()
+    parquet_file = pyarrow.parquet.ParquetFile(path, memory_map=True)
+    columns = list(columns) if columns is not None else alphaearth_columns(path, survey_id_column)
+    if not columns:
+        raise ValueError(f"No embedding columns found in {path}")
+
+    row_groups = list(range(parquet_file.metadata.num_row_groups))
+    if survey_ids is not None:
+        survey_ids = np.asarray(survey_ids, dtype=np.int64)
+        column_index = parquet_file.schema_arrow.get_field_index(survey_id_column)
+        row_groups = _candidate_row_groups(parquet_file.metadata, column_index, np.unique(survey_ids))
+    table = parquet_file.read_row_groups(row_groups, columns=[survey_id_column] + columns, use_threads=True)
+    file_ids = table.column(survey_id_column).to_numpy().astype(np.int64, copy=False)
+
+    blocks = [_column_values(table.column(name)) for name in columns]
+    names = [
+        name if block.ndim == 1 else f"{name}_{index}"
+        for name, block in zip(columns, blocks)
+        for index in range(1 if block.ndim == 1 else block.shape[1])
+    ]
+    if survey_ids is None:
+        survey_ids = file_ids
+        positions = np.arange(file_ids.size)
+    else:
+        positions = _file_positions(file_ids, survey_ids)
+
+    aligned = np.array_equal(positions, np.arange(file_ids.size))
+    if aligned and len(blocks) == 1 and blocks[0].ndim == 2 and blocks[0].dtype == np.float32:
+        return survey_ids, blocks[0], names
+
+    embeddings = np.full((survey_ids.size, len(names)), np.nan, dtype=np.float32, order="F")
+    rows = np.flatnonzero(positions >= 0)
+    column = 0
+    for block in blocks:
+        values = block.reshape(len(block), -1)
+        width = values.shape[1]
+        if aligned:
+            embeddings[:, column : column + width] = values
+        else:
+            embeddings[rows, column : column + width] = values[positions[rows]]
+        column += width
+    return survey_ids, embeddings, names
+
+
+def alphaearth_predictors(
+    path: str | Path,
+    survey_ids: Sequence[int] | np.ndarray | None = None,
+    columns: Sequence[str] | None = None,
+    prefix: str = "ae_",
+    survey_id_column: str = "surveyId",
+) -> pd.DataFrame:
+    """Build a ``surveyId`` + ``<prefix>`` embedding table usable as a baseline predictor family.
+
+    The frame wraps the float32 matrix of :func:`read_alphaearth` without
+    copying it; pass it in ``predictors_by_name`` of the baselines'
+    ``FeatureBuilder`` and add ``prefix`` to ``ExperimentConfig.group_prefixes``.
+    """
+    survey_ids, embeddings, names = read_alphaearth(path, survey_ids, columns, survey_id_column)
+    names = [name if name.startswith(prefix) else f"{prefix}{name}" for name in names]
+    predictors = pd.DataFrame(embeddings, columns=names, copy=False)
+    predictors.insert(0, "surveyId", survey_ids)
+    return predictors
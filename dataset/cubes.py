@@ -0,0 +1,189 @@
+"""Memory-mapped stores for the Bioclim and Landsat time-series cubes.
+
+The cube archives extract to one ``..._<surveyId>_cube.pt`` tensor per
+survey. :func:`build_cube_store` converts such a directory once into a
+single contiguous ``[N, C, T]`` ``cubes.npy`` array with a sorted
+``survey_ids.npy`` index. :class:`CubeStore` maps it read-only, so a batch
+is one gather from the mapping instead of one file open and unpickle per
+survey, and every DataLoader worker shares the same pages. ``torch`` is
+only imported to read ``.pt`` files during conversion.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+
+CUBE_STORE_FORMAT_VERSION = 1
+CUBE_FILE_PATTERN = re.compile(r"_(\d+)_cube\.(pt|npy)$")
+
+
+def _get_torch():
+    try:
+        import torch
+    except ImportError as exc:  # pragma: no cover - exercised only without the optional dependency
+        raise ImportError("Reading .pt cubes requires torch. Install it with `pip install geoplant[cubes]`.") from exc
+    return torch
+
+
+def find_cube_files(root: str | Path) -> tuple[np.ndarray, list[Path]]:
+    """Return the survey ids and paths of every cube file under ``root``, sorted by survey id."""
+    found = []
+    for path in Path(root).rglob("*_cube.*"):
+        match = CUBE_FILE_PATTERN.search(path.name)
+        if match:
+            found.append((int(match.group(1)), path))
+    found.sort(key=lambda item: item[0])
+    survey_ids = np.array([survey_id for survey_id, _ in found], dtype=np.int64)
+    if survey_ids.size and (np.diff(survey_ids) == 0).any():
+        duplicate = survey_ids[1:][np.diff(survey_ids) == 0][0]
+        raise ValueError(f"Several cube files for surveyId {duplicate} under {root}")
+    return survey_ids, [path for _, path in found]
+
+
+def load_cube_file(path: str | Path) -> np.ndarray:
+    """Read one per-survey cube (``.pt`` tensor or ``.npy`` array) as a NumPy array."""
+    path = Path(path)
+    if path.suffix == ".npy":
+        return np.load(path)
+    torch = _get_torch()
+    return torch.load(path, map_location="cpu", weights_only=True).numpy()
+
+
+def _write_cubes(path: Path, paths: list[Path], cube_shape: tuple[int, ...], dtype, n_workers: int) -> None:
+    """Fill a mapped ``[N, C, T]`` array from the cube files on ``n_workers`` threads."""
+    cubes = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(len(paths),) + cube_shape)
+
+    def convert(position: int) -> None:
+        cube = load_cube_file(paths[position])
+        if cube.shape != cube_shape:
+            raise ValueError(f"{paths[position]} has shape {cube.shape}, expected {cube_shape}")
+        cubes[position] = cube
+
+    with ThreadPoolExecutor(max_workers=max(1, int(n_workers))) as executor:
+        list(executor.map(convert, range(len(paths))))
+    cubes.flush()
+
+
+def build_cube_store(
+    cube_dir: str | Path,
+    output_dir: str | Path,
+    dtype=np.float32,
+    n_workers: int = 8,
+    overwrite: bool = False,
+) -> "CubeStore":
+    """Convert a directory of per-survey cubes into a memory-mappable store.
+
+    Every cube must have the same ``[C, T]`` shape. Files are read on
+    ``n_workers`` threads and written straight into the mapped output, so
+    memory stays bounded whatever the number of surveys. The store is built
+    next to ``output_dir`` and renamed into place when complete.
+    """
+    output_dir = Path(output_dir)
+    if output_dir.exists():
+        if not overwrite:
+            return CubeStore(output_dir)
+        shutil.rmtree(output_dir)
+    survey_ids, paths = find_cube_files(cube_dir)
+    if not paths:
+        raise ValueError(f"No cube files found under {cube_dir}")
+    cube_shape = load_cube_file(paths[0]).shape
+
+    temporary_dir = output_dir.with_name(f".{output_dir.name}.{os.getpid()}.tmp")
+    shutil.rmtree(temporary_dir, ignore_errors=True)
+    temporary_dir.mkdir(parents=True)
+    _write_cubes(temporary_dir / "cubes.npy", paths, cube_shape, dtype, n_workers)
+    np.save(temporary_dir / "survey_ids.npy", survey_ids)
+    metadata = {
+        "format_version": CUBE_STORE_FORMAT_VERSION,
+        "source": str(cube_dir),
+        "shape": [len(paths), *cube_shape],
+        "dtype": np.dtype(dtype).name,
+    }
+    (temporary_dir / "store.json").write_text(json.dumps(metadata, indent=2), encoding="utf-8")
+    os.replace(temporary_dir, output_dir)
+    return CubeStore(output_dir)
+
+
+class CubeStore:
+    """Read-only ``[N, C, T]`` cube array indexed by surveyId."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        metadata = json.loads((self.path / "store.json").read_text(encoding="utf-8"))
+        if metadata.get("format_version") != CUBE_STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported cube store format version: {metadata.get('format_version')}")
+        self.cubes = np.load(self.path / "cubes.npy", mmap_mode="r")
+        self.survey_ids = np.load(self.path / "survey_ids.npy")
+
+    def __getstate__(self) -> dict:
+        return {"path": self.path}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["path"])
+
+    def __len__(self) -> int:
+        return len(self.survey_ids)
+
+    def __contains__(self, survey_id: int) -> bool:
+        return bool(self.positions([survey_id], missing="ignore")[0] >= 0)
+
+    def __getitem__(self, survey_id: int) -> np.ndarray:
+        return self.cubes[self.positions([survey_id])[0]]
+
+    @property
+    def cube_shape(self) -> tuple[int, ...]:
+        return self.cubes.shape[1:]
+
+    def positions(self, survey_ids: Sequence[int] | np.ndarray, missing: str = "raise") -> np.ndarray:
+        """Row of every survey id in the store; ``missing="ignore"`` maps unknown ids to -1."""
+        if missing not in ("raise", "ignore"):
+            raise ValueError("missing must be 'raise' or 'ignore'")
+        survey_ids = np.asarray(survey_ids, dtype=np.int64)
+        positions = np.searchsorted(self.survey_ids, survey_ids)
+        clipped = np.minimum(positions, len(self.survey_ids) - 1)
+        found = (positions < len(self.survey_ids)) & (self.survey_ids[clipped] == survey_ids)
+        if missing == "raise" and not found.all():
+            raise KeyError(f"surveyId {survey_ids[~found][0]} is not in the cube store {self.path}")
+        return np.where(found, positions, -1)
+
+    def take(self, positions: np.ndarray, fill_value: float = np.nan) -> np.ndarray:
+        """Gather store rows into a new ``[B, C, T]`` array; rows at -1 are ``fill_value``.
+
+        Rows are read in store order so consecutive surveys touch consecutive
+        pages; a run of consecutive rows is a single slice of the mapping.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        batch = np.full((positions.size,) + self.cube_shape, fill_value, dtype=self.cubes.dtype)
+        present = np.flatnonzero(positions >= 0)
+        if present.size:
+            rows = positions[present]
+            if rows[-1] - rows[0] == rows.size - 1 and (np.diff(rows) == 1).all():
+                batch[present] = self.cubes[rows[0] : rows[-1] + 1]
+            else:
+                order = np.argsort(rows, kind="stable")
+                batch[present[order]] = self.cubes[rows[order]]
+        return batch
+
+    def get_batch(
+        self,
+        survey_ids: Sequence[int] | np.ndarray,
+        missing: str = "raise",
+        fill_value: float = np.nan,
+        nan_to_num: bool = False,
+    ) -> np.ndarray:
+        """Gather the cubes of ``survey_ids`` into a new ``[B, C, T]`` array in request order.
+
+        Unknown ids are filled with ``fill_value`` when ``missing="ignore"``.
+        """
+        batch = self.take(self.positions(survey_ids, missing=missing), fill_value)
+        if nan_to_num:
+            np.nan_to_num(batch, copy=False)
+        return batch
@@ -12,10 +12,14 @@ from .data_download import (
     download_files,
     extract_downloaded_file_groups,
     flatten_file_groups,
+    multipart_extract_dir,
     resolve_requested_file_groups,
     resolve_requested_files,
 )
 
+SPLITS = ("train", "test-iid", "test-ood", "test-glc25")
+DATASET_MODALITIES = ("bioclim", "landsat", "sentinel2-jpeg", "sentinel2-tiff", "alphaearth")
+
 Source = Literal["po", "pa", "both"]
 VariableSelection = str | list[str]
 SatelliteModalitySelection = str | list[str]
@@ -136,6 +140,95 @@ class GeoPlant:
             overwrite=overwrite,
         )
 
+    def dataset(
+        self,
+        split: str = "train",
+        modalities: str | list[str] = ("bioclim", "landsat"),
+        *,
+        source: Literal["po", "pa"] = "pa",
+        labels: bool = True,
+        how: Literal["inner", "left"] = "inner",
+        cube_dtype: str = "float32",
+        store_root: str | Path | None = None,
+        nan_to_num: bool = False,
+        n_workers: int = 8,
+    ):
+        """Return an indexable :class:`~dataset.multimodal.GeoPlantDataset` for one split.
+
+        Surveys come from the split metadata and are joined by surveyId with
+        the extracted modalities (download them with ``extract=True`` first).
+        Cube folders are converted once into memory-mapped stores under
+        ``store_root`` (default ``<root>/stores``). Batches from
+        ``__getitems__`` / ``iter_batches`` are dictionaries of NumPy arrays.
+        """
+        import pandas as pd
+
+        from .alphaearth import read_alphaearth
+        from .cubes import build_cube_store
+        from .multimodal import ArraySource, GeoPlantDataset, LabelIndex, PatchSource
+
+        if source not in ("po", "pa"):
+            raise ValueError("source must be 'po' or 'pa'")
+        if split not in SPLITS:
+            raise ValueError(f"Unknown split: {split}. Available splits: {', '.join(SPLITS)}")
+        modalities = [modalities] if isinstance(modalities, str) else list(modalities)
+        unknown = [modality for modality in modalities if modality not in DATASET_MODALITIES]
+        if unknown:
+            raise ValueError(f"Unknown dataset modalities: {unknown}. Available: {', '.join(DATASET_MODALITIES)}")
+
+        (metadata_file,) = self._split_files(split, source, metadata=True)
+        metadata = pd.read_csv(self.path(metadata_file))
+        survey_ids = pd.unique(metadata["surveyId"])
+        store_root = Path(store_root) if store_root is not None else self.root / "stores"
+        sources = {}
+        for modality in modalities:
+            if modality == "alphaearth":
+                (embedding_file,) = self._split_files(split, source, satellite_data=True, satellite_modalities=modality)
+                _, embeddings, _ = read_alphaearth(self.path(embedding_file), survey_ids)
+                sources[modality] = ArraySource(survey_ids, embeddings)
+            elif modality in ("bioclim", "landsat"):
+                (cube_file,) = self._split_files(split, source, **{f"{modality}_cubes": True})
+                cube_dir = self._extracted_dir(cube_file)
+                sources[modality] = build_cube_store(
+                    cube_dir, store_root / cube_dir.name, dtype=cube_dtype, n_workers=n_workers
+                )
+            else:
+                patch_files = self._split_files(split, source, satellite_data=True, satellite_modalities=modality)
+                sources[modality] = PatchSource(
+                    list(dict.fromkeys(self._extracted_dir(file_path) for file_path in patch_files)),
+                    n_workers=n_workers,
+                )
+
+        label_index = None
+        if labels and "speciesId" in metadata.columns:
+            label_index = LabelIndex.from_metadata(metadata)
+        return GeoPlantDataset(
+            survey_ids,
+            sources,
+            labels=label_index,
+            how=how,
+            nan_to_num=nan_to_num,
+        )
+
+    def _split_files(self, split: str, source: str, **kwargs) -> list[str]:
+        """Return the manifest files of one source and split, e.g. ``PA-test-iid-...``."""
+        selected = []
+        for file_path in self.files(source=source, **kwargs):
+            name = Path(file_path).name.lower().replace("_", "-")
+            prefix = name.removeprefix(f"{source}-").removeprefix("metadata-")
+            if name.startswith(f"{source}-") and (prefix.startswith(f"{split}-") or prefix.startswith(f"{split}.")):
+                selected.append(file_path)
+        if not selected:
+            selection = kwargs.get("satellite_modalities") or next(iter(kwargs))
+            raise ValueError(f"No {source.upper()} {split} files for {selection}")
+        return selected
+
+    def _extracted_dir(self, file_path: str) -> Path:
+        extracted = multipart_extract_dir(self.path(file_path))
+        if not extracted.is_dir():
+            raise FileNotFoundError(f"{extracted} not found; download and extract {file_path} first")
+        return extracted
+
     @staticmethod
     def _normalize_request(kwargs: dict) -> dict:
         """Validate friendly API arguments for downloader resolution."""
@@ -0,0 +1,297 @@
+"""Indexable multimodal datasets joining GeoPlant modalities by surveyId.
+
+Every modality is a *source* exposing ``positions(survey_ids, missing)``,
+which maps survey ids to source rows once, and ``take(positions)``, which
+gathers a whole batch. :class:`GeoPlantDataset` resolves the positions of
+all its surveys when it is built, so a batch from ``__getitems__`` is a
+handful of array gathers (and, for image patches, parallel file reads)
+rather than one lookup and one file open per survey and modality. Batches
+are dictionaries of NumPy arrays; :func:`to_torch` converts them for a
+``torch.utils.data.DataLoader``, which is the only place torch is needed.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator, Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+PATCH_SUFFIXES = (".jpeg", ".jpg", ".png", ".tif", ".tiff")
+
+
+class _ThreadPool:
+    """Thread pool created on first use in each process, so sources survive DataLoader forks."""
+
+    def __init__(self, n_workers: int) -> None:
+        self.n_workers = max(1, int(n_workers))
+        self._pid = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def map(self, function, items) -> list:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.n_workers)
+                self._pid = os.getpid()
+        return list(self._executor.map(function, items))
+
+    def __getstate__(self) -> dict:
+        return {"n_workers": self.n_workers}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["n_workers"])
+
+
+def _sorted_positions(index: np.ndarray, survey_ids: np.ndarray) -> np.ndarray:
+    """Positions of ``survey_ids`` in the sorted id array ``index``; -1 where absent."""
+    if index.size == 0:
+        return np.full(survey_ids.shape, -1, dtype=np.int64)
+    positions = np.searchsorted(index, survey_ids)
+    clipped = np.minimum(positions, index.size - 1)
+    return np.where(index[clipped] == survey_ids, clipped, -1).astype(np.int64)
+
+
+class LabelIndex:
+    """Species lists of every survey in CSR form, gathered into multi-hot batches."""
+
+    def __init__(self, survey_ids: np.ndarray, offsets: np.ndarray, codes: np.ndarray, species_ids: np.ndarray):
+        self.survey_ids = survey_ids
+        self.offsets = offsets
+        self.codes = codes
+        self.species_ids = species_ids
+
+    @classmethod
+    def from_metadata(
+        cls,
+        metadata: pd.DataFrame,
+        survey_id_column: str = "surveyId",
+        species_id_column: str = "speciesId",
+        species_ids: Sequence[int] | np.ndarray | None = None,
+    ) -> "LabelIndex":
+        """Index a long ``surveyId, speciesId`` table; ``species_ids`` fixes the label columns."""
+        pairs = metadata[[survey_id_column, species_id_column]].dropna().astype(np.int64).drop_duplicates()
+        if species_ids is None:
+            species_ids = np.unique(pairs[species_id_column].to_numpy())
+        species_ids = np.asarray(species_ids, dtype=np.int64)
+        species_order = np.argsort(species_ids, kind="stable")
+        found = _sorted_positions(species_ids[species_order], pairs[species_id_column].to_numpy())
+        surveys = pairs[survey_id_column].to_numpy()[found >= 0]
+        codes = species_order[found[found >= 0]]
+        order = np.argsort(surveys, kind="stable")
+        survey_ids, counts = np.unique(surveys[order], return_counts=True)
+        offsets = np.zeros(survey_ids.size + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(counts)
+        return cls(survey_ids, offsets, codes[order].astype(np.int32), species_ids)
+
+    def positions(self, survey_ids: np.ndarray, missing: str = "ignore") -> np.ndarray:
+        positions = _sorted_positions(self.survey_ids, np.asarray(survey_ids, dtype=np.int64))
+        if missing == "raise" and (positions < 0).any():
+            raise KeyError(f"surveyId {np.asarray(survey_ids)[positions < 0][0]} has no labels")
+        return positions
+
+    def take(self, positions: np.ndarray) -> np.ndarray:
+        """Return a ``[B, n_species]`` float32 multi-hot matrix; rows at -1 are all zero."""
+        positions = np.asarray(positions, dtype=np.int64)
+        labels = np.zeros((positions.size, self.species_ids.size), dtype=np.float32)
+        present = np.flatnonzero(positions >= 0)
+        starts = self.offsets[positions[present]]
+        counts = self.offsets[positions[present] + 1] - starts
+        rows = np.repeat(present, counts)
+        first_in_batch = np.cumsum(counts) - counts
+        columns = self.codes[np.arange(counts.sum()) + np.repeat(starts - first_in_batch, counts)]
+        labels[rows, columns] = 1.0
+        return labels
+
+
+class ArraySource:
+    """In-memory ``[N, ...]`` per-survey values (e.g. AlphaEarth embeddings); missing rows are NaN."""
+
+    def __init__(self, survey_ids: Sequence[int] | np.ndarray, values: np.ndarray) -> None:
+        survey_ids = np.asarray(survey_ids, dtype=np.int64)
+        present = ~np.isnan(values).reshape(len(values), -1).all(axis=1) if values.dtype.kind == "f" else None
+        order = np.argsort(survey_ids, kind="stable")
+        if present is not None:
+            order = order[present[order]]
+        self.survey_ids = survey_ids[order]
+        self._rows = order
+        self.values = np.ascontiguousarray(values)
+
+    def positions(self, survey_ids: np.ndarray, missing: str = "ignore") -> np.ndarray:
+        positions = _sorted_positions(self.survey_ids, np.asarray(survey_ids, dtype=np.int64))
+        if missing == "raise" and (positions < 0).any():
+            raise KeyError(f"surveyId {np.asarray(survey_ids)[positions < 0][0]} has no values")
+        return np.where(positions >= 0, self._rows[positions], -1)
+
+    def take(self, positions: np.ndarray) -> np.ndarray:
+        positions = np.asarray(positions, dtype=np.int64)
+        batch = self.values[np.maximum(positions, 0)]
+        batch[positions < 0] = np.nan
+        return batch
+
+
+def _read_patch(path: Path) -> np.ndarray:
+    """Read one image patch as a ``(channels, height, width)`` array."""
+    if path.suffix.lower() in (".tif", ".tiff"):
+        from .rasters import _get_rasterio
+
+        with _get_rasterio().open(path) as source:
+            return source.read()
+    try:
+        from PIL import Image
+    except ImportError as exc:  # pragma: no cover - exercised only without the optional dependency
+        raise ImportError("Reading image patches requires Pillow (`pip install pillow`).") from exc
+    with Image.open(path) as image:
+        patch = np.asarray(image)
+    return patch[None] if patch.ndim == 2 else patch.transpose(2, 0, 1)
+
+
+def _patch_layer(root: Path, path: Path) -> str:
+    """Name of the patch tree holding ``path``: its directory without the ``CD/AB`` id folders."""
+    parts = list(path.relative_to(root).parent.parts)
+    while parts and len(parts[-1]) <= 2 and parts[-1].isdigit():
+        parts.pop()
+    return "/".join([str(root), *parts])
+
+
+class PatchSource:
+    """Per-survey image patches (e.g. Sentinel-2 RGB and NIR trees) stacked along channels.
+
+    Every root is scanned once for ``<surveyId>.<ext>`` files. Patch trees
+    are ordered RGB first, then by name, and a survey is present when every
+    tree holds its patch. Batches are read on ``n_workers`` threads.
+    """
+
+    def __init__(self, roots: Sequence[str | Path], n_workers: int = 8) -> None:
+        files: dict[str, dict[int, Path]] = {}
+        for root in map(Path, roots):
+            for path in root.rglob("*"):
+                if path.suffix.lower() in PATCH_SUFFIXES and path.stem.isdigit():
+                    files.setdefault(_patch_layer(root, path), {})[int(path.stem)] = path
+        self.layers = sorted(files, key=lambda layer: ("rgb" not in layer.lower().rsplit("/", 1)[-1], layer))
+        common = set.intersection(*(set(paths) for paths in files.values())) if files else set()
+        self.survey_ids = np.array(sorted(common), dtype=np.int64)
+        self.paths = [[files[layer][survey_id] for layer in self.layers] for survey_id in self.survey_ids.tolist()]
+        self._pool = _ThreadPool(n_workers)
+        self._patch_shape = None
+
+    def positions(self, survey_ids: np.ndarray, missing: str = "ignore") -> np.ndarray:
+        positions = _sorted_positions(self.survey_ids, np.asarray(survey_ids, dtype=np.int64))
+        if missing == "raise" and (positions < 0).any():
+            raise KeyError(f"surveyId {np.asarray(survey_ids)[positions < 0][0]} has no patch")
+        return positions
+
+    def read(self, position: int) -> np.ndarray:
+        return np.concatenate([_read_patch(path) for path in self.paths[position]], axis=0)
+
+    def take(self, positions: np.ndarray) -> np.ndarray:
+        """Return a ``[B, C, H, W]`` array in the patch dtype; missing surveys are zero."""
+        positions = np.asarray(positions, dtype=np.int64)
+        present = np.flatnonzero(positions >= 0)
+        patches = self._pool.map(self.read, positions[present].tolist())
+        if self._patch_shape is None:
+            first = patches[0] if patches else self.read(0)
+            self._patch_shape = (first.shape, first.dtype)
+        shape, dtype = self._patch_shape
+        batch = np.zeros((positions.size,) + shape, dtype=dtype)
+        for row, patch in zip(present, patches):
+            batch[row] = patch
+        return batch
+
+
+class GeoPlantDataset:
+    """Surveys of one split with their modalities, loaded in batches.
+
+    ``sources`` maps modality names to sources (:class:`~dataset.cubes.CubeStore`,
+    :class:`PatchSource`, ...). With ``how="inner"`` only surveys present in
+    every source are kept; with ``how="left"`` missing cubes are NaN and
+    missing patches zero. ``__getitems__`` returns one dictionary per batch
+    with ``surveyId``, every modality and, when ``labels`` is given, a
+    ``labels`` multi-hot matrix. Modalities of a batch load concurrently.
+    """
+
+    def __init__(
+        self,
+        survey_ids: Sequence[int] | np.ndarray,
+        sources: Mapping[str, object],
+        labels: LabelIndex | None = None,
+        how: str = "inner",
+        nan_to_num: bool = False,
+        n_workers: int = 4,
+    ) -> None:
+        if how not in ("inner", "left"):
+            raise ValueError("how must be 'inner' or 'left'")
+        survey_ids = np.asarray(pd.unique(np.asarray(survey_ids, dtype=np.int64)))
+        positions = {name: source.positions(survey_ids, missing="ignore") for name, source in sources.items()}
+        if how == "inner" and positions:
+            keep = np.logical_and.reduce([source_positions >= 0 for source_positions in positions.values()])
+            survey_ids = survey_ids[keep]
+            positions = {name: source_positions[keep] for name, source_positions in positions.items()}
+        self.survey_ids = survey_ids
+        self.sources = dict(sources)
+        self.labels = labels
+        self.nan_to_num = nan_to_num
+        self._positions = positions
+        self._label_positions = labels.positions(survey_ids) if labels is not None else None
+        self._pool = _ThreadPool(n_workers)
+
+    @property
+    def modalities(self) -> list[str]:
+        return list(self.sources)
+
+    def __len__(self) -> int:
+        return len(self.survey_ids)
+
+    def _load(self, name: str, rows: np.ndarray) -> np.ndarray:
+        if name == "labels":
+            return self.labels.take(self._label_positions[rows])
+        batch = self.sources[name].take(self._positions[name][rows])
+        if self.nan_to_num and batch.dtype.kind == "f":
+            np.nan_to_num(batch, copy=False)
+        return batch
+
+    def __getitems__(self, indices: Sequence[int] | np.ndarray) -> dict[str, np.ndarray]:
+        """Load a batch of dataset rows as ``{"surveyId": ids, modality: array, ...}``."""
+        rows = np.arange(len(self))[np.asarray(indices, dtype=np.int64)]
+        names = self.modalities + (["labels"] if self.labels is not None else [])
+        batch = {"surveyId": self.survey_ids[rows]}
+        batch.update(zip(names, self._pool.map(lambda name: self._load(name, rows), names)))
+        return batch
+
+    def __getitem__(self, index: int) -> dict[str, np.ndarray]:
+        return {name: values[0] for name, values in self.__getitems__([index]).items()}
+
+    def iter_batches(
+        self,
+        batch_size: int = 64,
+        shuffle: bool = False,
+        seed: int | None = None,
+        drop_last: bool = False,
+        prefetch: int = 2,
+    ) -> Iterator[dict[str, np.ndarray]]:
+        """Yield batches while the next ``prefetch`` batches load in background threads."""
+        order = np.random.default_rng(seed).permutation(len(self)) if shuffle else np.arange(len(self))
+        stop = len(self) - len(self) % batch_size if drop_last else len(self)
+        chunks = (order[start : start + batch_size] for start in range(0, stop, batch_size))
+        with ThreadPoolExecutor(max_workers=max(1, int(prefetch))) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(self.__getitems__, chunk))
+                if len(pending) > prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+
+def to_torch(batch: dict[str, np.ndarray]) -> dict:
+    """``collate_fn`` for ``DataLoader(dataset, batch_size=...)``: wrap batch arrays as tensors."""
+    try:
+        import torch
+    except ImportError as exc:  # pragma: no cover - exercised only without the optional dependency
+        raise ImportError("to_torch requires torch; iterate NumPy batches with iter_batches instead.") from exc
+    return {name: torch.from_numpy(np.ascontiguousarray(values)) for name, values in batch.items()}
@@ -0,0 +1,267 @@
+"""LRU cache of decoded raster blocks for repeated point queries.
+
+:class:`TileCache` keeps decoded ``(bands, height, width)`` float32 blocks
+keyed by ``(raster, block)`` under a byte budget and evicts the least
+recently used ones. With a ``tile_dir`` every decoded block is also written
+once as an ``.npy`` file and served memory-mapped, so worker processes
+sharing the directory share the decoded tiles through the OS page cache
+instead of decoding the GeoTIFF again. The directory is bounded by
+``max_disk_bytes`` when given, and unbounded otherwise (the caller then owns
+its cleanup). :class:`CachedRasterSampler` keeps
+the rasters open and answers point queries from the cache.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .rasters import _block_origin, _get_rasterio, _pixel_coordinates, _read_block, raster_column_names
+
+TileKey = tuple[str, int]
+
+
+class TileCache:
+    """Thread-safe LRU cache of decoded raster blocks bounded by ``max_bytes``.
+
+    ``max_disk_bytes`` bounds the ``.npy`` tiles kept in ``tile_dir``: after
+    publishing a tile, the least recently used files are deleted until the
+    directory fits. Without it the directory grows with every decoded block.
+    The directory size is tracked as a running total, seeded by one scan at
+    the first publish and resynchronized by every prune, so the directory is
+    only listed again once the total goes over budget. Tiles published by
+    other processes are counted at that next scan.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 512 * 1024**2,
+        tile_dir: str | Path | None = None,
+        max_disk_bytes: int | None = None,
+    ) -> None:
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        if max_disk_bytes is not None and max_disk_bytes <= 0:
+            raise ValueError("max_disk_bytes must be positive")
+        self.max_bytes = int(max_bytes)
+        self.tile_dir = Path(tile_dir) if tile_dir is not None else None
+        self.max_disk_bytes = int(max_disk_bytes) if max_disk_bytes is not None else None
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._tiles: OrderedDict[TileKey, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes: int | None = None
+        self._disk_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+    def __contains__(self, key: TileKey) -> bool:
+        return key in self._tiles
+
+    def tile_path(self, key: TileKey) -> Path:
+        raster_key, block_id = key
+        return self.tile_dir / f"{raster_key}-{block_id}.npy"
+
+    def get(self, key: TileKey, load: Callable[[], np.ndarray]) -> np.ndarray:
+        """Return the cached tile for ``key``, calling ``load`` to decode it on a miss."""
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return tile
+            self.misses += 1
+        tile = self._load_shared(key, load) if self.tile_dir is not None else load()
+        with self._lock:
+            if key not in self._tiles:
+                self._tiles[key] = tile
+                self.nbytes += tile.nbytes
+                self._evict()
+        return tile
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tiles.clear()
+            self.nbytes = 0
+
+    def prune_tile_dir(self, max_bytes: int | None = None) -> int:
+        """Delete the least recently used tiles of ``tile_dir`` down to ``max_bytes``; return the bytes freed.
+
+        ``max_bytes`` defaults to ``max_disk_bytes``. The most recent tile is
+        always kept, and tiles still mapped elsewhere stay readable there
+        until unmapped; files that cannot be removed are skipped.
+        """
+        budget = self.max_disk_bytes if max_bytes is None else int(max_bytes)
+        if self.tile_dir is None or budget is None:
+            return 0
+        tiles = []
+        for path in self.tile_dir.glob("*.npy"):
+            if path.name.startswith("."):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            tiles.append((stat.st_mtime_ns, stat.st_size, path))
+        tiles.sort()
+        total = sum(size for _, size, _ in tiles)
+        excess = total - budget
+        freed = 0
+        for _, size, path in tiles[:-1]:
+            if freed >= excess:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            freed += size
+        with self._disk_lock:
+            self._disk_bytes = total - freed
+        return freed
+
+    def _record_published(self, size: int) -> None:
+        """Add a published tile to the running directory size and prune once it exceeds ``max_disk_bytes``."""
+        with self._disk_lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += size
+            over_budget = self._disk_bytes is None or self._disk_bytes > self.max_disk_bytes
+        if over_budget:
+            self.prune_tile_dir()
+
+    def _evict(self) -> None:
+        while self.nbytes > self.max_bytes and len(self._tiles) > 1:
+            _, tile = self._tiles.popitem(last=False)
+            self.nbytes -= tile.nbytes
+
+    def _load_shared(self, key: TileKey, load: Callable[[], np.ndarray]) -> np.ndarray:
+        """Map the decoded tile from ``tile_dir``, decoding and publishing it first if needed.
+
+        Mapping an existing tile refreshes its modification time, which
+        orders the tiles for :meth:`prune_tile_dir`.
+        """
+        path = self.tile_path(key)
+        try:
+            tile = np.load(path, mmap_mode="r")
+        except FileNotFoundError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temporary_path = path.with_name(f".{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp.npy")
+            np.save(temporary_path, load())
+            size = temporary_path.stat().st_size
+            os.replace(temporary_path, path)
+            tile = np.load(path, mmap_mode="r")
+            if self.max_disk_bytes is not None:
+                self._record_published(size)
+            return tile
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return tile
+
+
+def _raster_key(path: Path) -> str:
+    """Identify a raster file version so stale shared tiles are never reused."""
+    stat = path.stat()
+    payload = f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+    return f"{path.stem}-{hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]}"
+
+
+class _OpenRaster:
+    """Open raster handle with its block layout; reopened after a fork."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.key = _raster_key(path)
+        self.columns = raster_column_names(path)
+        self._pid = None
+        self._source = None
+        source = self.source
+        self.block_shape = source.block_shapes[0]
+        self.n_block_cols = -(-source.width // self.block_shape[1])
+
+    @property
+    def source(self):
+        if self._pid != os.getpid():
+            self._source = _get_rasterio().open(self.path)
+            self._pid = os.getpid()
+        return self._source
+
+    def close(self) -> None:
+        if self._source is not None and self._pid == os.getpid():
+            self._source.close()
+        self._source = None
+        self._pid = None
+
+
+class CachedRasterSampler:
+    """Sample rasters at lon/lat points through a shared :class:`TileCache`.
+
+    Rasters stay open between queries and only blocks missing from the cache
+    are decoded, so queries in hot regions never touch the GeoTIFFs.
+    """
+
+    def __init__(self, paths: Sequence[str | Path], cache: TileCache | None = None) -> None:
+        self.cache = cache if cache is not None else TileCache()
+        self._rasters = [_OpenRaster(Path(path)) for path in paths]
+        self._read_lock = threading.Lock()
+        self.columns = [column for raster in self._rasters for column in raster.columns]
+        if len(set(self.columns)) != len(self.columns):
+            raise ValueError("Raster column names must be unique")
+
+    def close(self) -> None:
+        for raster in self._rasters:
+            raster.close()
+
+    def __enter__(self) -> "CachedRasterSampler":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _tile(self, raster: _OpenRaster, block_id: int) -> np.ndarray:
+        def load() -> np.ndarray:
+            with self._read_lock:
+                return _read_block(raster.source, block_id, raster.block_shape, raster.n_block_cols)
+
+        return self.cache.get((raster.key, block_id), load)
+
+    def sample_array(self, longitudes: np.ndarray | pd.Series, latitudes: np.ndarray | pd.Series) -> np.ndarray:
+        """Return a ``(n_points, n_columns)`` float32 array; NaN outside a raster or on nodata."""
+        longitudes = np.atleast_1d(np.asarray(longitudes, dtype=np.float64))
+        latitudes = np.atleast_1d(np.asarray(latitudes, dtype=np.float64))
+        if longitudes.shape != latitudes.shape:
+            raise ValueError("longitudes and latitudes must have the same shape")
+        sampled = np.full((longitudes.size, len(self.columns)), np.nan, dtype=np.float32)
+        column = 0
+        for raster in self._rasters:
+            n_bands = len(raster.columns)
+            rows, cols = _pixel_coordinates(raster.source, longitudes, latitudes)
+            positions = np.flatnonzero(rows >= 0)
+            block_ids = (rows[positions] // raster.block_shape[0]) * raster.n_block_cols + (
+                cols[positions] // raster.block_shape[1]
+            )
+            order = np.argsort(block_ids, kind="stable")
+            positions, block_ids = positions[order], block_ids[order]
+            starts = np.flatnonzero(np.r_[True, block_ids[1:] != block_ids[:-1]]) if positions.size else positions
+            for start, stop in zip(starts, np.r_[starts[1:], positions.size]):
+                block_id = int(block_ids[start])
+                in_block = positions[start:stop]
+                tile = self._tile(raster, block_id)
+                row_offset, col_offset = _block_origin(block_id, raster.block_shape, raster.n_block_cols)
+                values = tile[:, rows[in_block] - row_offset, cols[in_block] - col_offset]
+                sampled[in_block, column : column + n_bands] = values.T
+            column += n_bands
+        return sampled
+
+    def sample(self, longitudes: np.ndarray | pd.Series, latitudes: np.ndarray | pd.Series) -> pd.DataFrame:
+        """Sample every raster at lon/lat points into a table named like :func:`sample_rasters`."""
+        return pd.DataFrame(self.sample_array(longitudes, latitudes), columns=self.columns, copy=False)
@@ -0,0 +1,220 @@
+"""Sample environmental rasters at arbitrary survey coordinates.
+
+Points are mapped to raster pixels once, sorted by the raster block that
+holds them and every block is read exactly once through a windowed read.
+Blocks are split into contiguous chunks that worker processes read
+independently, so millions of points cost one pass over the touched blocks.
+``rasterio`` is an optional dependency imported on first use.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+RASTER_SUFFIXES = (".tif", ".tiff")
+
+
+def _get_rasterio():
+    try:
+        import rasterio
+        import rasterio.warp
+        import rasterio.windows
+    except ImportError as exc:  # pragma: no cover - exercised only without the optional dependency
+        raise ImportError(
+            "Raster sampling requires rasterio. Install it with `pip install geoplant[rasters]`."
+        ) from exc
+    return rasterio
+
+
+@dataclass
+class _BlockTask:
+    """Pixels of the points falling in a contiguous run of raster blocks."""
+
+    path: str
+    positions: np.ndarray
+    rows: np.ndarray
+    cols: np.ndarray
+    block_ids: np.ndarray
+    block_shape: tuple[int, int]
+    n_block_cols: int
+
+
+def find_rasters(root: str | Path) -> list[Path]:
+    """Return every GeoTIFF under ``root`` in a stable order."""
+    root = Path(root)
+    if root.is_file():
+        return [root]
+    return sorted(path for path in root.rglob("*") if path.suffix.lower() in RASTER_SUFFIXES)
+
+
+def raster_column_names(path: str | Path) -> list[str]:
+    """Feature column names of a raster: its file stem, suffixed by band description or index."""
+    rasterio = _get_rasterio()
+    stem = Path(path).stem
+    with rasterio.open(path) as source:
+        if source.count == 1:
+            return [stem]
+        return [
+            f"{stem}_{description}" if description else f"{stem}_band{index + 1}"
+            for index, description in enumerate(source.descriptions)
+        ]
+
+
+def _pixel_coordinates(source, longitudes: np.ndarray, latitudes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Row and column of every lon/lat point in ``source``; -1 outside the raster."""
+    rasterio = _get_rasterio()
+    xs, ys = longitudes, latitudes
+    if source.crs is not None and source.crs.to_epsg() != 4326:
+        xs, ys = (np.asarray(values) for values in rasterio.warp.transform("EPSG:4326", source.crs, xs, ys))
+    inverse = ~source.transform
+    with np.errstate(invalid="ignore"):
+        cols = np.floor(inverse.a * xs + inverse.b * ys + inverse.c)
+        rows = np.floor(inverse.d * xs + inverse.e * ys + inverse.f)
+    inside = (cols >= 0) & (cols < source.width) & (rows >= 0) & (rows < source.height)
+    return np.where(inside, rows, -1).astype(np.int64), np.where(inside, cols, -1).astype(np.int64)
+
+
+def _read_block(source, block_id: int, block_shape: tuple[int, int], n_block_cols: int) -> np.ndarray:
+    """Read one ``(bands, height, width)`` float32 block with nodata replaced by NaN."""
+    rasterio = _get_rasterio()
+    block_height, block_width = block_shape
+    block_row, block_col = divmod(int(block_id), n_block_cols)
+    window = rasterio.windows.Window(
+        block_col * block_width,
+        block_row * block_height,
+        min(block_width, source.width - block_col * block_width),
+        min(block_height, source.height - block_row * block_height),
+    )
+    block = source.read(window=window, out_dtype=np.float32)
+    for band, band_nodata in enumerate(source.nodatavals):
+        if band_nodata is not None:
+            block[band][block[band] == np.float32(band_nodata)] = np.nan
+    return block
+
+
+def _block_origin(block_id: int, block_shape: tuple[int, int], n_block_cols: int) -> tuple[int, int]:
+    block_row, block_col = divmod(int(block_id), n_block_cols)
+    return block_row * block_shape[0], block_col * block_shape[1]
+
+
+def _sample_blocks(task: _BlockTask) -> tuple[np.ndarray, np.ndarray]:
+    """Read every block of ``task`` once and gather the values of its points."""
+    rasterio = _get_rasterio()
+    with rasterio.open(task.path) as source:
+        values = np.empty((task.positions.size, source.count), dtype=np.float32)
+        starts = np.flatnonzero(np.r_[True, task.block_ids[1:] != task.block_ids[:-1]])
+        for start, stop in zip(starts, np.r_[starts[1:], task.positions.size]):
+            block_id = int(task.block_ids[start])
+            block = _read_block(source, block_id, task.block_shape, task.n_block_cols)
+            row_offset, col_offset = _block_origin(block_id, task.block_shape, task.n_block_cols)
+            values[start:stop] = block[:, task.rows[start:stop] - row_offset, task.cols[start:stop] - col_offset].T
+    return task.positions, values
+
+
+def sample_raster(
+    path: str | Path,
+    longitudes: np.ndarray | pd.Series,
+    latitudes: np.ndarray | pd.Series,
+    n_jobs: int = 1,
+    blocks_per_task: int = 256,
+) -> np.ndarray:
+    """Sample every band of one raster at lon/lat points (EPSG:4326).
+
+    Returns a ``(n_points, n_bands)`` float32 array; points outside the raster
+    or on nodata pixels are NaN. With ``n_jobs > 1`` runs of
+    ``blocks_per_task`` blocks are read by separate processes.
+    """
+    rasterio = _get_rasterio()
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    if longitudes.shape != latitudes.shape:
+        raise ValueError("longitudes and latitudes must have the same shape")
+
+    with rasterio.open(path) as source:
+        rows, cols = _pixel_coordinates(source, longitudes, latitudes)
+        block_shape = source.block_shapes[0]
+        n_block_cols = -(-source.width // block_shape[1])
+        n_bands = source.count
+
+    positions = np.flatnonzero(rows >= 0)
+    block_ids = (rows[positions] // block_shape[0]) * n_block_cols + cols[positions] // block_shape[1]
+    order = np.argsort(block_ids, kind="stable")
+    positions, block_ids = positions[order], block_ids[order]
+
+    block_starts = np.flatnonzero(np.r_[True, block_ids[1:] != block_ids[:-1]]) if positions.size else np.empty(0)
+    task_starts = block_starts[:: max(1, int(blocks_per_task))].astype(np.int64)
+    tasks = [
+        _BlockTask(
+            path=str(path),
+            positions=positions[start:stop],
+            rows=rows[positions[start:stop]],
+            cols=cols[positions[start:stop]],
+            block_ids=block_ids[start:stop],
+            block_shape=block_shape,
+            n_block_cols=n_block_cols,
+        )
+        for start, stop in zip(task_starts, np.r_[task_starts[1:], positions.size])
+    ]
+
+    sampled = np.full((longitudes.size, n_bands), np.nan, dtype=np.float32)
+    if n_jobs == 1 or len(tasks) <= 1:
+        for task_positions, values in map(_sample_blocks, tasks):
+            sampled[task_positions] = values
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            for task_positions, values in executor.map(_sample_blocks, tasks):
+                sampled[task_positions] = values
+    return sampled
+
+
+def sample_rasters(
+    paths: Sequence[str | Path],
+    longitudes: np.ndarray | pd.Series,
+    latitudes: np.ndarray | pd.Series,
+    n_jobs: int = 1,
+) -> pd.DataFrame:
+    """Sample several rasters at lon/lat points into one float32 table (see :func:`raster_column_names`)."""
+    columns: dict[str, np.ndarray] = {}
+    for path in paths:
+        values = sample_raster(path, longitudes, latitudes, n_jobs=n_jobs)
+        for index, name in enumerate(raster_column_names(path)):
+            if name in columns:
+                raise ValueError(f"Duplicate raster column name: {name}")
+            columns[name] = values[:, index]
+    return pd.DataFrame(columns)
+
+
+def extract_raster_features(
+    surveys: pd.DataFrame,
+    paths: Sequence[str | Path],
+    survey_id_column: str = "surveyId",
+    longitude_column: str = "lon",
+    latitude_column: str = "lat",
+    n_jobs: int = 1,
+) -> pd.DataFrame:
+    """Build a ``surveyId`` + raster value table for the surveys of a metadata frame.
+
+    Repeated survey rows (e.g. one per species) are sampled once. Write the
+    result with ``to_csv(..., index=False)`` to use it as a predictor file of
+    ``PredictorPairSpec`` / ``load_predictor_pairs`` in the baselines.
+    """
+    missing = [
+        column for column in (survey_id_column, longitude_column, latitude_column) if column not in surveys.columns
+    ]
+    if missing:
+        raise ValueError(f"Required columns missing in surveys: {missing}")
+    unique_surveys = surveys.drop_duplicates(survey_id_column)
+    features = sample_rasters(
+        paths,
+        unique_surveys[longitude_column].to_numpy(),
+        unique_surveys[latitude_column].to_numpy(),
+        n_jobs=n_jobs,
+    )
+    features.insert(0, "surveyId", unique_surveys[survey_id_column].to_numpy())
+    return features
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from dataset import GeoPlant  # noqa: E402
+from dataset.alphaearth import alphaearth_columns, alphaearth_predictors, read_alphaearth  # noqa: E402
+
+
+def _embeddings(n_surveys=100, width=4):
+    return np.arange(n_surveys * width, dtype=np.float32).reshape(n_surveys, width) / 10.0
+
+
+def _write_columns(path, survey_ids, embeddings):
+    table = pa.table(
+        {
+            "surveyId": survey_ids,
+            "lat": np.full(len(survey_ids), 45.0),
+            "lon": np.full(len(survey_ids), 5.0),
+            **{f"A{index:02d}": embeddings[:, index] for index in range(embeddings.shape[1])},
+        }
+    )
+    pq.write_table(table, path, row_group_size=10)
+
+
+def test_read_alphaearth_skips_row_groups_and_aligns_to_requested_ids(tmp_path, monkeypatch):
+    path = tmp_path / "PA-train-alphaearth.parquet"
+    embeddings = _embeddings()
+    _write_columns(path, np.arange(1000, 1100), embeddings)
+    read_row_groups = pq.ParquetFile.read_row_groups
+    requested_groups = []
+
+    def recording_read_row_groups(self, row_groups, *args, **kwargs):
+        requested_groups.append(list(row_groups))
+        return read_row_groups(self, row_groups, *args, **kwargs)
+
+    monkeypatch.setattr(pq.ParquetFile, "read_row_groups", recording_read_row_groups)
+
+    assert alphaearth_columns(path) == ["A00", "A01", "A02", "A03"]
+    survey_ids, values, names = read_alphaearth(path, [1095, 7, 1003, 1004], columns=["A01", "A03"])
+
+    assert requested_groups == [[0, 9]]
+    assert survey_ids.tolist() == [1095, 7, 1003, 1004] and names == ["A01", "A03"]
+    assert values.dtype == np.float32
+    np.testing.assert_array_equal(values[[0, 2, 3]], embeddings[[95, 3, 4]][:, [1, 3]])
+    assert np.isnan(values[1]).all()
+
+    predictors = alphaearth_predictors(path)
+    assert predictors.columns.tolist() == ["surveyId", "ae_A00", "ae_A01", "ae_A02", "ae_A03"]
+    np.testing.assert_array_equal(predictors.iloc[:, 1:].to_numpy(), embeddings)
+
+
+def test_read_alphaearth_returns_embedding_list_column_without_copy(tmp_path):
+    path = tmp_path / "alphaearth.parquet"
+    embeddings = _embeddings(width=64)
+    vectors = pa.FixedSizeListArray.from_arrays(pa.array(embeddings.ravel()), 64)
+    pq.write_table(pa.table({"surveyId": np.arange(100), "embedding": vectors}), path)
+
+    survey_ids, values, names = read_alphaearth(path, np.arange(100))
+
+    assert names[0] == "embedding_0" and len(names) == 64
+    assert not values.flags.owndata
+    np.testing.assert_array_equal(values, embeddings)
+    np.testing.assert_array_equal(read_alphaearth(path, [3, 1])[1], embeddings[[3, 1]])
+
+
+def test_dataset_serves_alphaearth_embeddings(tmp_path):
+    (tmp_path / "PresenceAbsenceSurveys").mkdir()
+    pd.DataFrame({"surveyId": [1005, 1001, 2000], "speciesId": [1, 2, 3]}).to_csv(
+        tmp_path / "PresenceAbsenceSurveys" / "PA_metadata_train.csv", index=False
+    )
+    (tmp_path / "SatelliteData" / "AlphaEarth").mkdir(parents=True)
+    embeddings = _embeddings(n_surveys=10)
+    _write_columns(tmp_path / "SatelliteData/AlphaEarth/PA-train-alphaearth.parquet", np.arange(1000, 1010), embeddings)
+
+    dataset = GeoPlant(tmp_path).dataset("train", "alphaearth")
+
+    batch = dataset.__getitems__([1, 0])
+    assert batch["surveyId"].tolist() == [1001, 1005]
+    np.testing.assert_array_equal(batch["alphaearth"], embeddings[[1, 5]])
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from dataset.cubes import CubeStore, build_cube_store, find_cube_files
+
+
+def _write_cubes(root, survey_ids, shape=(4, 19, 12)):
+    rng = np.random.default_rng(0)
+    cubes = {}
+    for survey_id in survey_ids:
+        cube = rng.normal(size=shape).astype(np.float32)
+        cube[0, 0, 0] = np.nan
+        directory = root / str(survey_id)[-2:]
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / f"GLC24-PA-train-bioclimatic_monthly_{survey_id}_cube.npy", cube)
+        cubes[survey_id] = cube
+    return cubes
+
+
+def test_cube_store_serves_batches_in_request_order(tmp_path):
+    cubes = _write_cubes(tmp_path / "cubes", [212, 3, 1045, 77, 78, 79])
+
+    survey_ids, _ = find_cube_files(tmp_path / "cubes")
+    store = build_cube_store(tmp_path / "cubes", tmp_path / "store", dtype=np.float16, n_workers=2)
+
+    assert survey_ids.tolist() == [3, 77, 78, 79, 212, 1045]
+    assert len(store) == 6 and store.cube_shape == (4, 19, 12)
+    assert isinstance(CubeStore(tmp_path / "store").cubes, np.memmap)
+    batch = store.get_batch([1045, 3, 212])
+    assert batch.dtype == np.float16
+    np.testing.assert_array_equal(batch, np.stack([cubes[1045], cubes[3], cubes[212]]).astype(np.float16))
+    np.testing.assert_array_equal(store.get_batch([77, 78, 79]), store.cubes[1:4])
+    np.testing.assert_array_equal(store[78], cubes[78].astype(np.float16))
+
+    filled = store.get_batch([5, 77], missing="ignore", nan_to_num=True)
+    assert (filled[0] == 0).all() and filled[1, 0, 0, 0] == 0
+    assert 77 in store and 5 not in store
+    with pytest.raises(KeyError):
+        store.get_batch([5])
+
+
+def test_build_cube_store_reads_torch_tensors(tmp_path):
+    torch = pytest.importorskip("torch")
+    (tmp_path / "cubes").mkdir()
+    for survey_id in (1, 2):
+        torch.save(torch.full((6, 4, 21), float(survey_id)), tmp_path / "cubes" / f"landsat_{survey_id}_cube.pt")
+
+    store = build_cube_store(tmp_path / "cubes", tmp_path / "store")
+
+    assert store.get_batch([2, 1])[:, 0, 0, 0].tolist() == [2.0, 1.0]
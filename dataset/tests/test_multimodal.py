@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset import GeoPlant
+from dataset.multimodal import LabelIndex
+
+
+def _write_cube_dir(directory, survey_ids, shape):
+    directory.mkdir(parents=True)
+    for survey_id in survey_ids:
+        np.save(directory / f"cubes_{survey_id}_cube.npy", np.full(shape, float(survey_id), dtype=np.float32))
+
+
+def _write_patches(directory, survey_ids):
+    Image = pytest.importorskip("PIL.Image")
+    for layer, mode, channels in (("rgb", "RGB", 3), ("nir", "L", 1)):
+        for survey_id in survey_ids:
+            path = directory / layer / str(survey_id)[-2:] / str(survey_id)[-4:-2] / f"{survey_id}.jpeg"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            value = np.full((8, 8, channels), 10 if layer == "rgb" else 200, dtype=np.uint8)
+            Image.fromarray(value.squeeze(), mode=mode).save(path)
+
+
+@pytest.fixture
+def geoplant_root(tmp_path):
+    (tmp_path / "PresenceAbsenceSurveys").mkdir()
+    pd.DataFrame(
+        {"surveyId": [1201, 1201, 3402, 5603, 7804], "speciesId": [5, 9, 9, 2, 5], "lat": 45.0, "lon": 5.0}
+    ).to_csv(tmp_path / "PresenceAbsenceSurveys" / "PA_metadata_train.csv", index=False)
+    _write_cube_dir(
+        tmp_path / "TimeSeries/Bioclim/cubes/PA-train-bioclimatic-monthly", [1201, 3402, 5603, 7804], (4, 19, 12)
+    )
+    _write_cube_dir(tmp_path / "TimeSeries/Landsat/cubes/PA-train-landsat-time-series", [1201, 3402, 7804], (6, 4, 21))
+    return tmp_path
+
+
+def test_dataset_joins_cube_modalities_and_labels_by_survey_id(geoplant_root):
+    dataset = GeoPlant(geoplant_root).dataset("train", ["bioclim", "landsat"], cube_dtype="float16")
+
+    assert len(dataset) == 3
+    batch = dataset.__getitems__([2, 0])
+    assert batch["surveyId"].tolist() == [7804, 1201]
+    assert batch["bioclim"].shape == (2, 4, 19, 12) and batch["bioclim"].dtype == np.float16
+    assert batch["landsat"][:, 0, 0, 0].tolist() == [7804.0, 1201.0]
+    assert dataset.labels.species_ids.tolist() == [2, 5, 9]
+    assert batch["labels"].tolist() == [[0, 1, 0], [0, 1, 1]]
+    assert (geoplant_root / "stores" / "PA-train-bioclimatic-monthly" / "cubes.npy").exists()
+
+    batches = list(dataset.iter_batches(batch_size=2, prefetch=2))
+    assert [batch["surveyId"].tolist() for batch in batches] == [[1201, 3402], [7804]]
+    restored = pickle.loads(pickle.dumps(dataset))
+    assert restored[1]["bioclim"][0, 0, 0] == 3402.0
+
+    left = GeoPlant(geoplant_root).dataset("train", "landsat", how="left", nan_to_num=True)
+    assert left.__getitems__([2])["landsat"].sum() == 0.0
+
+
+def test_dataset_stacks_rgb_and_nir_patches(geoplant_root):
+    patch_dir = geoplant_root / "SatelliteData/Sentinel2Patches-jpeg/PA-Train-Sentinel2Patches-RGB+NIR"
+    _write_patches(patch_dir, [1201, 5603])
+
+    dataset = GeoPlant(geoplant_root).dataset("train", ["sentinel2-jpeg", "bioclim"], labels=False)
+
+    batch = dataset.__getitems__([0, 1])
+    assert batch["surveyId"].tolist() == [1201, 5603]
+    assert batch["sentinel2-jpeg"].shape == (2, 4, 8, 8)
+    assert batch["sentinel2-jpeg"][0, :, 0, 0].tolist() == [10, 10, 10, 200]
+    assert "labels" not in batch
+    with pytest.raises(ValueError, match="Unknown dataset modalities"):
+        GeoPlant(geoplant_root).dataset("train", ["sentinel3"])
+
+
+def test_label_index_keeps_requested_species_order():
+    metadata = pd.DataFrame({"surveyId": [3, 1, 1, 2], "speciesId": [7.0, 4.0, 7.0, np.nan]})
+
+    labels = LabelIndex.from_metadata(metadata, species_ids=[7, 4, 11])
+
+    assert labels.take(labels.positions([1, 2, 3])).tolist() == [[1, 1, 0], [0, 0, 0], [1, 0, 0]]
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+
+from dataset.raster_cache import CachedRasterSampler, TileCache  # noqa: E402
+from dataset.rasters import sample_raster  # noqa: E402
+
+
+def _write_raster(path, values):
+    count, height, width = values.shape
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=height,
+        width=width,
+        count=count,
+        dtype=values.dtype,
+        crs="EPSG:4326",
+        transform=rasterio.transform.from_origin(-10.0, 60.0, 0.5, 0.5),
+        tiled=True,
+        blockxsize=16,
+        blockysize=16,
+    ) as destination:
+        destination.write(values)
+
+
+def test_cached_sampler_matches_block_sampler_and_evicts_least_recently_used(tmp_path):
+    rng = np.random.default_rng(0)
+    path = tmp_path / "elevation.tif"
+    _write_raster(path, rng.normal(size=(1, 48, 64)).astype(np.float32))
+    longitudes = rng.uniform(-10.0, 15.0, 300)
+    latitudes = rng.uniform(40.0, 60.0, 300)
+
+    tile_bytes = 16 * 16 * 4
+    cache = TileCache(max_bytes=2 * tile_bytes)
+    with CachedRasterSampler([path], cache) as sampler:
+        sampled = sampler.sample(longitudes, latitudes)
+        assert sampled.columns.tolist() == ["elevation"]
+        np.testing.assert_array_equal(sampled.to_numpy(), sample_raster(path, longitudes, latitudes))
+        assert len(cache) == 2 and cache.nbytes <= cache.max_bytes
+
+        sampler.sample_array(-9.75, 59.75)
+        sampler.sample_array(-1.75, 59.75)
+        misses = cache.misses
+        sampler.sample_array(-9.75, 59.75)
+        assert cache.misses == misses and cache.hits >= 1
+        sampler.sample_array(-9.75, 50.75)
+        assert [block_id for _, block_id in cache._tiles] == [0, 4]
+
+
+def test_tile_dir_shares_decoded_tiles_between_caches(tmp_path):
+    path = tmp_path / "landcover.tif"
+    _write_raster(path, np.arange(2 * 40 * 50, dtype=np.float32).reshape(2, 40, 50))
+
+    with CachedRasterSampler([path], TileCache(tile_dir=tmp_path / "tiles")) as sampler:
+        first = sampler.sample_array([-9.75, 14.0], [59.75, 41.0])
+    assert len(list((tmp_path / "tiles").glob("*.npy"))) == 2
+
+    def fail():
+        raise AssertionError("shared tile was decoded again")
+
+    shared = TileCache(tile_dir=tmp_path / "tiles")
+    key = next(iter(sorted((tmp_path / "tiles").glob("*-0.npy")))).stem.rsplit("-", 1)
+    tile = shared.get((key[0], 0), fail)
+    assert isinstance(tile, np.memmap)
+    assert first[0].tolist() == [0.0, 2000.0]
+
+
+def test_tile_dir_is_pruned_to_max_disk_bytes(tmp_path):
+    rng = np.random.default_rng(0)
+    path = tmp_path / "elevation.tif"
+    values = rng.normal(size=(1, 48, 64)).astype(np.float32)
+    _write_raster(path, values)
+    tiles = tmp_path / "tiles"
+
+    tile_file_bytes = 16 * 16 * 4 + 128
+    cache = TileCache(tile_dir=tiles, max_disk_bytes=2 * tile_file_bytes)
+    with CachedRasterSampler([path], cache) as sampler:
+        sampled = sampler.sample_array([-9.75, -1.75, 6.25], [59.75, 59.75, 59.75])
+    assert sorted(tile.stem.rsplit("-", 1)[1] for tile in tiles.glob("*.npy")) == ["1", "2"]
+    np.testing.assert_array_equal(sampled[:, 0], values[0, 0, [0, 16, 32]])
+
+    assert TileCache(tile_dir=tiles).prune_tile_dir(1) == tile_file_bytes
+    assert len(list(tiles.glob("*.npy"))) == 1
+
+
+def test_tile_dir_is_listed_only_when_the_running_total_exceeds_the_budget(tmp_path, monkeypatch):
+    tile_file_bytes = 16 * 16 * 4 + 128
+    cache = TileCache(tile_dir=tmp_path, max_disk_bytes=3 * tile_file_bytes)
+    scans = []
+    prune = cache.prune_tile_dir
+    monkeypatch.setattr(cache, "prune_tile_dir", lambda: scans.append(len(list(tmp_path.glob("*.npy")))) or prune())
+
+    for block_id in range(5):
+        cache.get(("elevation", block_id), lambda: np.zeros((1, 16, 16), dtype=np.float32))
+
+    assert scans == [1, 4, 4]
+    assert len(list(tmp_path.glob("*.npy"))) == 3
+    assert cache._disk_bytes == 3 * tile_file_bytes
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+
+from dataset.rasters import extract_raster_features, find_rasters, sample_raster  # noqa: E402
+
+
+def _write_raster(path, values, nodata=None, descriptions=None):
+    count, height, width = values.shape
+    profile = {
+        "driver": "GTiff",
+        "height": height,
+        "width": width,
+        "count": count,
+        "dtype": values.dtype,
+        "crs": "EPSG:4326",
+        "transform": rasterio.transform.from_origin(-10.0, 60.0, 0.5, 0.5),
+        "tiled": True,
+        "blockxsize": 16,
+        "blockysize": 16,
+        "nodata": nodata,
+    }
+    with rasterio.open(path, "w", **profile) as destination:
+        destination.write(values)
+        for index, description in enumerate(descriptions or []):
+            destination.set_band_description(index + 1, description)
+
+
+def test_sample_raster_reads_blocks_once_and_matches_rasterio_sample(tmp_path):
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(2, 40, 50)).astype(np.float32)
+    values[0, 0, 0] = -9999.0
+    path = tmp_path / "climate.tif"
+    _write_raster(path, values, nodata=-9999.0)
+
+    longitudes = np.r_[rng.uniform(-10.0, 15.0, 500), -9.9, 40.0, np.nan]
+    latitudes = np.r_[rng.uniform(40.0, 60.0, 500), 59.9, 50.0, 50.0]
+    sampled = sample_raster(path, longitudes, latitudes)
+    parallel = sample_raster(path, longitudes, latitudes, n_jobs=2, blocks_per_task=2)
+
+    with rasterio.open(path) as source:
+        expected = np.array(list(source.sample(zip(longitudes[:500], latitudes[:500]))), dtype=np.float32)
+    np.testing.assert_allclose(sampled[:500], np.where(expected == -9999.0, np.nan, expected))
+    assert np.isnan(sampled[500, 0]) and sampled[500, 1] == values[1, 0, 0]
+    assert np.isnan(sampled[501:]).all()
+    np.testing.assert_array_equal(parallel, sampled)
+
+
+def test_extract_raster_features_builds_predictor_table_per_survey(tmp_path):
+    _write_raster(tmp_path / "elevation.tif", np.arange(40 * 50, dtype=np.float32).reshape(1, 40, 50))
+    _write_raster(
+        tmp_path / "soil.tif",
+        np.ones((2, 40, 50), dtype=np.float32),
+        descriptions=["ph", "clay"],
+    )
+    surveys = pd.DataFrame(
+        {"surveyId": [7, 7, 8], "speciesId": [1, 2, 3], "lon": [-9.75, -9.75, -9.25], "lat": [59.75, 59.75, 59.25]}
+    )
+
+    features = extract_raster_features(surveys, find_rasters(tmp_path))
+
+    assert features.columns.tolist() == ["surveyId", "elevation", "soil_ph", "soil_clay"]
+    assert features["surveyId"].tolist() == [7, 8]
+    assert features["elevation"].tolist() == [0.0, 51.0]
@@ -1,13 +1,10 @@
 import geopandas as gpd
 from tqdm import tqdm
+import numpy as np
 import pandas as pd
+import shapely
 import time
 from joblib import Parallel, delayed
-import os
-
-# Define global variables to be used by the parallel function
-global_polygons = None
-global_polygons_sindex = None
 
 
 def read_polygons(file_path):
@@ -52,40 +49,106 @@ def read_gps_data(file_path, longitude_col="lon", latitude_col="lat"):
         raise RuntimeError(f"Error reading GPS data file: {e}")
 
 
-def find_polygon_id(point):
+def _tile_ids(longitudes, latitudes, tile_size_degrees):
     """
-    Find the polygon ID that contains the given point.
+    Return the id of the ``tile_size_degrees`` lon/lat tile of every point.
 
     Args:
-        point (shapely.geometry.Point): The point to check.
+        longitudes (np.ndarray): Point longitudes.
+        latitudes (np.ndarray): Point latitudes.
+        tile_size_degrees (float): Side of the square tiles in degrees.
 
     Returns:
-        str: The short name of the polygon that contains the point, or None if no polygon contains the point.
+        np.ndarray: Integer tile id of every point.
     """
-    possible_matches_index = list(global_polygons_sindex.query(point))
-    possible_matches = global_polygons.iloc[possible_matches_index]
-    for _, row in possible_matches.iterrows():
-        if row['geometry'].contains(point):
-            return row['short_name']
-    return None
+    n_columns = int(np.ceil(360.0 / tile_size_degrees)) + 1
+    rows = np.floor((latitudes + 90.0) / tile_size_degrees).astype(np.int64)
+    columns = np.floor((longitudes + 180.0) / tile_size_degrees).astype(np.int64)
+    return rows * n_columns + columns
+
 
+def _join_tile(longitudes, latitudes, geometries, polygon_positions):
+    """
+    Find the polygon containing each point of one spatial tile.
+
+    Args:
+        longitudes (np.ndarray): Longitudes of the tile points.
+        latitudes (np.ndarray): Latitudes of the tile points.
+        geometries (np.ndarray): Polygons intersecting the tile bounding box.
+        polygon_positions (np.ndarray): Row position of each of those polygons in the full polygon frame.
 
-def process_point(point):
+    Returns:
+        np.ndarray: Position of the containing polygon for every point (the lowest one when polygons
+        overlap), or -1 when no polygon contains the point.
+    """
+    no_match = np.iinfo(np.int64).max
+    matched = np.full(longitudes.size, no_match, dtype=np.int64)
+    if geometries.size:
+        # Querying polygons against a tree of points lets GEOS prepare each polygon once.
+        points = shapely.points(longitudes, latitudes)
+        polygon_index, point_index = shapely.STRtree(points).query(geometries, predicate="contains")
+        np.minimum.at(matched, point_index, polygon_positions[polygon_index])
+    matched[matched == no_match] = -1
+    return matched
+
+
+def assign_bioregions(longitudes, latitudes, polygons, label_column="short_name", tile_size_degrees=5.0,
+                      n_jobs=1):
     """
-    Wrapper function for parallel processing to call find_polygon_id.
+    Assign the label of the containing polygon to every point with a bulk point-in-polygon join.
+
+    Points are grouped into square lon/lat tiles. Each tile is joined in one vectorized STRtree
+    query against only the polygons that intersect the tile, so with ``n_jobs != 1`` workers
+    receive small polygon subsets instead of the whole frame.
 
     Args:
-        point (shapely.geometry.Point): The point to process.
+        longitudes (array-like): Point longitudes in EPSG:4326.
+        latitudes (array-like): Point latitudes in EPSG:4326.
+        polygons (gpd.GeoDataFrame): Polygons in EPSG:4326.
+        label_column (str): Column of ``polygons`` holding the label to assign.
+        tile_size_degrees (float): Side of the tiles points are chunked by.
+        n_jobs (int): The number of jobs to run in parallel. -1 means using all processors.
 
     Returns:
-        str: The polygon ID.
+        pd.Series: Label of the containing polygon for each point, missing when no polygon contains it.
     """
-    return find_polygon_id(point)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    if longitudes.shape != latitudes.shape:
+        raise ValueError("longitudes and latitudes must have the same shape")
+    if tile_size_degrees <= 0:
+        raise ValueError("tile_size_degrees must be positive")
+
+    valid_rows = np.flatnonzero(np.isfinite(longitudes) & np.isfinite(latitudes))
+    tile_ids = _tile_ids(longitudes[valid_rows], latitudes[valid_rows], tile_size_degrees)
+    order = np.argsort(tile_ids, kind="stable")
+    rows = valid_rows[order]
+    _, tile_starts = np.unique(tile_ids[order], return_index=True)
+    tile_bounds = np.r_[tile_starts, rows.size]
+
+    geometries = np.asarray(polygons.geometry.array)
+    tasks = []
+    for start, stop in zip(tile_bounds[:-1], tile_bounds[1:]):
+        tile_longitudes = longitudes[rows[start:stop]]
+        tile_latitudes = latitudes[rows[start:stop]]
+        tile_box = shapely.box(tile_longitudes.min(), tile_latitudes.min(),
+                               tile_longitudes.max(), tile_latitudes.max())
+        candidates = np.sort(polygons.sindex.query(tile_box))
+        tasks.append(delayed(_join_tile)(tile_longitudes, tile_latitudes, geometries[candidates], candidates))
+    tile_matches = Parallel(n_jobs=n_jobs)(tqdm(tasks, desc="Assigning polygon IDs"))
+
+    positions = np.full(longitudes.size, -1, dtype=np.int64)
+    if tile_matches:
+        positions[rows] = np.concatenate(tile_matches)
+    labels = np.empty(longitudes.size, dtype=object)
+    matched = positions >= 0
+    labels[matched] = polygons[label_column].to_numpy()[positions[matched]]
+    return pd.Series(labels)
 
 
 def assign_polygon_ids(gps_gdf, polygons, n_jobs=-1):
     """
-    Assign polygon IDs to GPS data points using parallel processing.
+    Assign polygon IDs to GPS data points using a tiled, vectorized spatial join.
 
     Args:
         gps_gdf (gpd.GeoDataFrame): GeoDataFrame containing GPS data points.
@@ -95,15 +158,7 @@ def assign_polygon_ids(gps_gdf, polygons, n_jobs=-1):
     Returns:
         pd.Series: Series containing the polygon IDs for each GPS data point.
     """
-    global global_polygons, global_polygons_sindex
-    global_polygons = polygons
-    global_polygons_sindex = polygons.sindex
-
-    polygon_ids = Parallel(n_jobs=n_jobs)(
-        delayed(process_point)(point) for point in tqdm(gps_gdf.geometry,
-                                                        desc="Assigning polygon IDs")
-    )
-    return pd.Series(polygon_ids)
+    return assign_bioregions(gps_gdf.geometry.x, gps_gdf.geometry.y, polygons, n_jobs=n_jobs)
 
 
 def save_gps_data(gps_gdf, output_path):
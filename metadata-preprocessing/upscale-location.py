@@ -1,46 +1,138 @@
+import numpy as np
 import pandas as pd
-from joblib import Parallel, delayed
 import reverse_geocoder as rg
-import multiprocessing
 from tqdm import tqdm
 import os
 import time
 
-# Number of parallel jobs
-n_jobs = multiprocessing.cpu_count()
+# Geocoder fields kept for every survey, and the names they get in the metadata
+LOCATION_COLUMNS = {'admin1': 'county', 'admin2': 'district'}
 
 
-def upscale_gps(lat, lon, survey_id):
+def _cache_key_columns(decimals):
     """
-    Perform reverse geocoding to get location data for a GPS coordinate.
+    Return the names of the integer coordinate key columns of a cache rounded to ``decimals``.
+    """
+    return f"lat_e{decimals}", f"lon_e{decimals}"
+
+
+def load_geocode_cache(cache_path, decimals=5):
+    """
+    Load the coordinate-rounded reverse geocoding cache.
 
     Args:
-        lat (float): Latitude of the point.
-        lon (float): Longitude of the point.
-        survey_id (int): ID of the survey.
+        cache_path (str): Path to the cache CSV file.
+        decimals (int): Number of decimals coordinates were rounded to.
 
     Returns:
-        dict: Dictionary with location data and survey ID.
+        pd.DataFrame: Cached locations keyed by rounded coordinates (empty if the file does not exist).
     """
-    try:
-        location = rg.search((lat, lon), mode=1)[0]
-        location_data = {
-            'county': location['admin1'],
-            'district': location['admin2'],
-            'surveyId': survey_id
-        }
-        return location_data
-    except Exception as e:
-        print(f"Error processing point ({lat}, {lon}): {e}")
-        return None
+    key_columns = list(_cache_key_columns(decimals))
+    if cache_path is None or not os.path.exists(cache_path):
+        return pd.DataFrame(columns=key_columns + list(LOCATION_COLUMNS.values()))
+    # Empty geocoder fields are valid values, keep them as "" instead of NaN
+    cache = pd.read_csv(cache_path, keep_default_na=False,
+                        dtype={column: str for column in LOCATION_COLUMNS.values()})
+    missing = [column for column in key_columns if column not in cache.columns]
+    if missing:
+        raise ValueError(f"Geocode cache {cache_path} was not built with decimals={decimals}")
+    return cache
+
+
+def save_geocode_cache(cache, cache_path):
+    """
+    Atomically write the reverse geocoding cache to a CSV file.
 
+    Args:
+        cache (pd.DataFrame): Cached locations keyed by rounded coordinates.
+        cache_path (str): Path to the cache CSV file.
+    """
+    temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+    cache.to_csv(temporary_path, index=False)
+    os.replace(temporary_path, cache_path)
 
-def process_gps_data(file_path):
+
+def geocode_coordinates(latitudes, longitudes, batch_size=262144):
+    """
+    Reverse geocode coordinate arrays with one K-D tree query per block of points.
+
+    Args:
+        latitudes (np.ndarray): Latitudes of the points.
+        longitudes (np.ndarray): Longitudes of the points.
+        batch_size (int): Number of points per K-D tree query.
+
+    Returns:
+        pd.DataFrame: Location columns (``county``, ``district``) for every point.
+    """
+    geocoder = rg.RGeocoder(mode=1, verbose=False)
+    coordinates = np.column_stack([latitudes, longitudes]).astype(np.float64)
+    locations = []
+    for start in tqdm(range(0, len(coordinates), batch_size), desc="Geocoding GPS data"):
+        locations.extend(geocoder.query(coordinates[start:start + batch_size]))
+    return pd.DataFrame(
+        {target: [location[source] for location in locations] for source, target in LOCATION_COLUMNS.items()}
+    )
+
+
+def upscale_locations(surveys, cache_path=None, decimals=5, batch_size=262144):
+    """
+    Add location details to surveys, geocoding each distinct rounded coordinate only once.
+
+    Coordinates are rounded to ``decimals`` and deduplicated. Coordinates found in the cache at
+    ``cache_path`` are reused, the others are geocoded in blocks and appended to the cache, so
+    re-running on updated metadata only geocodes new points.
+
+    Args:
+        surveys (pd.DataFrame): One row per survey with ``lat``, ``lon`` and ``surveyId`` columns.
+        cache_path (str): Optional path to the coordinate cache CSV file.
+        decimals (int): Number of decimals coordinates are rounded to before lookup.
+        batch_size (int): Number of points per K-D tree query.
+
+    Returns:
+        pd.DataFrame: One row per input survey, in input order: ``surveyId`` with the location columns;
+        surveys without valid coordinates get NaN.
+    """
+    lat_key, lon_key = _cache_key_columns(decimals)
+    scale = 10 ** decimals
+    valid = np.isfinite(surveys["lat"].to_numpy(dtype=np.float64)) & np.isfinite(
+        surveys["lon"].to_numpy(dtype=np.float64))
+    keys = pd.DataFrame({
+        "surveyId": surveys["surveyId"].to_numpy()[valid],
+        lat_key: np.round(surveys["lat"].to_numpy(dtype=np.float64)[valid] * scale).astype(np.int64),
+        lon_key: np.round(surveys["lon"].to_numpy(dtype=np.float64)[valid] * scale).astype(np.int64),
+    })
+
+    cache = load_geocode_cache(cache_path, decimals)
+    distinct = keys[[lat_key, lon_key]].drop_duplicates()
+    new_points = distinct.merge(cache[[lat_key, lon_key]], on=[lat_key, lon_key], how="left",
+                                indicator=True)
+    new_points = new_points.loc[new_points["_merge"] == "left_only", [lat_key, lon_key]]
+    new_points = new_points.reset_index(drop=True)
+    print(f"{len(distinct)} distinct coordinates, {len(new_points)} not in cache.")
+    if len(new_points):
+        located = geocode_coordinates(new_points[lat_key] / scale, new_points[lon_key] / scale,
+                                      batch_size=batch_size)
+        new_entries = pd.concat([new_points, located], axis=1)
+        cache = new_entries if cache.empty else pd.concat([cache, new_entries], ignore_index=True)
+        if cache_path is not None:
+            save_geocode_cache(cache, cache_path)
+
+    location_data = keys.merge(cache, on=[lat_key, lon_key], how="left")
+    location_data.index = np.flatnonzero(valid)
+    # Reindex onto every input row so surveys without valid coordinates keep a NaN row.
+    location_data = location_data.reindex(pd.RangeIndex(len(surveys)))
+    location_data["surveyId"] = surveys["surveyId"].to_numpy()
+    return location_data[["surveyId"] + list(LOCATION_COLUMNS.values())]
+
+
+def process_gps_data(file_path, cache_path=None, decimals=5):
     """
     Process GPS data from a CSV file by adding location details using reverse geocoding.
 
     Args:
         file_path (str): Path to the CSV file.
+        cache_path (str): Optional path to the coordinate cache CSV file.
+        decimals (int): Number of decimals coordinates are rounded to before lookup.
 
     Returns:
         pd.DataFrame: DataFrame containing GPS data with added location details.
@@ -51,15 +143,7 @@ def process_gps_data(file_path):
 
         # Extract latitude, longitude, and survey ID for processing
         surveys = unique_surveys[["lat", "lon", "surveyId"]]
-
-        location_data = Parallel(n_jobs=n_jobs)(
-            delayed(upscale_gps)(row['lat'], row['lon'], row['surveyId'])
-            for _, row in tqdm(surveys.iterrows(), total=len(surveys), desc="Geocoding GPS data")
-        )
-
-        # Remove None results and create DataFrame
-        location_data = [loc for loc in location_data if loc is not None]
-        location_df = pd.DataFrame(location_data)
+        location_df = upscale_locations(surveys, cache_path=cache_path, decimals=decimals)
 
         # Merge with original data
         updated_data = gps_data.merge(location_df, on='surveyId', how='left')
@@ -83,18 +167,19 @@ def save_updated_data(data, output_path):
         raise RuntimeError(f"Error saving data to file: {e}")
 
 
-def main(input_file, output_file):
+def main(input_file, output_file, cache_path=None):
     """
     Main function to process GPS data from input file and save updated data to output file.
 
     Args:
         input_file (str): Path to the input CSV file.
         output_file (str): Path to the output CSV file.
+        cache_path (str): Optional path to the coordinate cache CSV file, reused across runs.
     """
     print("Processing started.")
     start_time = time.time()
 
-    updated_data = process_gps_data(input_file)
+    updated_data = process_gps_data(input_file, cache_path=cache_path)
 
     save_updated_data(updated_data, output_file)
 
@@ -106,5 +191,6 @@ if __name__ == "__main__":
     # File paths for input and output
     input_file_path = "../metadata/GLC24-PA-metadata-test.csv"
     output_file_path = "../metadata/PA_metadata_test.csv"
+    geocode_cache_path = "../metadata/geocode_cache.csv"
 
-    main(input_file_path, output_file_path)
+    main(input_file_path, output_file_path, cache_path=geocode_cache_path)